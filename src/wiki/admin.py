@@ -30,6 +30,11 @@ class ArticleRevisionForm(forms.ModelForm):
 class ArticleRevisionAdmin(admin.ModelAdmin):
     form = ArticleRevisionForm
     list_display = ("title", "created", "modified", "user", "ip_address")
+    list_select_related = ("user",)
+
+    def get_queryset(self, request):
+        # The content is only loaded when a revision is edited
+        return super().get_queryset(request).defer_content()
 
     class Media:
         js = editors.getEditorClass().AdminMedia.js
@@ -61,8 +66,10 @@ class ArticleForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         if self.instance.pk:
-            revisions = models.ArticleRevision.objects.select_related("article").filter(
-                article=self.instance
+            revisions = (
+                models.ArticleRevision.objects.select_related("article")
+                .defer_content()
+                .filter(article=self.instance)
             )
             self.fields["current_revision"].queryset = revisions
         else:
@@ -102,6 +109,14 @@ class URLPathAdmin(MPTTModelAdmin):
         obj.article.add_object_relation(obj)
 
 
+class URLPathRedirectAdmin(admin.ModelAdmin):
+    list_display = ("old_path", "urlpath", "site", "created")
+    list_filter = ("site",)
+    search_fields = ("old_path",)
+    raw_id_fields = ("urlpath",)
+
+
 admin.site.register(models.URLPath, URLPathAdmin)
+admin.site.register(models.URLPathRedirect, URLPathRedirectAdmin)
 admin.site.register(models.Article, ArticleAdmin)
 admin.site.register(models.ArticleRevision, ArticleRevisionAdmin)
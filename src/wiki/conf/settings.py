@@ -260,6 +260,52 @@ CACHE_TIMEOUT = getattr(django_settings, "WIKI_CACHE_TIMEOUT", 600)
 #: Choose the Group model to use for permission handling. Defaults to django's auth.Group.
 GROUP_MODEL = getattr(django_settings, "WIKI_GROUP_MODEL", "auth.Group")
 
+#: Paginate the directory, history, global history and search listings by
+#: cursor instead of page number. Deep pages then cost the same as the first
+#: one, but the listings can only step to the next and previous pages.
+KEYSET_PAGINATION = getattr(django_settings, "WIKI_KEYSET_PAGINATION", False)
+
+#: With ``KEYSET_PAGINATION``, count at most this many results when showing
+#: the size of a listing, so the count stays cheap. Set to ``None`` to not
+#: count at all.
+KEYSET_PAGINATION_COUNT_LIMIT = getattr(
+    django_settings, "WIKI_KEYSET_PAGINATION_COUNT_LIMIT", 1000
+)
+
+####################
+# REVISION STORAGE #
+####################
+
+#: Store revisions that are no longer current as deltas against a full
+#: "keyframe" revision, which saves a lot of space for long histories. The
+#: previous revision is compacted when a new one is added. Existing
+#: revisions are converted with the ``wiki_compact_revisions`` management
+#: command.
+REVISION_DELTA_STORAGE = getattr(django_settings, "WIKI_REVISION_DELTA_STORAGE", False)
+
+#: With ``REVISION_DELTA_STORAGE``, every this many revisions of an article
+#: one keeps its full content, and the others in between are stored as
+#: deltas against it. Reading any revision takes at most the keyframe and
+#: one delta; a smaller interval makes the deltas smaller but stores more
+#: full copies.
+REVISION_KEYFRAME_INTERVAL = getattr(
+    django_settings, "WIKI_REVISION_KEYFRAME_INTERVAL", 20
+)
+
+#: Store the content of revisions that are no longer current once for all
+#: the revisions with the same content, like the ones made by reverting to an
+#: older revision or by restoring and deleting articles. The previous revision
+#: is shared when a new one is added, unless it was stored as a delta.
+#: Existing revisions are converted with the ``wiki_share_revision_content``
+#: management command.
+REVISION_DEDUPLICATION = getattr(django_settings, "WIKI_REVISION_DEDUPLICATION", False)
+
+#: How the ``wiki_compress_revisions`` management command compresses the
+#: content of revisions that are no longer current, either ``"zlib"`` or
+#: ``"lzma"``, which is slower and only saves more on long pages. The content
+#: is decompressed when it is read, whatever method was used.
+REVISION_COMPRESSION = getattr(django_settings, "WIKI_REVISION_COMPRESSION", "zlib")
+
 ###################
 # SPAM PROTECTION #
 ###################
@@ -296,3 +342,27 @@ STORAGE_BACKEND = getattr(django_settings, "WIKI_STORAGE_BACKEND", default_stora
 #: Use django-sendfile for sending out files? Otherwise the whole file is
 #: first read into memory and than send with a mime type based on the file.
 USE_SENDFILE = getattr(django_settings, "WIKI_ATTACHMENTS_USE_SENDFILE", False)
+
+#: Backend that makes the web server send files from ``STORAGE_BACKEND``
+#: instead of streaming them from Django, as the dotted path of a class:
+#: ``"wiki.core.sendfile.XAccelRedirectBackend"`` for nginx,
+#: ``"wiki.core.sendfile.XSendfileBackend"`` for Apache's mod_xsendfile and
+#: lighttpd, or ``"wiki.core.sendfile.DjangoSendfileBackend"`` for
+#: django-sendfile, the default if ``USE_SENDFILE`` is on. Files are
+#: streamed from Django if this is None.
+SENDFILE_BACKEND = getattr(
+    django_settings,
+    "WIKI_SENDFILE_BACKEND",
+    "wiki.core.sendfile.DjangoSendfileBackend" if USE_SENDFILE else None,
+)
+
+#: The internal location of nginx that serves the files of the storage, for
+#: ``XAccelRedirectBackend``. The name of the file is appended to it.
+SENDFILE_URL = getattr(django_settings, "WIKI_SENDFILE_URL", "/protected/")
+
+#: Seconds to cache the size and modification time of stored files, so
+#: sending one doesn't need a request to the storage first. The cache is
+#: cleared when an attachment revision deletes its file.
+FILE_METADATA_CACHE_TIMEOUT = getattr(
+    django_settings, "WIKI_FILE_METADATA_CACHE_TIMEOUT", 60 * 60 * 24
+)
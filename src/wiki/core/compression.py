@@ -0,0 +1,37 @@
+import hashlib
+import lzma
+import zlib
+
+# Compressed text starts with a byte telling how it was compressed, so it can
+# always be read back whatever method is configured at the moment
+_COMPRESSORS = {
+    "zlib": (b"z", lambda data: zlib.compress(data, 9)),
+    "lzma": (b"x", lzma.compress),
+}
+_DECOMPRESSORS = {
+    b"z": zlib.decompress,
+    b"x": lzma.decompress,
+}
+
+
+def compress_text(text, method="zlib"):
+    """Returns ``text`` compressed with ``method``, either ``"zlib"`` or
+    ``"lzma"``, as bytes for :func:`decompress_text`."""
+    try:
+        marker, compress = _COMPRESSORS[method]
+    except KeyError:
+        raise ValueError("Unknown compression method: %r" % method)
+    return marker + compress(text.encode("utf-8"))
+
+
+def decompress_text(data):
+    """Returns the text that was compressed by :func:`compress_text`."""
+    # Some database backends return a memoryview
+    data = bytes(data)
+    return _DECOMPRESSORS[data[:1]](data[1:]).decode("utf-8")
+
+
+def hash_text(text):
+    """Returns the SHA-256 hex digest of ``text``, which identifies the content
+    of revisions whichever way it is stored."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
@@ -1,11 +1,264 @@
 import difflib
+import json
+import warnings
+from bisect import bisect_left
+from collections import Counter
 
+# Regions without unique common lines are diffed with difflib when they are
+# smaller than this many pairs of lines, and replaced as a whole otherwise
+DIFF_MAX_PAIRS = 250000
 
-def simple_merge(txt1, txt2):
-    """Merges two texts"""
+# Changed blocks get difflib.Differ's character level hints when they have at
+# most this many pairs of lines and characters, which takes quadratic time
+INTRALINE_MAX_PAIRS = 400
+INTRALINE_MAX_CHARS = 20000
+
+
+def make_delta(base, text):
+    """
+    Returns a delta that turns ``base`` into ``text`` with
+    :func:`apply_delta`, as a JSON string. Runs of lines that are unchanged
+    from ``base``, as found by :func:`get_opcodes`, are stored as
+    ``[start, end]`` line ranges, everything else as literal text.
+    """
+    base_lines = base.splitlines(True)
+    lines = text.splitlines(True)
+    delta = []
+    for tag, i1, i2, j1, j2 in get_opcodes(base_lines, lines):
+        if tag == "equal":
+            delta.append([i1, i2])
+        elif j1 != j2:
+            delta.append("".join(lines[j1:j2]))
+    return json.dumps(delta, separators=(",", ":"))
+
+
+def apply_delta(base, delta):
+    """Returns the text that ``delta`` was made for by :func:`make_delta`."""
+    base_lines = base.splitlines(True)
+    return "".join(
+        "".join(base_lines[op[0] : op[1]]) if isinstance(op, list) else op
+        for op in json.loads(delta)
+    )
+
+
+def _unique_anchors(a, alo, ahi, b, blo, bhi):
+    """Returns the longest increasing sequence of ``(i, j)`` pairs of lines
+    that occur exactly once in ``a[alo:ahi]`` and ``b[blo:bhi]``."""
+    counts_a = Counter(a[alo:ahi])
+    counts_b = Counter(b[blo:bhi])
+    index_b = {}
+    for j in range(blo, bhi):
+        line = b[j]
+        if counts_b[line] == 1 and counts_a[line] == 1:
+            index_b[line] = j
+    pairs = [(i, index_b[a[i]]) for i in range(alo, ahi) if a[i] in index_b]
+
+    # Patience sorting: tails[k] is the smallest j ending an increasing
+    # sequence of length k + 1
+    tails = []
+    tail_pairs = []
+    previous = {}
+    for pair in pairs:
+        k = bisect_left(tails, pair[1])
+        if k == len(tails):
+            tails.append(pair[1])
+            tail_pairs.append(pair)
+        else:
+            tails[k] = pair[1]
+            tail_pairs[k] = pair
+        previous[pair] = tail_pairs[k - 1] if k else None
+    anchors = []
+    pair = tail_pairs[-1] if tail_pairs else None
+    while pair is not None:
+        anchors.append(pair)
+        pair = previous[pair]
+    anchors.reverse()
+    return anchors
+
+
+def _common_ends(a, alo, ahi, b, blo, bhi):
+    """Returns the number of lines that ``a[alo:ahi]`` and ``b[blo:bhi]``
+    have in common at their start and at their end."""
+    start = 0
+    while alo + start < ahi and blo + start < bhi and a[alo + start] == b[blo + start]:
+        start += 1
+    end = 0
+    while (
+        ahi - end > alo + start
+        and bhi - end > blo + start
+        and a[ahi - end - 1] == b[bhi - end - 1]
+    ):
+        end += 1
+    return start, end
+
+
+def _diff_region(a, alo, ahi, b, blo, bhi):
+    """Returns the opcodes for a region without unique common lines, see
+    ``DIFF_MAX_PAIRS``."""
+    if alo == ahi:
+        return [("insert", alo, ahi, blo, bhi)]
+    if blo == bhi:
+        return [("delete", alo, ahi, blo, bhi)]
+    if (ahi - alo) * (bhi - blo) > DIFF_MAX_PAIRS:
+        return [("replace", alo, ahi, blo, bhi)]
+    matcher = difflib.SequenceMatcher(None, a[alo:ahi], b[blo:bhi], autojunk=False)
+    return [
+        (tag, alo + i1, alo + i2, blo + j1, blo + j2)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+    ]
+
+
+def get_opcodes(a, b):
+    """
+    Returns the changes that turn the list of lines ``a`` into ``b``, like
+    ``difflib.SequenceMatcher.get_opcodes()``.
+
+    Lines that occur once in both are matched first (the "patience diff"
+    algorithm), which takes about linear time, and only the regions between
+    them are left to difflib.
+    """
+    opcodes = []
+
+    def add(tag, i1, i2, j1, j2):
+        if i1 == i2 and j1 == j2:
+            return
+        if opcodes and opcodes[-1][0] == tag:
+            opcodes[-1] = (tag, opcodes[-1][1], i2, opcodes[-1][3], j2)
+        else:
+            opcodes.append((tag, i1, i2, j1, j2))
+
+    # Regions still to diff, and equal runs to output between them, last
+    # first
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        region = stack.pop()
+        if region[0] == "equal":
+            add(*region)
+            continue
+        alo, ahi, blo, bhi = region
+        start, end = _common_ends(a, alo, ahi, b, blo, bhi)
+        add("equal", alo, alo + start, blo, blo + start)
+        stack.append(("equal", ahi - end, ahi, bhi - end, bhi))
+        alo, ahi, blo, bhi = alo + start, ahi - end, blo + start, bhi - end
+
+        anchors = _unique_anchors(a, alo, ahi, b, blo, bhi)
+        if anchors:
+            for i, j in reversed(anchors):
+                stack.append((i + 1, ahi, j + 1, bhi))
+                stack.append(("equal", i, i + 1, j, j + 1))
+                ahi, bhi = i, j
+            stack.append((alo, ahi, blo, bhi))
+        else:
+            for opcode in _diff_region(a, alo, ahi, b, blo, bhi):
+                add(*opcode)
+    return opcodes
+
+
+def diff_lines(a, b):
+    """
+    Returns the differences between the lists of lines ``a`` and ``b`` in
+    the format of ``difflib.Differ.compare()``: each line prefixed by
+    ``"  "``, ``"- "`` or ``"+ "``, and ``"? "`` hints at the changed
+    characters of small changed blocks.
+    """
     differ = difflib.Differ(charjunk=difflib.IS_CHARACTER_JUNK)
-    diff = differ.compare(txt1.splitlines(1), txt2.splitlines(1))
+    result = []
+    for tag, i1, i2, j1, j2 in get_opcodes(a, b):
+        if tag == "equal":
+            result.extend("  " + line for line in a[i1:i2])
+        elif tag == "delete":
+            result.extend("- " + line for line in a[i1:i2])
+        elif tag == "insert":
+            result.extend("+ " + line for line in b[j1:j2])
+        elif (i2 - i1) * (j2 - j1) <= INTRALINE_MAX_PAIRS and (
+            sum(map(len, a[i1:i2])) + sum(map(len, b[j1:j2])) <= INTRALINE_MAX_CHARS
+        ):
+            result.extend(differ.compare(a[i1:i2], b[j1:j2]))
+        else:
+            result.extend("- " + line for line in a[i1:i2])
+            result.extend("+ " + line for line in b[j1:j2])
+    return result
+
+
+def _matches(base, lines):
+    """Returns for every line of ``base`` the index of the line in ``lines``
+    it is kept as, or -1."""
+    matches = [-1] * len(base)
+    for tag, i1, i2, j1, j2 in get_opcodes(base, lines):
+        if tag == "equal":
+            matches[i1:i2] = range(j1, j2)
+    return matches
 
-    content = "".join([_l[2:] for _l in diff])
 
-    return content
+def three_way_merge(base, txt1, txt2, label1="", label2=""):
+    """
+    Merges the changes that ``txt1`` and ``txt2`` each made to ``base``, their
+    common ancestor, like diff3. Returns the merged text and the number of
+    conflicts: blocks that were changed differently in both texts, which are
+    included from both between ``<<<<<<< label1``, ``=======`` and
+    ``>>>>>>> label2`` lines.
+
+    Lines are compared without their line endings, and the merged text uses
+    ``"\\r\\n"`` if either text does.
+    """
+    base = base.splitlines()
+    lines1 = txt1.splitlines()
+    lines2 = txt2.splitlines()
+    matches1 = _matches(base, lines1)
+    matches2 = _matches(base, lines2)
+
+    merged = []
+    conflicts = 0
+    i = j1 = j2 = 0
+    while True:
+        # Find the next base line that both texts kept, at the start of what
+        # is left of them
+        k = i
+        while k < len(base) and (matches1[k] < 0 or matches2[k] < 0):
+            k += 1
+        if k < len(base) and k == i and matches1[k] == j1 and matches2[k] == j2:
+            merged.append(base[i])
+            i, j1, j2 = i + 1, j1 + 1, j2 + 1
+            continue
+
+        end1 = matches1[k] if k < len(base) else len(lines1)
+        end2 = matches2[k] if k < len(base) else len(lines2)
+        chunk = base[i:k]
+        chunk1 = lines1[j1:end1]
+        chunk2 = lines2[j2:end2]
+        if chunk1 == chunk or chunk1 == chunk2:
+            merged.extend(chunk2)
+        elif chunk2 == chunk:
+            merged.extend(chunk1)
+        else:
+            conflicts += 1
+            merged.append(("<<<<<<< " + label1).rstrip())
+            merged.extend(chunk1)
+            merged.append("=======")
+            merged.extend(chunk2)
+            merged.append((">>>>>>> " + label2).rstrip())
+        if k == len(base):
+            break
+        i, j1, j2 = k, end1, end2
+
+    newline = "\r\n" if "\r\n" in txt1 or "\r\n" in txt2 else "\n"
+    content = newline.join(merged)
+    if content and (txt1.endswith(("\n", "\r")) or txt2.endswith(("\n", "\r"))):
+        content += newline
+    return content, conflicts
+
+
+def simple_merge(txt1, txt2):
+    """Merges two texts by keeping the lines of both"""
+    warnings.warn(
+        "Pending removal: simple_merge is replaced by three_way_merge",
+        DeprecationWarning,
+    )
+    lines1 = txt1.splitlines(True)
+    lines2 = txt2.splitlines(True)
+    content = []
+    for tag, i1, i2, j1, j2 in get_opcodes(lines1, lines2):
+        content.extend(lines1[i1:i2])
+        if tag != "equal":
+            content.extend(lines2[j1:j2])
+    return "".join(content)
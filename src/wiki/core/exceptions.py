@@ -10,3 +10,12 @@ class NoRootURL(Exception):
 
 class MultipleRootURLs(Exception):
     pass
+
+
+# If a path no longer exists but has been moved, we raise this...
+
+
+class URLPathMoved(Exception):
+    def __init__(self, urlpath):
+        super().__init__("Path has moved to '%s'" % urlpath.path)
+        self.urlpath = urlpath
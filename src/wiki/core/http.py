@@ -1,12 +1,25 @@
+import functools
+import hashlib
 import mimetypes
 import os
+import re
 from datetime import datetime
 
+from django.core.cache import cache
+from django.http import FileResponse
 from django.http import HttpResponse
 from django.utils import dateformat
+from django.utils.cache import get_conditional_response
 from django.utils.encoding import filepath_to_uri
 from django.utils.http import http_date
+from django.utils.http import parse_http_date_safe
 from wiki.conf import settings
+from wiki.core.sendfile import get_backend
+
+# How much of a file is read into memory at a time when streaming it
+CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r"^\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*$", re.IGNORECASE)
 
 
 def django_sendfile_response(request, filepath):
@@ -15,30 +28,197 @@ def django_sendfile_response(request, filepath):
     return sendfile(request, filepath)
 
 
-def send_file(request, filepath, last_modified=None, filename=None):
-    fullpath = filepath
-    # Respect the If-Modified-Since header.
-    statobj = os.stat(fullpath)
-    if filename:
-        mimetype, encoding = mimetypes.guess_type(filename)
-    else:
-        mimetype, encoding = mimetypes.guess_type(fullpath)
+def django_sendfile_offload(request, filepath, size):
+    response = django_sendfile_response(request, filepath)
+    response["Content-Length"] = size
+    return response
 
-    mimetype = mimetype or "application/octet-stream"
 
-    if settings.USE_SENDFILE:
-        response = django_sendfile_response(request, filepath)
-    else:
-        response = HttpResponse(open(fullpath, "rb").read(), content_type=mimetype)
+class FileRange:
 
-    if not last_modified:
-        response["Last-Modified"] = http_date(statobj.st_mtime)
+    """A read-only file object for ``length`` bytes of ``file`` from
+    ``start`` on, so a byte range can be streamed like a whole file."""
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.file.seek(start)
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    Returns the first and last byte position of the range asked for in a
+    ``Range`` header, for a file of ``size`` bytes. Returns None when the
+    header should be ignored and the whole file sent, which includes
+    requests for several ranges at once. Raises ValueError if the range is
+    outside of the file.
+    """
+    match = _RANGE_RE.match(header)
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        # The last bytes of the file
+        if int(last) == 0 or size == 0:
+            raise ValueError("Empty range")
+        return max(size - int(last), 0), size - 1
+    first = int(first)
+    if last != "" and int(last) < first:
+        # Not a valid range at all
+        return None
+    if first >= size:
+        raise ValueError("Range starts after the end of the file")
+    last = size - 1 if last == "" else min(int(last), size - 1)
+    return first, last
+
+
+def get_range(request, size, etag, last_modified):
+    """Returns the byte range to send, see :func:`parse_range`. A range
+    that depends on an ``If-Range`` that doesn't match the file anymore is
+    ignored."""
+    header = request.META.get("HTTP_RANGE")
+    if not header or request.method not in ("GET", "HEAD"):
+        return None
+    if_range = request.META.get("HTTP_IF_RANGE", "").strip()
+    if if_range:
+        if if_range.startswith(("W/", '"')):
+            if if_range != etag:
+                return None
+        elif parse_http_date_safe(if_range) != int(last_modified):
+            return None
+    return parse_range(header, size)
+
+
+def get_file_metadata_key(storage, name, last_modified=None):
+    if isinstance(last_modified, datetime):
+        last_modified = float(dateformat.format(last_modified, "U"))
+    return "wiki-file-metadata-{hash}".format(
+        hash=hashlib.md5(
+            "{cls}:{location}:{name}:{last_modified}".format(
+                cls=type(storage).__name__,
+                location=getattr(storage, "location", ""),
+                name=name,
+                last_modified=last_modified,
+            ).encode()
+        ).hexdigest()
+    )
+
+
+def get_file_metadata(storage, name, last_modified=None):
+    """
+    Returns the size of the file ``name`` of ``storage`` and its
+    modification time as a timestamp, or None if the storage doesn't know
+    it. Both are cached for ``WIKI_FILE_METADATA_CACHE_TIMEOUT`` seconds,
+    asking a remote storage can take a while.
+
+    A name can be used again for another file once the first one is
+    deleted, so the cache is keyed by ``last_modified`` as well, which
+    should be the time the file was stored at, and cleared with
+    :func:`clear_file_metadata` when the file is deleted.
+    """
+    key = get_file_metadata_key(storage, name, last_modified)
+    metadata = cache.get(key)
+    if metadata is None:
+        try:
+            modified = storage.get_modified_time(name).timestamp()
+        except NotImplementedError:
+            modified = None
+        metadata = (storage.size(name), modified)
+        cache.set(key, metadata, settings.FILE_METADATA_CACHE_TIMEOUT)
+    return metadata
+
+
+def clear_file_metadata(storage, name, last_modified=None):
+    """Clears the cached metadata of a file, see
+    :func:`get_file_metadata`."""
+    cache.delete(get_file_metadata_key(storage, name, last_modified))
+
+
+def stream_file(request, open_file, size, etag, last_modified, mimetype):
+    """Returns the response that streams the file, or the byte range of it
+    that is asked for, see :func:`get_range`, or ``416 Range Not
+    Satisfiable``."""
+    try:
+        byte_range = get_range(request, size, etag, last_modified)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = "bytes */{size:d}".format(size=size)
+        return response
+    file = open_file()
+    if byte_range is None:
+        response = FileResponse(file, content_type=mimetype)
+        response["Content-Length"] = size
     else:
-        if isinstance(last_modified, datetime):
-            last_modified = float(dateformat.format(last_modified, "U"))
-        response["Last-Modified"] = http_date(epoch_seconds=last_modified)
+        first, last = byte_range
+        response = FileResponse(
+            FileRange(file, first, last - first + 1),
+            content_type=mimetype,
+            status=206,
+        )
+        response["Content-Range"] = "bytes {first:d}-{last:d}/{size:d}".format(
+            first=first, last=last, size=size
+        )
+        response["Content-Length"] = last - first + 1
+    response.block_size = CHUNK_SIZE
+    response["Accept-Ranges"] = "bytes"
+    # FileResponse picks a Content-Disposition from the file name
+    if "Content-Disposition" in response:
+        del response["Content-Disposition"]
+    return response
+
+
+def file_response(
+    request,
+    open_file,
+    size,
+    etag,
+    last_modified,
+    mimetype,
+    encoding=None,
+    filename=None,
+    offload=None,
+):
+    """
+    Returns the response for a file of ``size`` bytes. The file is only
+    opened, by calling ``open_file``, if it is sent, and is then streamed in
+    chunks of ``CHUNK_SIZE`` bytes, so memory use doesn't depend on the size
+    of the file. ``offload`` can be a function that returns a response that
+    makes the web server send the file instead.
+
+    Conditional requests are answered with ``304 Not Modified`` or
+    ``412 Precondition Failed`` based on ``etag`` and ``last_modified``, a
+    timestamp. A single byte range can be requested with the ``Range``
+    header and is sent as ``206 Partial Content``.
+    """
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(last_modified)
+    )
+    if response is None:
+        if offload is not None:
+            response = offload()
+            response["Content-Type"] = mimetype
+        else:
+            response = stream_file(
+                request, open_file, size, etag, last_modified, mimetype
+            )
+            if response.status_code == 416:
+                return response
+
+    response["Last-Modified"] = http_date(last_modified)
+    response["ETag"] = etag
 
-    response["Content-Length"] = statobj.st_size
+    if response.status_code in (304, 412):
+        return response
 
     if encoding:
         response["Content-Encoding"] = encoding
@@ -53,3 +233,74 @@ def send_file(request, filepath, last_modified=None, filename=None):
             )
 
     return response
+
+
+def send_file(request, filepath, last_modified=None, filename=None):
+    """
+    Returns a response with the file at the local path ``filepath``, see
+    :func:`file_response`. ``last_modified`` defaults to the modification
+    time of the file.
+    """
+    statobj = os.stat(filepath)
+    mimetype, encoding = mimetypes.guess_type(filename or filepath)
+
+    if not last_modified:
+        last_modified = statobj.st_mtime
+    elif isinstance(last_modified, datetime):
+        last_modified = float(dateformat.format(last_modified, "U"))
+    size = statobj.st_size
+    etag = '"{mtime:x}-{size:x}"'.format(mtime=statobj.st_mtime_ns, size=size)
+
+    offload = None
+    if settings.USE_SENDFILE:
+        offload = functools.partial(django_sendfile_offload, request, filepath, size)
+
+    return file_response(
+        request,
+        functools.partial(open, filepath, "rb"),
+        size,
+        etag,
+        last_modified,
+        mimetype or "application/octet-stream",
+        encoding,
+        filename,
+        offload,
+    )
+
+
+def send_stored_file(request, storage, name, last_modified=None, filename=None):
+    """
+    Returns a response with the file ``name`` of ``storage``, which can be
+    any Django storage, see :func:`file_response`. It is sent by the backend
+    in ``WIKI_SENDFILE_BACKEND``, or streamed from ``storage.open()``.
+    ``last_modified`` defaults to the modification time of the file, if the
+    storage knows it, and also keys its cached metadata, see
+    :func:`get_file_metadata`.
+    """
+    size, modified = get_file_metadata(storage, name, last_modified)
+    mimetype, encoding = mimetypes.guess_type(filename or name)
+
+    if not last_modified:
+        last_modified = modified or 0
+    elif isinstance(last_modified, datetime):
+        last_modified = float(dateformat.format(last_modified, "U"))
+    etag = '"{mtime:x}-{size:x}"'.format(
+        mtime=int((modified or last_modified) * 10**6), size=size
+    )
+
+    offload = None
+    backend = get_backend()
+    if backend is not None:
+        offload = functools.partial(backend.get_response, request, storage, name)
+
+    return file_response(
+        request,
+        functools.partial(storage.open, name, "rb"),
+        size,
+        etag,
+        last_modified,
+        mimetype or "application/octet-stream",
+        encoding,
+        filename,
+        offload,
+    )
@@ -1,7 +1,22 @@
+import base64
+import collections.abc
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
 from django.core.paginator import Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
 
 
 class WikiPaginator(Paginator):
+
+    count_is_exact = True
+
     def __init__(self, *args, **kwargs):
         """
         :param side_pages: How many pages should be shown before and after the current page
@@ -31,3 +46,153 @@ class WikiPaginator(Paginator):
         if self.num_pages > 1:
             pages += [self.num_pages]
         return pages
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    def default(self, o):
+        # DjangoJSONEncoder truncates microseconds, which would make cursors
+        # skip or repeat rows created within the same millisecond.
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPage(collections.abc.Sequence):
+
+    """
+    A page of a :class:`KeysetPaginator`. Instead of page numbers it knows the
+    cursors of the pages before and after it.
+    """
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return "<Keyset page of {} objects>".format(len(self))
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_previous() or self.has_next()
+
+
+class KeysetPaginator:
+
+    """
+    Paginates a queryset by the values of its ordering fields rather than by
+    offset, so every page costs the same as the first one and no ``COUNT(*)``
+    is needed.
+
+    ``ordering`` must end with a unique field (usually the primary key) so
+    that rows are never skipped or repeated. Cursors are opaque strings
+    pointing to the first or last row of the page that was shown before.
+
+    :param count_limit: If set, ``count`` counts at most this many rows, which
+        is cheap and good enough to tell "about 1000+ results". If not set,
+        ``count`` is ``None``.
+    """
+
+    def __init__(self, object_list, per_page, ordering, count_limit=None):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.count_limit = count_limit
+
+    @cached_property
+    def count(self):
+        if not self.count_limit:
+            return None
+        return self.object_list.order_by()[: self.count_limit].count()
+
+    @property
+    def count_is_exact(self):
+        return self.count is not None and self.count < self.count_limit
+
+    def _fields(self, reverse=False):
+        for field in self.ordering:
+            descending = field.startswith("-")
+            yield field.lstrip("-"), descending != reverse
+
+    def _order_by(self, reverse=False):
+        return [
+            "-" + name if descending else name
+            for name, descending in self._fields(reverse)
+        ]
+
+    def encode_cursor(self, obj, before=False):
+        values = []
+        for name, __ in self._fields():
+            value = obj
+            for attr in name.split("__"):
+                value = getattr(value, attr) if value is not None else None
+            values.append(value.pk if isinstance(value, models.Model) else value)
+        data = json.dumps([before, values], cls=CursorEncoder)
+        return base64.urlsafe_b64encode(data.encode("utf-8")).decode("ascii")
+
+    def decode_cursor(self, cursor):
+        try:
+            before, values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (TypeError, ValueError, UnicodeError):
+            raise InvalidCursor(_("Invalid cursor"))
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise InvalidCursor(_("Invalid cursor"))
+        return bool(before), values
+
+    def _after(self, values, reverse=False):
+        """
+        Returns a Q object matching rows that come after ``values`` in the
+        (possibly reversed) ordering: (a > x) OR (a = x AND b > y) ...
+        """
+        q = Q()
+        equal = {}
+        for (name, descending), value in zip(self._fields(reverse), values):
+            lookup = "{}__{}".format(name, "lt" if descending else "gt")
+            q |= Q(**equal, **{lookup: value})
+            equal[name] = value
+        return q
+
+    def page(self, cursor=None):
+        before, values = self.decode_cursor(cursor) if cursor else (False, None)
+        queryset = self.object_list.order_by(*self._order_by(reverse=before))
+        if values is not None:
+            try:
+                queryset = queryset.filter(self._after(values, reverse=before))
+            except (TypeError, ValueError, ValidationError):
+                raise InvalidCursor(_("Invalid cursor"))
+
+        object_list = list(queryset[: self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[: self.per_page]
+        if before:
+            object_list.reverse()
+
+        if not object_list:
+            return KeysetPage(object_list, self)
+
+        has_next = has_more if not before else True
+        has_previous = has_more if before else values is not None
+        return KeysetPage(
+            object_list,
+            self,
+            next_cursor=self.encode_cursor(object_list[-1]) if has_next else None,
+            previous_cursor=self.encode_cursor(object_list[0], before=True)
+            if has_previous
+            else None,
+        )
@@ -1,4 +1,6 @@
+from django.utils.functional import cached_property
 from wiki.conf import settings
+from wiki.managers import user_group_ids
 
 ###############################
 # ARTICLE PERMISSION HANDLING #
@@ -10,89 +12,174 @@ from wiki.conf import settings
 #
 # All functions can be replaced by pointing their relevant
 # settings variable in wiki.conf.settings to a callable(article, user)
+#
+# The default rules are evaluated by a PermissionContext, which loads the
+# user's groups and permissions once and keeps them on the user object. For
+# request.user, that means once per request no matter how many articles are
+# checked.
 
 
-def can_read(article, user):
-    if callable(settings.CAN_READ):
-        return settings.CAN_READ(article, user)
-    else:
+class PermissionContext:
+
+    """
+    Evaluates the permission rules for one user in memory.
+
+    The user's group ids are loaded on first use and each permission is only
+    asked from the auth backends once, after which checking an article costs
+    no queries as long as its ``current_revision`` is loaded. Use
+    :func:`get_permission_context` rather than creating one directly.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._perms = {}
+
+    @cached_property
+    def group_ids(self):
+        if self.user.is_anonymous:
+            return frozenset()
+        return frozenset(user_group_ids(self.user).values_list("pk", flat=True))
+
+    def has_perm(self, perm):
+        try:
+            return self._perms[perm]
+        except KeyError:
+            has_perm = self._perms[perm] = self.user.has_perm(perm)
+            return has_perm
+
+    def is_owner(self, article):
+        return not self.user.is_anonymous and article.owner_id == self.user.pk
+
+    def in_group(self, article):
+        return article.group_id is not None and article.group_id in self.group_ids
+
+    def can_read(self, article):
+        if callable(settings.CAN_READ):
+            return settings.CAN_READ(article, self.user)
         # Deny reading access to deleted articles if user has no delete access
         article_is_deleted = (
             article.current_revision and article.current_revision.deleted
         )
-        if article_is_deleted and not article.can_delete(user):
+        if article_is_deleted and not self.can_delete(article):
             return False
 
         # Check access for other users...
-        if user.is_anonymous and not settings.ANONYMOUS:
+        if self.user.is_anonymous and not settings.ANONYMOUS:
             return False
         elif article.other_read:
             return True
-        elif user.is_anonymous:
+        elif self.user.is_anonymous:
             return False
-        if user == article.owner:
+        if self.is_owner(article):
+            return True
+        if article.group_read and self.in_group(article):
             return True
-        if article.group_read:
-            if article.group and user.groups.filter(id=article.group.id).exists():
-                return True
-        if article.can_moderate(user):
+        if self.can_moderate(article):
             return True
         return False
 
-
-def can_write(article, user):
-    if callable(settings.CAN_WRITE):
-        return settings.CAN_WRITE(article, user)
-    # Check access for other users...
-    if user.is_anonymous and not settings.ANONYMOUS_WRITE:
+    def can_write(self, article):
+        if callable(settings.CAN_WRITE):
+            return settings.CAN_WRITE(article, self.user)
+        # Check access for other users...
+        if self.user.is_anonymous and not settings.ANONYMOUS_WRITE:
+            return False
+        elif article.other_write:
+            return True
+        elif self.user.is_anonymous:
+            return False
+        if self.is_owner(article):
+            return True
+        if article.group_write and self.in_group(article):
+            return True
+        if self.can_moderate(article):
+            return True
         return False
-    elif article.other_write:
-        return True
-    elif user.is_anonymous:
+
+    def can_assign(self, article):
+        if callable(settings.CAN_ASSIGN):
+            return settings.CAN_ASSIGN(article, self.user)
+        return not self.user.is_anonymous and self.has_perm("wiki.assign")
+
+    def can_assign_owner(self, article):
+        if callable(settings.CAN_ASSIGN_OWNER):
+            return settings.CAN_ASSIGN_OWNER(article, self.user)
         return False
-    if user == article.owner:
-        return True
-    if article.group_write:
-        if article.group and user and user.groups.filter(id=article.group.id).exists():
-            return True
-    if article.can_moderate(user):
-        return True
-    return False
+
+    def can_change_permissions(self, article):
+        if callable(settings.CAN_CHANGE_PERMISSIONS):
+            return settings.CAN_CHANGE_PERMISSIONS(article, self.user)
+        return not self.user.is_anonymous and (
+            self.is_owner(article) or self.has_perm("wiki.assign")
+        )
+
+    def can_delete(self, article):
+        if callable(settings.CAN_DELETE):
+            return settings.CAN_DELETE(article, self.user)
+        return not self.user.is_anonymous and self.can_write(article)
+
+    def can_moderate(self, article):
+        if callable(settings.CAN_MODERATE):
+            return settings.CAN_MODERATE(article, self.user)
+        return not self.user.is_anonymous and self.has_perm("wiki.moderate")
+
+    def can_admin(self, article):
+        if callable(settings.CAN_ADMIN):
+            return settings.CAN_ADMIN(article, self.user)
+        return not self.user.is_anonymous and self.has_perm("wiki.admin")
+
+    def filter_readable(self, articles):
+        return [article for article in articles if self.can_read(article)]
+
+
+def get_permission_context(user):
+    """Return the PermissionContext of a user, creating it on first use."""
+    try:
+        return user._wiki_permission_context
+    except AttributeError:
+        context = user._wiki_permission_context = PermissionContext(user)
+        return context
+
+
+def clear_permission_context(user):
+    """Forget the groups and permissions loaded for a user, for instance after
+    changing them."""
+    user.__dict__.pop("_wiki_permission_context", None)
+
+
+def filter_readable(articles, user):
+    """Return the articles of an iterable that the user may read, loading the
+    user's groups and permissions only once for the whole list."""
+    return get_permission_context(user).filter_readable(articles)
+
+
+def can_read(article, user):
+    return get_permission_context(user).can_read(article)
+
+
+def can_write(article, user):
+    return get_permission_context(user).can_write(article)
 
 
 def can_assign(article, user):
-    if callable(settings.CAN_ASSIGN):
-        return settings.CAN_ASSIGN(article, user)
-    return not user.is_anonymous and user.has_perm("wiki.assign")
+    return get_permission_context(user).can_assign(article)
 
 
 def can_assign_owner(article, user):
-    if callable(settings.CAN_ASSIGN_OWNER):
-        return settings.CAN_ASSIGN_OWNER(article, user)
-    return False
+    return get_permission_context(user).can_assign_owner(article)
 
 
 def can_change_permissions(article, user):
-    if callable(settings.CAN_CHANGE_PERMISSIONS):
-        return settings.CAN_CHANGE_PERMISSIONS(article, user)
-    return not user.is_anonymous and (
-        article.owner == user or user.has_perm("wiki.assign")
-    )
+    return get_permission_context(user).can_change_permissions(article)
 
 
 def can_delete(article, user):
-    if callable(settings.CAN_DELETE):
-        return settings.CAN_DELETE(article, user)
-    return not user.is_anonymous and article.can_write(user)
+    return get_permission_context(user).can_delete(article)
 
 
 def can_moderate(article, user):
-    if callable(settings.CAN_MODERATE):
-        return settings.CAN_MODERATE(article, user)
-    return not user.is_anonymous and user.has_perm("wiki.moderate")
+    return get_permission_context(user).can_moderate(article)
 
 
 def can_admin(article, user):
-    if callable(settings.CAN_ADMIN):
-        return settings.CAN_ADMIN(article, user)
-    return not user.is_anonymous and user.has_perm("wiki.admin")
+    return get_permission_context(user).can_admin(article)
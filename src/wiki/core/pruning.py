@@ -0,0 +1,210 @@
+import bisect
+import json
+from datetime import timedelta
+
+from django.conf import settings as django_settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from wiki.models import Article
+from wiki.models import ArticleRevision
+from wiki.models import SimplePlugin
+
+# The fields of a revision that go into the archive, besides its content
+ARCHIVE_FIELDS = (
+    "id",
+    "article_id",
+    "revision_number",
+    "title",
+    "user_message",
+    "automatic_log",
+    "ip_address",
+    "user_id",
+    "created",
+    "modified",
+    "previous_revision_id",
+    "deleted",
+    "locked",
+)
+
+
+class RetentionPolicy:
+
+    """
+    Decides which revisions of an article to keep: every revision created in
+    the last ``keep_all``, the latest one of every day in the last
+    ``keep_daily``, and the latest one of every month before that. Both are
+    timedeltas counted back from now.
+    """
+
+    def __init__(self, keep_all=timedelta(days=30), keep_daily=timedelta(days=365)):
+        self.keep_all = keep_all
+        self.keep_daily = keep_daily
+
+    def get_period(self, created, now):
+        """Returns the period in which only the latest revision is kept, or
+        None if every revision created at ``created`` is kept."""
+        age = now - created
+        if age < self.keep_all:
+            return None
+        if django_settings.USE_TZ:
+            created = timezone.localtime(created)
+        if age < self.keep_daily:
+            return created.date()
+        return (created.year, created.month)
+
+    def get_kept(self, revisions, now):
+        """Returns the ids of the revisions to keep, from an iterable of
+        ``(id, created)`` pairs."""
+        kept = set()
+        latest = {}
+        for revision_id, created in revisions:
+            period = self.get_period(created, now)
+            if period is None:
+                kept.add(revision_id)
+            elif period not in latest or latest[period] < (created, revision_id):
+                latest[period] = (created, revision_id)
+        kept.update(revision_id for created, revision_id in latest.values())
+        return kept
+
+
+class RevisionPruner:
+
+    """
+    Deletes the revisions that a :class:`RetentionPolicy` doesn't keep, one
+    article at a time. The current revision is always kept.
+
+    The history stays connected: ``previous_revision`` of a kept revision
+    points to its nearest kept ancestor, revisions stored as a delta against
+    a pruned keyframe get their full content back, and the simple plugins of
+    a pruned revision move on to the next kept one.
+
+    Each article is pruned in its own transaction, which holds a lock on the
+    article row so nobody can change its current revision meanwhile. The
+    revisions are only loaded with their content if they are archived, in
+    batches of ``batch_size``.
+
+    :param archive: A text file to write the pruned revisions to, with their
+        full content, as JSON lines.
+    """
+
+    def __init__(self, policy, archive=None, batch_size=500, now=None):
+        self.policy = policy
+        self.archive = archive
+        self.batch_size = batch_size
+        self.now = now or timezone.now()
+        self.expanded = 0
+
+    def get_revisions(self, article_id, current_revision_id):
+        """Returns the revisions of an article as a dict of id:
+        ``(revision_number, previous_revision_id, delta_base_id)``, and the
+        ids of the ones to keep."""
+        revisions = {}
+        created = []
+        for (
+            revision_id,
+            revision_created,
+            revision_number,
+            previous_revision_id,
+            delta_base_id,
+        ) in ArticleRevision.objects.filter(article_id=article_id).values_list(
+            "id", "created", "revision_number", "previous_revision_id", "delta_base_id"
+        ):
+            revisions[revision_id] = (
+                revision_number,
+                previous_revision_id,
+                delta_base_id,
+            )
+            created.append((revision_id, revision_created))
+        kept = self.policy.get_kept(created, self.now)
+        kept.add(current_revision_id)
+        return revisions, kept
+
+    def prune_article(self, article_id, dry_run=False):
+        """Prunes the revisions of an article and returns how many there
+        were."""
+        with transaction.atomic():
+            current_revision_id = (
+                Article.objects.select_for_update()
+                .filter(pk=article_id)
+                .values_list("current_revision_id", flat=True)
+                .first()
+            )
+            if current_revision_id is None:
+                return 0
+            revisions, kept = self.get_revisions(article_id, current_revision_id)
+            pruned = set(revisions) - kept
+            if not pruned or dry_run:
+                return len(pruned)
+            self.relink(revisions, kept, pruned)
+            if self.archive is not None:
+                self.write_archive(pruned)
+            # Revisions stored as a delta go first, their keyframe may be
+            # pruned as well
+            pruned = sorted(pruned, key=lambda pk: (revisions[pk][2] is None, pk))
+            for start in range(0, len(pruned), self.batch_size):
+                ArticleRevision.objects.filter(
+                    pk__in=pruned[start : start + self.batch_size]
+                ).delete()
+            return len(pruned)
+
+    def relink(self, revisions, kept, pruned):
+        """Points everything that refers to a pruned revision to a kept
+        one."""
+
+        def kept_ancestor(revision_id):
+            visited = set()
+            while revision_id is not None and revision_id not in kept:
+                if revision_id in visited:
+                    return None
+                visited.add(revision_id)
+                revision_id = revisions.get(revision_id, (None, None))[1]
+            return revision_id
+
+        for revision_id in kept:
+            previous_revision_id = revisions[revision_id][1]
+            if previous_revision_id in pruned:
+                ArticleRevision.objects.filter(pk=revision_id).update(
+                    previous_revision_id=kept_ancestor(previous_revision_id)
+                )
+
+        orphans = [pk for pk in kept if revisions[pk][2] in pruned]
+        for revision in ArticleRevision.objects.filter(pk__in=orphans).select_related(
+            "delta_base"
+        ):
+            revision.expand()
+            self.expanded += 1
+
+        # Simple plugins follow the article to newer revisions, see
+        # update_simple_plugins, so they move on to the next kept revision
+        kept_numbers = sorted((revisions[pk][0], pk) for pk in kept)
+        targets = {}
+        for revision_id in pruned:
+            index = bisect.bisect(kept_numbers, (revisions[revision_id][0],))
+            target = kept_numbers[min(index, len(kept_numbers) - 1)][1]
+            targets.setdefault(target, []).append(revision_id)
+        for target, revision_ids in targets.items():
+            SimplePlugin.objects.filter(article_revision_id__in=revision_ids).update(
+                article_revision_id=target
+            )
+
+    def write_archive(self, pruned):
+        pruned = sorted(pruned)
+        for start in range(0, len(pruned), self.batch_size):
+            revisions = ArticleRevision.objects.filter(
+                pk__in=pruned[start : start + self.batch_size]
+            ).select_related("delta_base", "shared_content")
+            for revision in revisions.order_by("pk"):
+                data = {field: getattr(revision, field) for field in ARCHIVE_FIELDS}
+                data["content"] = revision.content
+                self.archive.write(json.dumps(data, cls=DjangoJSONEncoder) + "\n")
+
+    def prune(self, articles=None, dry_run=False):
+        """Prunes the revisions of ``articles``, a queryset of articles that
+        defaults to all of them, and returns how many there were."""
+        if articles is None:
+            articles = Article.objects.all()
+        count = 0
+        for article_id in articles.values_list("id", flat=True).iterator():
+            count += self.prune_article(article_id, dry_run=dry_run)
+        return count
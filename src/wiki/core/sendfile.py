@@ -0,0 +1,77 @@
+"""
+Backends that hand the sending of a stored file over to the web server, so
+no Django worker is busy with it. Pick one with ``WIKI_SENDFILE_BACKEND``.
+
+A backend is a class whose ``get_response(request, storage, name)`` returns
+the response that makes the web server send the file ``name`` of
+``storage``. The response doesn't need a body or file headers, those are
+added by :func:`wiki.core.http.send_stored_file`.
+"""
+from django.http import HttpResponse
+from django.urls import get_callable
+from django.utils.encoding import filepath_to_uri
+from wiki.conf import settings
+
+_backends = {}
+
+
+class BaseSendfileBackend:
+    def get_response(self, request, storage, name):
+        raise NotImplementedError
+
+
+class XAccelRedirectBackend(BaseSendfileBackend):
+
+    """
+    For nginx: redirects internally to the name of the file under
+    ``WIKI_SENDFILE_URL``, which should be an ``internal`` location that
+    serves the storage, e.g. an alias of ``MEDIA_ROOT`` or a ``proxy_pass``
+    to a bucket. Works with storages that have no local paths.
+    """
+
+    def __init__(self, url=None):
+        self.url = url
+
+    def get_response(self, request, storage, name):
+        url = self.url or settings.SENDFILE_URL
+        response = HttpResponse()
+        response["X-Accel-Redirect"] = url.rstrip("/") + "/" + filepath_to_uri(name)
+        return response
+
+
+class XSendfileBackend(BaseSendfileBackend):
+
+    """For Apache with mod_xsendfile, lighttpd and others that send the file
+    at the path in the ``X-Sendfile`` header. Needs a storage with local
+    paths."""
+
+    header = "X-Sendfile"
+
+    def get_response(self, request, storage, name):
+        response = HttpResponse()
+        response[self.header] = storage.path(name)
+        return response
+
+
+class DjangoSendfileBackend(BaseSendfileBackend):
+
+    """Uses django-sendfile, which is what ``WIKI_ATTACHMENTS_USE_SENDFILE``
+    turns on. Needs a storage with local paths."""
+
+    def get_response(self, request, storage, name):
+        from sendfile import sendfile
+
+        response = sendfile(request, storage.path(name))
+        response["Content-Length"] = storage.size(name)
+        return response
+
+
+def get_backend():
+    """Returns the backend from ``WIKI_SENDFILE_BACKEND``, or None if files
+    are streamed by Django."""
+    path = settings.SENDFILE_BACKEND
+    if not path:
+        return None
+    if path not in _backends:
+        _backends[path] = get_callable(path)()
+    return _backends[path]
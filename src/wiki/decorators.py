@@ -1,15 +1,19 @@
+import threading
+from contextlib import contextmanager
 from functools import wraps
 from urllib.parse import quote as urlquote
 
 from django.http import Http404
 from django.http import HttpResponseForbidden
 from django.http import HttpResponseNotFound
+from django.http import HttpResponsePermanentRedirect
 from django.http import HttpResponseRedirect
 from django.shortcuts import redirect
 from django.template.loader import render_to_string
 from django.urls import reverse
 from wiki.conf import settings
 from wiki.core.exceptions import NoRootURL
+from wiki.core.exceptions import URLPathMoved
 
 from . import models
 
@@ -39,7 +43,14 @@ def response_forbidden(request, article, urlpath, read_denied=False):
 def which_article(path=None, article_id=None, **kwargs):
     # fetch by path
     if path is not None:
-        urlpath = models.URLPath.get_by_path(path, select_related=True)
+        try:
+            urlpath = models.URLPath.get_by_path(path, select_related=True)
+        except models.URLPath.DoesNotExist:
+            # The path might have been moved, in which case there's a redirect
+            target = models.URLPathRedirect.get_target(path)
+            if target is None:
+                raise
+            raise URLPathMoved(target)
         if urlpath.article:
             # urlpath is already smart about prefetching items on article
             # (like current_revision), so we don't have to
@@ -112,6 +123,8 @@ def get_article(  # noqa: max-complexity 19
             article, urlpath = which_article(path, article_id)
         except NoRootURL:
             return redirect("wiki:root_create")
+        except URLPathMoved as e:
+            return HttpResponsePermanentRedirect(e.urlpath.get_absolute_url())
         except models.Article.DoesNotExist:
             raise Http404("Article id {:} not found".format(article_id))
         except models.URLPath.DoesNotExist:
@@ -197,3 +210,35 @@ def disable_signal_for_loaddata(signal_handler):
         return signal_handler(*args, **kwargs)
 
     return wrapper
+
+
+_bulk_delete = threading.local()
+
+
+@contextmanager
+def bulk_delete():
+    """
+    Context manager for deletes that remove whole subtrees at once. Signal
+    handlers decorated with :func:`disable_signal_for_bulk_delete` are skipped
+    inside the block, the caller takes care of what they would have done.
+    """
+    previous = getattr(_bulk_delete, "active", False)
+    _bulk_delete.active = True
+    try:
+        yield
+    finally:
+        _bulk_delete.active = previous
+
+
+def disable_signal_for_bulk_delete(signal_handler):
+    """
+    Decorator that turns off signal handlers inside :func:`bulk_delete`.
+    """
+
+    @wraps(signal_handler)
+    def wrapper(*args, **kwargs):
+        if getattr(_bulk_delete, "active", False):
+            return
+        return signal_handler(*args, **kwargs)
+
+    return wrapper
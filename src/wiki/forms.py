@@ -10,6 +10,7 @@ __all__ = [
     "TextInputPrepend",
     "CreateForm",
     "DeleteForm",
+    "DeletedArticlesForm",
     "PermissionsForm",
     "DirFilterForm",
     "SearchForm",
@@ -31,7 +32,7 @@ from django.utils.translation import gettext, gettext_lazy as _, pgettext_lazy
 from wiki import models
 from wiki.conf import settings
 from wiki.core import permissions
-from wiki.core.diff import simple_merge
+from wiki.core.diff import three_way_merge
 from wiki.core.plugins.base import PluginSettingsFormMixin
 from wiki.editors import getEditor
 
@@ -280,9 +281,20 @@ class EditForm(forms.Form, SpamProtectionMixin):
                     if provided_content:
                         self.presumed_revision = self.initial_revision.id
                     else:
-                        newdata["content"] = simple_merge(
-                            content, data.get("content", "")
-                        )
+                        # Merge the changes made since the revision that was
+                        # being edited
+                        base = None
+                        if str(self.presumed_revision).isdigit():
+                            base = current_revision.article.articlerevision_set.filter(
+                                id=self.presumed_revision
+                            ).first()
+                        newdata["content"] = three_way_merge(
+                            base.content if base else "",
+                            content,
+                            data.get("content", ""),
+                            gettext("current revision"),
+                            gettext("your changes"),
+                        )[0]
                     newdata["title"] = current_revision.title
                     kwargs["data"] = newdata
                 else:
@@ -423,6 +435,34 @@ class DeleteForm(forms.Form):
         return self.cleaned_data
 
 
+class DeletedArticlesForm(forms.Form):
+
+    """Restores or purges several deleted articles at once. The articles are
+    listed by the template, only the submitted ids are looked up."""
+
+    ACTION_RESTORE = "restore"
+    ACTION_PURGE = "purge"
+
+    action = forms.ChoiceField(
+        choices=((ACTION_RESTORE, _("Restore")), (ACTION_PURGE, _("Purge"))),
+        widget=HiddenInput(),
+    )
+    articles = forms.ModelMultipleChoiceField(
+        models.Article.objects.deleted(), widget=forms.MultipleHiddenInput()
+    )
+    confirm = forms.BooleanField(required=False, label=_("Yes, I am sure"))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get("action") == self.ACTION_PURGE and not cleaned_data.get(
+            "confirm"
+        ):
+            raise forms.ValidationError(
+                gettext("Purging cannot be undone, please confirm it.")
+            )
+        return cleaned_data
+
+
 class PermissionsForm(PluginSettingsFormMixin, forms.ModelForm):
 
     locked = forms.BooleanField(
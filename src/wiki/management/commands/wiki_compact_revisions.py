@@ -0,0 +1,62 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from wiki.models import Article
+from wiki.models import ArticleRevision
+
+
+class Command(BaseCommand):
+    help = (
+        "Store the revisions that are no longer current as deltas against "
+        "keyframes, see WIKI_REVISION_DELTA_STORAGE. Run it again after "
+        "changing WIKI_REVISION_KEYFRAME_INTERVAL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--expand",
+            action="store_true",
+            help="Store the full content of every revision again.",
+        )
+
+    def handle(self, *args, **options):
+        deltas = full = 0
+        articles = Article.objects.values_list("id", "current_revision_id")
+        for article_id, current_revision_id in articles.iterator():
+            with transaction.atomic():
+                for is_delta in self.compact_article(
+                    article_id, current_revision_id, options["expand"]
+                ):
+                    if is_delta:
+                        deltas += 1
+                    else:
+                        full += 1
+        self.stdout.write(
+            "{deltas:d} revisions are stored as deltas, {full:d} with full "
+            "content".format(deltas=deltas, full=full)
+        )
+
+    def compact_article(self, article_id, current_revision_id, expand):
+        """Yields whether each revision of the article is stored as a delta
+        after converting it."""
+        keyframe = None
+        revisions = ArticleRevision.objects.filter(article_id=article_id)
+        for revision in revisions.order_by("revision_number").iterator():
+            # Every revision keeps its content while it is converted, so the
+            # others can still be rebuilt from it whichever way they are
+            # stored at the moment
+            if keyframe is not None and revision.delta_base_id == keyframe.pk:
+                revision.delta_base = keyframe
+            keyframe_number = revision.get_keyframe_number()
+            if revision.revision_number == keyframe_number:
+                revision.expand()
+                keyframe = revision
+            elif (
+                expand
+                or revision.pk == current_revision_id
+                or keyframe is None
+                or keyframe.revision_number != keyframe_number
+            ):
+                revision.expand()
+            else:
+                revision.compact(keyframe)
+            yield revision.delta_base_id is not None
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from wiki.conf import settings
+from wiki.models import Article
+from wiki.models import ArticleRevision
+
+
+class Command(BaseCommand):
+    help = (
+        "Compress the content of the revisions that are no longer current "
+        "and aren't stored as deltas. It is decompressed when it is read."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--method",
+            choices=("zlib", "lzma"),
+            default=settings.REVISION_COMPRESSION,
+            help="How to compress the content, see WIKI_REVISION_COMPRESSION.",
+        )
+        parser.add_argument(
+            "--decompress",
+            action="store_true",
+            help="Store the content of every revision uncompressed again.",
+        )
+
+    def handle(self, *args, **options):
+        if options["decompress"]:
+            revisions = ArticleRevision.objects.exclude(compressed_content=None)
+            count = 0
+            for revision in revisions.iterator():
+                revision.decompress()
+                count += 1
+            self.stdout.write("{count:d} revisions decompressed".format(count=count))
+            return
+
+        revisions = ArticleRevision.objects.filter(
+            delta_base=None, compressed_content=None
+        ).exclude(
+            pk__in=Article.objects.exclude(current_revision=None).values(
+                "current_revision"
+            )
+        )
+        count = size = compressed_size = 0
+        for revision in revisions.iterator():
+            if revision.compress(options["method"]):
+                count += 1
+                size += len(revision.content.encode("utf-8"))
+                compressed_size += len(revision.compressed_content)
+        self.stdout.write(
+            "{count:d} revisions compressed from {size:d} to {compressed_size:d} "
+            "bytes".format(count=count, size=size, compressed_size=compressed_size)
+        )
@@ -0,0 +1,81 @@
+import gzip
+import lzma
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.core.management.base import CommandError
+from wiki.core.pruning import RetentionPolicy
+from wiki.core.pruning import RevisionPruner
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete old revisions to bound the history of every article: keep all "
+        "revisions of the last days, then the latest one of every day for a "
+        "while, then the latest one of every month. Current revisions are "
+        "always kept. Articles are pruned one at a time, so the wiki can stay "
+        "online."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep-all-days",
+            type=int,
+            default=30,
+            help="Keep every revision from this many days back (default: 30).",
+        )
+        parser.add_argument(
+            "--keep-daily-days",
+            type=int,
+            default=365,
+            help=(
+                "Keep the latest revision of every day from this many days back, "
+                "and of every month before that (default: 365)."
+            ),
+        )
+        parser.add_argument(
+            "--archive",
+            help=(
+                "Write the pruned revisions to this file as JSON lines, "
+                "compressed with gzip, or with lzma if it ends with .xz."
+            ),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="How many revisions to load or delete per query (default: 500).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the revisions that would be pruned.",
+        )
+
+    def handle(self, *args, **options):
+        if options["keep_daily_days"] < options["keep_all_days"]:
+            raise CommandError("--keep-daily-days must be at least --keep-all-days.")
+        policy = RetentionPolicy(
+            keep_all=timedelta(days=options["keep_all_days"]),
+            keep_daily=timedelta(days=options["keep_daily_days"]),
+        )
+        archive = None
+        if options["archive"] and not options["dry_run"]:
+            # Appending, so running again doesn't lose earlier archives
+            opener = lzma.open if options["archive"].endswith(".xz") else gzip.open
+            archive = opener(options["archive"], "at", encoding="utf-8")
+        try:
+            pruner = RevisionPruner(
+                policy, archive=archive, batch_size=options["batch_size"]
+            )
+            count = pruner.prune(dry_run=options["dry_run"])
+        finally:
+            if archive is not None:
+                archive.close()
+        if options["dry_run"]:
+            self.stdout.write("{count:d} revisions would be pruned".format(count=count))
+        else:
+            self.stdout.write(
+                "{count:d} revisions pruned, {expanded:d} stored with full content "
+                "again".format(count=count, expanded=pruner.expanded)
+            )
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.db.models import Exists
+from django.db.models import OuterRef
+from wiki.models import Article
+from wiki.models import ArticleRevision
+from wiki.models import RevisionContent
+
+
+class Command(BaseCommand):
+    help = (
+        "Store the content of the revisions that are no longer current once "
+        "for all the revisions with the same content, see "
+        "WIKI_REVISION_DEDUPLICATION. Revisions stored as deltas are left "
+        "alone. Shared content that no revision uses anymore is removed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--unshare",
+            action="store_true",
+            help="Store the content in every revision again.",
+        )
+
+    def handle(self, *args, **options):
+        if options["unshare"]:
+            revisions = ArticleRevision.objects.exclude(shared_content=None)
+            count = 0
+            for revision in revisions.iterator():
+                revision.unshare_content()
+                count += 1
+            self.stdout.write("{count:d} revisions unshared".format(count=count))
+        else:
+            revisions = ArticleRevision.objects.filter(delta_base=None).exclude(
+                pk__in=Article.objects.exclude(current_revision=None).values(
+                    "current_revision"
+                )
+            )
+            # Sharing content that only one revision has saves nothing
+            duplicates = (
+                revisions.values("content_hash")
+                .annotate(count=Count("id"))
+                .filter(count__gt=1)
+                .values("content_hash")
+            )
+            count = 0
+            for revision in revisions.filter(
+                content_hash__in=duplicates, shared_content=None
+            ).iterator():
+                if revision.share_content():
+                    count += 1
+            self.stdout.write(
+                "{count:d} revisions share their content now".format(count=count)
+            )
+
+        unused = RevisionContent.objects.filter(
+            ~Exists(ArticleRevision.objects.filter(shared_content=OuterRef("pk")))
+        )
+        deleted = unused.delete()[0]
+        self.stdout.write("{deleted:d} unused contents removed".format(deleted=deleted))
@@ -1,9 +1,25 @@
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.core.cache import cache
 from django.db import models
-from django.db.models import Count
+from django.db import transaction
 from django.db.models import Q
 from django.db.models.query import EmptyQuerySet
 from django.db.models.query import QuerySet
 from mptt.managers import TreeManager
+from wiki.conf import settings
+
+
+def user_group_ids(user):
+    """Return a subquery of the ids of the groups a user is member of.
+
+    Filtering with ``group__in=user_group_ids(user)`` instead of joining
+    through ``group__user`` keeps the outer query free of duplicate rows, so
+    no GROUP BY is needed to collapse them. The subquery does not depend on
+    the outer row, so the database only evaluates it once."""
+    Group = apps.get_model(settings.GROUP_MODEL)
+    return Group.objects.filter(user=user).values("pk")
 
 
 class ArticleQuerySet(QuerySet):
@@ -18,8 +34,8 @@ class ArticleQuerySet(QuerySet):
             q = self.filter(
                 Q(other_read=True)
                 | Q(owner=user)
-                | (Q(group__user=user) & Q(group_read=True))
-            ).annotate(Count("id"))
+                | Q(group_read=True, group__in=user_group_ids(user))
+            )
         return q
 
     def can_write(self, user):
@@ -33,13 +49,29 @@ class ArticleQuerySet(QuerySet):
             q = self.filter(
                 Q(other_write=True)
                 | Q(owner=user)
-                | (Q(group__user=user) & Q(group_write=True))
+                | Q(group_write=True, group__in=user_group_ids(user))
             )
         return q
 
     def active(self):
         return self.filter(current_revision__deleted=False)
 
+    def deleted(self):
+        return self.filter(current_revision__deleted=True)
+
+    def get_cache_keys(self):
+        """Returns the cache keys of every article in the queryset, see
+        Article.get_cache_keys"""
+        keys = []
+        for article in self.only("id", "current_revision"):
+            keys += article.get_cache_keys()
+        return keys
+
+    def clear_cache(self):
+        """Clears the cache of every article in the queryset with a single
+        cache round trip, see Article.clear_cache"""
+        cache.delete_many(self.get_cache_keys())
+
 
 class ArticleEmptyQuerySet(EmptyQuerySet):
     def can_read(self, user):
@@ -51,6 +83,9 @@ class ArticleEmptyQuerySet(EmptyQuerySet):
     def active(self):
         return self
 
+    def deleted(self):
+        return self
+
 
 class ArticleFkQuerySetMixin:
     def can_read(self, user):
@@ -61,12 +96,11 @@ class ArticleFkQuerySetMixin:
         if user.is_anonymous:
             q = self.filter(article__other_read=True)
         else:
-            # https://github.com/django-wiki/django-wiki/issues/67
             q = self.filter(
                 Q(article__other_read=True)
                 | Q(article__owner=user)
-                | (Q(article__group__user=user) & Q(article__group_read=True))
-            ).annotate(Count("id"))
+                | Q(article__group_read=True, article__group__in=user_group_ids(user))
+            )
         return q
 
     def can_write(self, user):
@@ -77,12 +111,11 @@ class ArticleFkQuerySetMixin:
         if user.is_anonymous:
             q = self.filter(article__other_write=True)
         else:
-            # https://github.com/django-wiki/django-wiki/issues/67
             q = self.filter(
                 Q(article__other_write=True)
                 | Q(article__owner=user)
-                | (Q(article__group__user=user) & Q(article__group_write=True))
-            ).annotate(Count("id"))
+                | Q(article__group_write=True, article__group__in=user_group_ids(user))
+            )
         return q
 
     def active(self):
@@ -108,6 +141,26 @@ class ArticleFkEmptyQuerySet(ArticleFkEmptyQuerySetMixin, EmptyQuerySet):
     pass
 
 
+#: The fields of ArticleRevision that hold its content, in whichever way it
+#: is stored
+REVISION_CONTENT_FIELDS = ("content", "delta", "compressed_content")
+
+
+class ArticleRevisionQuerySet(ArticleFkQuerySet):
+    def defer_content(self, *related):
+        """Defers loading the content of the revisions, and of the revisions
+        that are ``related`` to them and selected with them, for listing
+        revisions without transferring their text."""
+        return self.defer(
+            *REVISION_CONTENT_FIELDS,
+            *(
+                relation + "__" + field
+                for relation in related
+                for field in REVISION_CONTENT_FIELDS
+            )
+        )
+
+
 class ArticleManager(models.Manager):
     def get_empty_query_set(self):
         return self.get_queryset().none()
@@ -118,6 +171,9 @@ class ArticleManager(models.Manager):
     def active(self):
         return self.get_queryset().active()
 
+    def deleted(self):
+        return self.get_queryset().deleted()
+
     def can_read(self, user):
         return self.get_queryset().can_read(user)
 
@@ -142,6 +198,14 @@ class ArticleFkManager(models.Manager):
         return self.get_queryset().can_write(user)
 
 
+class ArticleRevisionManager(ArticleFkManager):
+    def get_queryset(self):
+        return ArticleRevisionQuerySet(self.model, using=self._db)
+
+    def defer_content(self, *related):
+        return self.get_queryset().defer_content(*related)
+
+
 class URLPathEmptyQuerySet(EmptyQuerySet, ArticleFkEmptyQuerySetMixin):
     def select_related_common(self):
         return self
@@ -174,6 +238,37 @@ class URLPathManager(TreeManager):
     def select_related_common(self):
         return self.get_queryset().common_select_related()
 
+    @contextmanager
+    def delay_tree_updates(self, full_rebuild=False):
+        """
+        Context manager for bulk operations on the tree, for instance when
+        importing articles with ``URLPath.create_urlpath`` or moving and
+        purging many nodes. Instead of renumbering the MPTT left/right values
+        for every single operation, the modified trees are rebuilt once when
+        the block exits. Everything happens in one transaction.
+
+        With ``full_rebuild=True``, MPTT updates are disabled altogether and
+        the whole table is rebuilt afterwards. This is cheaper when most trees
+        (i.e. sites) are touched.
+
+        NB! Tree queries such as ``get_descendants()`` are not reliable inside
+        the block, only the ``parent`` relation is.
+
+        Usage::
+
+            with URLPath.objects.delay_tree_updates():
+                for slug, title in pages:
+                    URLPath.create_urlpath(parent, slug, title=title)
+        """
+        with transaction.atomic(using=self.db):
+            if full_rebuild:
+                with self.disable_mptt_updates():
+                    yield
+                self.rebuild()
+            else:
+                with self.delay_mptt_updates():
+                    yield
+
     def active(self):
         return self.get_queryset().active()
 
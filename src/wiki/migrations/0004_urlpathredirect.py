@@ -0,0 +1,62 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:01
+
+import django.db.models.deletion
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("sites", "0002_alter_domain_unique"),
+        ("wiki", "0003_mptt_upgrade"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="URLPathRedirect",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "old_path",
+                    models.CharField(
+                        help_text="Path that should be redirected, for instance 'old/slug/'.",
+                        max_length=512,
+                        verbose_name="old path",
+                    ),
+                ),
+                (
+                    "created",
+                    models.DateTimeField(auto_now_add=True, verbose_name="created"),
+                ),
+                (
+                    "site",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="sites.site"
+                    ),
+                ),
+                (
+                    "urlpath",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="redirects",
+                        to="wiki.urlpath",
+                        verbose_name="redirect to",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "URL path redirect",
+                "verbose_name_plural": "URL path redirects",
+                "unique_together": {("site", "old_path")},
+            },
+        ),
+    ]
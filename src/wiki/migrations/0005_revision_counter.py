@@ -0,0 +1,53 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:10
+from django.db import migrations
+from django.db import models
+from django.db.models import Max
+from django.db.models import OuterRef
+from django.db.models import Subquery
+from django.db.models.functions import Coalesce
+
+
+def init_revision_counters(apps, schema_editor):
+    # Continue numbering after the highest existing revision number
+    for model_name, revision_model_name, fk in (
+        ("Article", "ArticleRevision", "article"),
+        ("RevisionPlugin", "RevisionPluginRevision", "plugin"),
+    ):
+        revisions = apps.get_model("wiki", revision_model_name).objects.filter(
+            **{fk: OuterRef("pk")}
+        )
+        apps.get_model("wiki", model_name).objects.update(
+            revision_counter=Coalesce(
+                Subquery(
+                    revisions.values(fk)
+                    .annotate(max_number=Max("revision_number"))
+                    .values("max_number")
+                ),
+                0,
+            )
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wiki", "0004_urlpathredirect"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="article",
+            name="revision_counter",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="revision counter"
+            ),
+        ),
+        migrations.AddField(
+            model_name="revisionplugin",
+            name="revision_counter",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="revision counter"
+            ),
+        ),
+        migrations.RunPython(init_revision_counters, migrations.RunPython.noop),
+    ]
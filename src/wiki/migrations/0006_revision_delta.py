@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:35
+import django.db.models.deletion
+import wiki.models.article
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wiki", "0005_revision_counter"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="articlerevision",
+            name="delta",
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name="articlerevision",
+            name="delta_base",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.RESTRICT,
+                related_name="+",
+                to="wiki.articlerevision",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="articlerevision",
+            name="content",
+            field=wiki.models.article.RevisionContentField(
+                blank=True, verbose_name="article contents"
+            ),
+        ),
+    ]
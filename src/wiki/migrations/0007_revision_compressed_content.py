@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:41
+from django.db import migrations
+from django.db import models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wiki", "0006_revision_delta"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="articlerevision",
+            name="compressed_content",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:24
+import django.db.models.deletion
+from django.db import migrations
+from django.db import models
+from wiki.core.compression import hash_text
+
+
+def hash_content(apps, schema_editor):
+    ArticleRevision = apps.get_model("wiki", "ArticleRevision")
+    # The content field of the historical model still rebuilds revisions
+    # stored as deltas and compressed ones
+    revisions = ArticleRevision.objects.select_related("delta_base").defer(
+        "delta_base__delta"
+    )
+    batch = []
+    for revision in revisions.iterator(chunk_size=500):
+        revision.content_hash = hash_text(revision.content)
+        batch.append(revision)
+        if len(batch) == 500:
+            ArticleRevision.objects.bulk_update(batch, ["content_hash"])
+            batch = []
+    ArticleRevision.objects.bulk_update(batch, ["content_hash"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wiki", "0007_revision_compressed_content"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RevisionContent",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "content_hash",
+                    models.CharField(editable=False, max_length=64, unique=True),
+                ),
+                ("content", models.TextField(blank=True, editable=False)),
+            ],
+            options={
+                "verbose_name": "revision content",
+                "verbose_name_plural": "revision contents",
+            },
+        ),
+        migrations.AddField(
+            model_name="articlerevision",
+            name="content_hash",
+            field=models.CharField(
+                blank=True, db_index=True, editable=False, max_length=64
+            ),
+        ),
+        migrations.AddField(
+            model_name="articlerevision",
+            name="shared_content",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="wiki.revisioncontent",
+            ),
+        ),
+        migrations.RunPython(hash_content, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,23 @@
+import threading
+from contextlib import contextmanager
+from functools import partial
+
 from django.conf import settings as django_settings
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.core.cache import cache
 from django.db import models
+from django.db import transaction
+from django.db.models import Exists
+from django.db.models import F
+from django.db.models import OuterRef
+from django.db.models import Q
 from django.db.models.fields import GenericIPAddressField as IPAddressField
+from django.db.models.query_utils import DeferredAttribute
 from django.db.models.signals import post_save
 from django.db.models.signals import pre_delete
 from django.db.models.signals import pre_save
+from django.dispatch import Signal
 from django.urls import reverse
 from django.utils import translation
 from django.utils.safestring import mark_safe
@@ -16,7 +27,13 @@ from mptt.models import MPTTModel
 from wiki import managers
 from wiki.conf import settings
 from wiki.core import permissions
+from wiki.core.compression import compress_text
+from wiki.core.compression import decompress_text
+from wiki.core.compression import hash_text
+from wiki.core.diff import apply_delta
+from wiki.core.diff import make_delta
 from wiki.core.markdown import article_markdown
+from wiki.decorators import disable_signal_for_bulk_delete
 from wiki.decorators import disable_signal_for_loaddata
 
 __all__ = [
@@ -24,10 +41,116 @@ __all__ = [
     "ArticleForObject",
     "ArticleRevision",
     "BaseRevisionMixin",
+    "RevisionContent",
+    "RevisionCounterMixin",
 ]
 
 
-class Article(models.Model):
+_write_batch = threading.local()
+
+#: Sent by the recursive permission methods of Article after they have
+#: updated ``fields``, a dict of field names and values, on the
+#: ``descendants`` of ``article``, a queryset, without saving them.
+descendants_updated = Signal()
+
+
+@contextmanager
+def batch_side_effects(using=None):
+    """
+    Runs the block in a transaction and holds back the side effects of the
+    writes in it. Callbacks passed to :func:`run_after_write`, like the
+    cache invalidation of saved articles and the notifications of new
+    revisions, run once after the transaction commits, and not at all if it
+    rolls back. Nested blocks join the outermost one.
+    """
+    if getattr(_write_batch, "callbacks", None) is not None:
+        yield
+        return
+    callbacks = _write_batch.callbacks = {}
+    _write_batch.using = using
+    try:
+        with transaction.atomic(using=using):
+            yield
+            # Registered last, so it runs after the callbacks are collected
+            transaction.on_commit(
+                lambda: [callback() for callback in callbacks.values()],
+                using=using,
+            )
+    finally:
+        _write_batch.callbacks = None
+
+
+def run_after_write(callback, key=None):
+    """
+    Runs ``callback`` after the writes of the current
+    :func:`batch_side_effects` block are committed, or right away outside of
+    one. Of the callbacks registered under the same ``key`` in a block, only
+    the last one runs. Callbacks registered in a savepoint that is rolled
+    back don't run.
+    """
+    callbacks = getattr(_write_batch, "callbacks", None)
+    if callbacks is None:
+        callback()
+    else:
+        # Collected on commit, so Django drops the callbacks of savepoints
+        # that are rolled back
+        transaction.on_commit(
+            partial(callbacks.__setitem__, object() if key is None else key, callback),
+            using=_write_batch.using,
+        )
+
+
+class RevisionCounterMixin(models.Model):
+
+    """Abstract model for objects that own revisions. Revision numbers are
+    handed out by ``revision_counter``, which is only ever changed with an
+    atomic increment in the database, so concurrent writers can never get
+    the same number."""
+
+    revision_counter = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_("revision counter"),
+    )
+
+    def reserve_revision_number(self):
+        """Increments ``revision_counter`` in the database and returns the
+        new value to be used as the number of the next revision."""
+        # With multi-table inheritance, the counter lives on the parent
+        model = self._meta.get_field("revision_counter").model
+        objects = model._base_manager.filter(pk=self.pk)
+        # The UPDATE locks the row until the transaction ends, so nobody
+        # else can increment the counter before we have read it back
+        with transaction.atomic(using=objects.db):
+            objects.update(revision_counter=F("revision_counter") + 1)
+            self.revision_counter = objects.values_list(
+                "revision_counter", flat=True
+            ).get()
+        return self.revision_counter
+
+    def save(self, *args, **kwargs):
+        # Never write back revision_counter when updating, our copy may be
+        # stale by now
+        if not (
+            self._state.adding
+            or kwargs.get("force_insert")
+            or kwargs.get("update_fields") is not None
+        ):
+            deferred_fields = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.attname
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred_fields
+                and field.name != "revision_counter"
+            ]
+        super().save(*args, **kwargs)
+
+    class Meta:
+        abstract = True
+
+
+class Article(RevisionCounterMixin, models.Model):
 
     objects = managers.ArticleManager()
 
@@ -85,6 +208,27 @@ class Article(models.Model):
         default=True, verbose_name=_("others write access")
     )
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Kept to tell if the current revision is changed before saving
+        instance._loaded_current_revision_id = instance.__dict__.get(
+            "current_revision_id"
+        )
+        return instance
+
+    def save(self, *args, **kwargs):
+        current_revision_id = self.__dict__.get("current_revision_id")
+        if current_revision_id is not None and current_revision_id != getattr(
+            self, "_loaded_current_revision_id", None
+        ):
+            # Queries on the content, like the search, only see the content
+            # column, so a revision that becomes current, e.g. when rolling
+            # back, has to keep its full content there
+            self.current_revision.store_content_inline()
+        super().save(*args, **kwargs)
+        self._loaded_current_revision_id = current_revision_id
+
     # PERMISSIONS
     def can_read(self, user):
         return permissions.can_read(self, user)
@@ -103,81 +247,141 @@ class Article(models.Model):
 
     def ancestor_objects(self):
         """NB! This generator is expensive, so use it with care!!"""
-        for obj in self.articleforobject_set.filter(is_mptt=True):
-            yield from obj.content_object.get_ancestors()
+        for urlpath in self.urlpath_set.all():
+            yield from urlpath.get_ancestors()
 
     def descendant_objects(self):
         """NB! This generator is expensive, so use it with care!!"""
-        for obj in self.articleforobject_set.filter(is_mptt=True):
-            yield from obj.content_object.get_descendants()
+        for urlpath in self.urlpath_set.all():
+            yield from urlpath.get_descendants()
 
     def get_children(self, max_num=None, user_can_read=None, **kwargs):
-        """NB! This generator is expensive, so use it with care!!"""
-        cnt = 0
-        for obj in self.articleforobject_set.filter(is_mptt=True):
-            if user_can_read:
-                objects = (
-                    obj.content_object.get_children()
-                    .filter(**kwargs)
-                    .can_read(user_can_read)
-                )
-            else:
-                objects = obj.content_object.get_children().filter(**kwargs)
-            for child in objects.order_by("articles__article__current_revision__title"):
-                cnt += 1
-                if max_num and cnt > max_num:
-                    return
-                yield child
-
-    # All recursive permission methods will use descendant_objects to access
-    # generic relations and check if they are using MPTT and have
+        """
+        Yields the children of the URL paths of this article, ordered by
+        title. All children up to ``max_num`` are fetched in one query, so
+        pass ``max_num`` if you don't need all of them.
+
+        :param user_can_read: Only include children readable by this user.
+        :param kwargs: Extra filters for the children.
+        """
+        from wiki.models.urlpath import URLPath
+
+        # URLPath.article always mirrors the generic relation, so filters
+        # written against articles__article are rewritten to skip the join
+        prefix = "articles__article__"
+        filters = {
+            "article__" + key[len(prefix) :] if key.startswith(prefix) else key: value
+            for key, value in kwargs.items()
+        }
+        children = URLPath.objects.filter(parent__article=self, **filters)
+        if user_can_read:
+            children = children.can_read(user_can_read)
+        children = children.select_related_common().order_by(
+            "article__current_revision__title"
+        )
+        if max_num:
+            children = children[:max_num]
+        yield from children
+
+    def ancestor_articles(self):
+        """Returns a queryset of the articles above this one in the URLPath
+        tree, found with a single query on the MPTT lft/rght values."""
+        from wiki.models.urlpath import URLPath
+
+        below = URLPath.objects.filter(
+            article=self,
+            tree_id=OuterRef("tree_id"),
+            lft__gt=OuterRef("lft"),
+            rght__lt=OuterRef("rght"),
+        )
+        return Article.objects.filter(
+            id__in=URLPath.objects.filter(Exists(below)).values("article_id")
+        )
+
+    def descendant_articles(self):
+        """Returns a queryset of the articles below this one in the URLPath
+        tree, selected by the MPTT lft/rght range instead of by walking it."""
+        from wiki.models.urlpath import URLPath
+
+        ranges = Q()
+        for urlpath in self.urlpath_set.all():
+            ranges |= Q(
+                tree_id=urlpath.tree_id, lft__gt=urlpath.lft, rght__lt=urlpath.rght
+            )
+        if not ranges:
+            return Article.objects.none()
+        return Article.objects.filter(
+            id__in=URLPath.objects.filter(ranges).values("article_id")
+        )
+
+    # The recursive permission methods copy fields to all descendants with a
+    # single UPDATE and clear their caches, and the children cache of this
+    # article, in one round trip. They bypass Article.save() and its
+    # signals, so copies of these fields elsewhere have to be updated by a
+    # receiver of descendants_updated. They only apply if URLPath has
     # INHERIT_PERMISSIONS=True
+    def _update_descendants(self, **fields):
+        from wiki.models.urlpath import URLPath
+
+        if not URLPath.INHERIT_PERMISSIONS:
+            return
+        descendants = self.descendant_articles()
+        descendants.update(**fields)
+        cache.delete_many(descendants.get_cache_keys() + self.get_cache_keys())
+        descendants_updated.send(
+            sender=Article, article=self, descendants=descendants, fields=fields
+        )
+
     def set_permissions_recursive(self):
-        for descendant in self.descendant_objects():
-            if descendant.INHERIT_PERMISSIONS:
-                descendant.article.group_read = self.group_read
-                descendant.article.group_write = self.group_write
-                descendant.article.other_read = self.other_read
-                descendant.article.other_write = self.other_write
-                descendant.article.save()
+        self._update_descendants(
+            group_read=self.group_read,
+            group_write=self.group_write,
+            other_read=self.other_read,
+            other_write=self.other_write,
+        )
 
     def set_group_recursive(self):
-        for descendant in self.descendant_objects():
-            if descendant.INHERIT_PERMISSIONS:
-                descendant.article.group = self.group
-                descendant.article.save()
+        self._update_descendants(group=self.group)
 
     def set_owner_recursive(self):
-        for descendant in self.descendant_objects():
-            if descendant.INHERIT_PERMISSIONS:
-                descendant.article.owner = self.owner
-                descendant.article.save()
+        self._update_descendants(owner=self.owner)
 
     def add_revision(self, new_revision, save=True):
         """
         Sets the properties of a revision and ensures its the current
         revision.
+
+        The revision and the article are saved in one transaction. Cache
+        invalidation and notifications are held back until it commits, see
+        :func:`batch_side_effects`.
         """
         assert self.id or save, (
             "Article.add_revision: Sorry, you cannot add a"
             "revision to an article that has not been saved "
             "without using save=True"
         )
-        if not self.id:
-            self.save()
-        revisions = self.articlerevision_set.all()
-        try:
-            new_revision.revision_number = revisions.latest().revision_number + 1
-        except ArticleRevision.DoesNotExist:
-            new_revision.revision_number = 0
-        new_revision.article = self
-        new_revision.previous_revision = self.current_revision
-        if save:
-            new_revision.clean()
-            new_revision.save()
-        self.current_revision = new_revision
-        if save:
-            self.save()
+        with batch_side_effects():
+            if not self.id:
+                # Nobody else can add revisions to an article that is only
+                # being created now
+                self.revision_counter = 1
+                self.save()
+                new_revision.revision_number = 1
+            else:
+                new_revision.revision_number = self.reserve_revision_number()
+            new_revision.article = self
+            new_revision.previous_revision = self.current_revision
+            if save:
+                new_revision.clean()
+                new_revision.save()
+                previous_revision = new_revision.previous_revision
+                if settings.REVISION_DELTA_STORAGE and previous_revision:
+                    previous_revision.compact()
+                if settings.REVISION_DEDUPLICATION and previous_revision:
+                    previous_revision.share_content()
+            self.current_revision = new_revision
+            if save:
+                self.save()
 
     def add_object_relation(self, obj):
         return ArticleForObject.objects.get_or_create(
@@ -225,7 +429,7 @@ class Article(models.Model):
         lang = translation.get_language()
 
         key_raw = "wiki-article-{id}-{lang}".format(
-            id=self.current_revision.id if self.current_revision else self.id, lang=lang
+            id=self.current_revision_id or self.id, lang=lang
         )
         # https://github.com/django-wiki/django-wiki/issues/1065
         return slugify(key_raw, allow_unicode=True)
@@ -268,13 +472,107 @@ class Article(models.Model):
 
         return mark_safe(cached_content)
 
+    def get_children_cache_key(self, permission_class=None):
+        """Returns the per-article key for cached children, or the key of the
+        children cached for ``permission_class``, see
+        ``get_children_permission_class``."""
+        key_raw = "wiki-article-children-{id}".format(id=self.id)
+        if permission_class is not None:
+            key_raw = "{key}-{permission_class}".format(
+                key=key_raw, permission_class=permission_class
+            )
+        return slugify(key_raw, allow_unicode=True)
+
+    def get_restricted_children(self):
+        """Returns the owner and group ids of the children that not everybody
+        can read, as a list of pairs. The group id is None if the group can't
+        read the child either."""
+        from wiki.models.urlpath import URLPath
+
+        return [
+            (owner_id, group_id if group_read else None)
+            for owner_id, group_id, group_read in URLPath.objects.filter(
+                parent__article=self, article__other_read=False
+            ).values_list(
+                "article__owner_id", "article__group_id", "article__group_read"
+            )
+        ]
+
+    def get_children_permission_class(self, user, restricted):
+        """Returns a name for the users that can read the same children as
+        ``user``, given the ``restricted`` children found by
+        ``get_restricted_children``. Unless some children are restricted,
+        that is everybody. Otherwise anonymous users share one class,
+        moderators share another since they can read everything, owners of
+        restricted children get their own and other users share one for each
+        set of groups of restricted children that they are in."""
+        if not restricted:
+            return "everybody"
+        if user.is_anonymous:
+            return "anonymous"
+        context = permissions.get_permission_context(user)
+        if context.has_perm("wiki.moderate"):
+            return "moderator"
+        if any(owner_id == user.pk for owner_id, group_id in restricted):
+            return "user-{id}".format(id=user.pk)
+        group_ids = sorted(
+            {
+                group_id
+                for owner_id, group_id in restricted
+                if group_id in context.group_ids
+            }
+        )
+        return "groups-{ids}".format(ids="-".join(map(str, group_ids)))
+
+    def get_cached_children(self, user, max_num=None):
+        """Returns a list of the children that ``user`` can read and that
+        aren't deleted, like ``get_children``.
+
+        The cache works like in ``get_cached_content``: A "per-article" entry
+        lists the keys of the "per-permission-class" entries holding the
+        children, and deleting the per-article entry invalidates them all.
+        It also holds the restricted children, which decide the permission
+        class of a user. It is deleted by ``clear_cache``, which runs whenever
+        a child or one of its ancestors is saved, moved or deleted."""
+        cache_key = self.get_children_cache_key()
+        cached = cache.get(cache_key)
+        if cached is None:
+            cached = {"restricted": self.get_restricted_children(), "keys": []}
+        cache_children_key = "{key}-{max_num}".format(
+            key=self.get_children_cache_key(
+                self.get_children_permission_class(user, cached["restricted"])
+            ),
+            max_num=max_num or "all",
+        )
+
+        if cache_children_key in cached["keys"]:
+            children = cache.get(cache_children_key)
+            if children is not None:
+                return children
+
+        children = list(
+            self.get_children(
+                max_num=max_num,
+                user_can_read=user,
+                article__current_revision__deleted=False,
+            )
+        )
+        cached["keys"].append(cache_children_key)
+        cache.set(cache_key, cached, settings.CACHE_TIMEOUT)
+        cache.set(cache_children_key, children, settings.CACHE_TIMEOUT)
+
+        return children
+
+    def get_cache_keys(self):
+        """Returns the per-article keys that ``clear_cache`` deletes."""
+        return [self.get_cache_key(), self.get_children_cache_key()]
+
     def clear_cache(self):
-        cache.delete(self.get_cache_key())
+        cache.delete_many(self.get_cache_keys())
 
     def get_url_kwargs(self):
-        urlpaths = self.urlpath_set.all()
-        if urlpaths.exists():
-            return {"path": urlpaths[0].path}
+        for urlpath in self.urlpath_set.select_related("parent")[:1]:
+            return {"path": urlpath.path}
         return {"article_id": self.id}
 
     def get_absolute_url(self):
@@ -368,30 +666,128 @@ class BaseRevisionMixin(models.Model):
 
         :param: predecessor is an instance of whatever object for which
         object.current_revision implements BaseRevisionMixin.
+
+        The revision number is not inherited, it is reserved from the
+        object's ``revision_counter`` when the revision is saved.
         """
         predecessor = predecessor.current_revision
         self.previous_revision = predecessor
         self.deleted = predecessor.deleted
         self.locked = predecessor.locked
-        self.revision_number = predecessor.revision_number + 1
 
     class Meta:
         abstract = True
 
 
+class RevisionContentDescriptor(DeferredAttribute):
+
+    """Rebuilds the content of revisions that are stored as a delta,
+    compressed or shared when it is first read, see ArticleRevision.compact(),
+    ArticleRevision.compress() and ArticleRevision.share_content()"""
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        content = super().__get__(instance, cls)
+        if not content:
+            if instance.delta_base_id is not None:
+                content = apply_delta(instance.delta_base.content, instance.delta)
+            # Historical models in migrations may not have these fields yet
+            elif getattr(instance, "compressed_content", None) is not None:
+                content = decompress_text(instance.compressed_content)
+            elif getattr(instance, "shared_content_id", None) is not None:
+                content = instance.shared_content.content
+            else:
+                return content
+            instance.__dict__[self.field.attname] = content
+            # Kept to tell if the content is changed afterwards
+            instance.__dict__["_stored_content"] = content
+        return content
+
+    def __set__(self, instance, value):
+        # Being a data descriptor makes sure __get__ is called even when the
+        # value is loaded
+        instance.__dict__[self.field.attname] = value
+
+
+class RevisionContentField(models.TextField):
+
+    """The content of an ArticleRevision. The column is left empty for
+    revisions stored as a delta, compressed or shared."""
+
+    descriptor_class = RevisionContentDescriptor
+
+    def pre_save(self, model_instance, add):
+        if (
+            model_instance.delta_base_id is not None
+            or getattr(model_instance, "compressed_content", None) is not None
+            or getattr(model_instance, "shared_content_id", None) is not None
+        ):
+            return ""
+        return super().pre_save(model_instance, add)
+
+
+class RevisionContent(models.Model):
+
+    """Content that is stored once for all the revisions that have it, see
+    ArticleRevision.share_content()"""
+
+    content_hash = models.CharField(max_length=64, unique=True, editable=False)
+    content = models.TextField(blank=True, editable=False)
+
+    def __str__(self):
+        return self.content_hash
+
+    class Meta:
+        verbose_name = _("revision content")
+        verbose_name_plural = _("revision contents")
+
+
 class ArticleRevision(BaseRevisionMixin, models.Model):
 
     """This is where main revision data is stored. To make it easier to
     copy, do NEVER create m2m relationships."""
 
-    objects = managers.ArticleFkManager()
+    objects = managers.ArticleRevisionManager()
 
     article = models.ForeignKey(
         "Article", on_delete=models.CASCADE, verbose_name=_("article")
     )
 
     # This is where the content goes, with whatever markup language is used
-    content = models.TextField(blank=True, verbose_name=_("article contents"))
+    content = RevisionContentField(blank=True, verbose_name=_("article contents"))
+
+    # With delta storage, revisions that are no longer current keep their
+    # content as a delta against a keyframe revision, see compact()
+    delta_base = models.ForeignKey(
+        "self",
+        blank=True,
+        null=True,
+        editable=False,
+        on_delete=models.RESTRICT,
+        related_name="+",
+    )
+    delta = models.TextField(blank=True, editable=False)
+
+    # Revisions that are rarely read can keep their content compressed
+    # instead, see compress()
+    compressed_content = models.BinaryField(blank=True, null=True, editable=False)
+
+    # Or they can share one copy of their content with every revision that
+    # has the same, see share_content()
+    shared_content = models.ForeignKey(
+        RevisionContent,
+        blank=True,
+        null=True,
+        editable=False,
+        on_delete=models.PROTECT,
+        related_name="+",
+    )
+
+    # The SHA-256 of the content, whichever way it is stored
+    content_hash = models.CharField(
+        max_length=64, blank=True, editable=False, db_index=True
+    )
 
     # This title is automatically set from either the article's title or
     # the last used revision...
@@ -416,6 +812,60 @@ class ArticleRevision(BaseRevisionMixin, models.Model):
     def __str__(self):
         return "%s (%d)" % (self.title, self.revision_number)
 
+    def save(self, *args, **kwargs):
+        content_hash = self.content_hash
+        if not self.has_inline_content() and self.content_changed():
+            # Changed content replaces the delta, compressed or shared one
+            self.delta_base = None
+            self.delta = ""
+            self.compressed_content = None
+            self.shared_content = None
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None and "content" in update_fields:
+                kwargs["update_fields"] = set(update_fields) | {
+                    "delta_base",
+                    "delta",
+                    "compressed_content",
+                    "shared_content",
+                }
+        # The content of revisions stored any other way doesn't change, so
+        # there is no need to rebuild it
+        if (
+            "content" not in self.get_deferred_fields() and self.has_inline_content()
+        ) or not self.content_hash:
+            self.content_hash = hash_text(self.content)
+            update_fields = kwargs.get("update_fields")
+            if update_fields is not None and "content" in update_fields:
+                kwargs["update_fields"] = set(update_fields) | {"content_hash"}
+        update_fields = kwargs.get("update_fields")
+        if (
+            not self._state.adding
+            and self.content_hash != content_hash
+            and (update_fields is None or "content" in update_fields)
+        ):
+            # Deltas against this revision have to be expanded while it still
+            # has its old content, or they would rebuild as other text
+            with transaction.atomic(using=self._state.db):
+                self.expand_deltas()
+                super().save(*args, **kwargs)
+            return
+        super().save(*args, **kwargs)
+
+    def content_changed(self):
+        """Returns whether ``content`` was assigned something else than the
+        content stored as a delta, compressed or shared."""
+        content = self.__dict__.get("content")
+        return bool(content) and content != self.__dict__.get("_stored_content")
+
+    def has_inline_content(self):
+        """Returns whether the content is stored in the ``content`` column,
+        rather than as a delta, compressed or shared."""
+        return (
+            self.delta_base_id is None
+            and self.compressed_content is None
+            and self.shared_content_id is None
+        )
+
     def clean(self):
         # Enforce DOS line endings \r\n. It is the standard for web browsers,
         # but when revisions are created programatically, they might
@@ -434,6 +884,177 @@ class ArticleRevision(BaseRevisionMixin, models.Model):
         self.deleted = predecessor.deleted
         self.locked = predecessor.locked
 
+    def get_common_ancestor(self, other):
+        """
+        Returns the latest revision that both this revision and ``other``
+        were made from, following ``previous_revision``. That may be either
+        of them, or None if they don't share any history.
+
+        The history of the article is loaded in one query.
+        """
+        previous = dict(
+            ArticleRevision.objects.filter(article_id=self.article_id).values_list(
+                "id", "previous_revision_id"
+            )
+        )
+        ancestors = set()
+        revision_id = self.pk
+        while revision_id is not None and revision_id not in ancestors:
+            ancestors.add(revision_id)
+            revision_id = previous.get(revision_id)
+        visited = set()
+        revision_id = other.pk
+        while revision_id not in ancestors:
+            if revision_id is None or revision_id in visited:
+                return None
+            visited.add(revision_id)
+            revision_id = previous.get(revision_id)
+        return ArticleRevision.objects.get(pk=revision_id)
+
+    def get_keyframe_number(self):
+        """Returns the number of the revision that this one is stored against
+        with delta storage, see ``REVISION_KEYFRAME_INTERVAL``."""
+        interval = settings.REVISION_KEYFRAME_INTERVAL
+        return (self.revision_number - 1) // interval * interval + 1
+
+    def compact(self, keyframe=None):
+        """
+        Stores the content as a delta against ``keyframe``, an older revision
+        of the same article that keeps its full content. Without
+        ``keyframe``, the revision numbered :meth:`get_keyframe_number` is
+        used, if it exists and isn't this one. Returns whether the revision
+        is stored as a delta now.
+
+        The revision must not be current: the search and other queries on
+        ``content`` only see the full content.
+        """
+        if keyframe is None:
+            keyframe_number = self.get_keyframe_number()
+            if keyframe_number == self.revision_number:
+                return False
+            keyframe = ArticleRevision.objects.filter(
+                article_id=self.article_id,
+                revision_number=keyframe_number,
+                delta_base=None,
+            ).first()
+            if keyframe is None:
+                return False
+        if self.delta_base_id != keyframe.pk:
+            content = self.content
+            self.delta = make_delta(keyframe.content, content)
+            self.delta_base = keyframe
+            self.compressed_content = None
+            self.shared_content = None
+            ArticleRevision.objects.filter(pk=self.pk).update(
+                content="",
+                delta=self.delta,
+                delta_base=keyframe,
+                compressed_content=None,
+                shared_content=None,
+            )
+        return True
+
+    def expand(self):
+        """Stores the full content again if it is stored as a delta."""
+        if self.delta_base_id is not None:
+            content = self.content
+            self.delta = ""
+            self.delta_base = None
+            ArticleRevision.objects.filter(pk=self.pk).update(
+                content=content, delta="", delta_base=None
+            )
+
+    def expand_deltas(self):
+        """Stores the full content again in the revisions that are stored as
+        a delta against this one. Done by save() before the content of this
+        revision is changed."""
+        revisions = ArticleRevision.objects.filter(delta_base_id=self.pk)
+        for revision in revisions.select_related("delta_base"):
+            revision.expand()
+
+    def compress(self, method=None):
+        """
+        Stores the content compressed with ``method``, by default
+        ``REVISION_COMPRESSION``. Revisions stored as a delta or shared and
+        empty ones are left alone. Returns whether the revision is compressed
+        now.
+
+        The revision must not be current: the search and other queries on
+        ``content`` only see the uncompressed content.
+        """
+        if self.delta_base_id is not None or self.shared_content_id is not None:
+            return False
+        if self.compressed_content is None:
+            content = self.content
+            if not content:
+                return False
+            self.compressed_content = compress_text(
+                content, method or settings.REVISION_COMPRESSION
+            )
+            ArticleRevision.objects.filter(pk=self.pk).update(
+                content="", compressed_content=self.compressed_content
+            )
+        return True
+
+    def decompress(self):
+        """Stores the content uncompressed again if it is compressed."""
+        if self.compressed_content is not None:
+            content = self.content
+            self.compressed_content = None
+            ArticleRevision.objects.filter(pk=self.pk).update(
+                content=content, compressed_content=None
+            )
+
+    def share_content(self):
+        """
+        Stores the content in the :class:`RevisionContent` with its hash,
+        which every revision with the same content shares, so identical texts
+        are only stored once. Compressed content is shared uncompressed.
+        Revisions stored as a delta and empty ones are left alone. Returns
+        whether the content is shared now.
+
+        The revision must not be current: the search and other queries on
+        ``content`` only see the content stored in the revision.
+        """
+        if self.delta_base_id is not None:
+            return False
+        if self.shared_content_id is None:
+            content = self.content
+            if not content:
+                return False
+            self.content_hash = hash_text(content)
+            self.shared_content = RevisionContent.objects.get_or_create(
+                content_hash=self.content_hash, defaults={"content": content}
+            )[0]
+            self.compressed_content = None
+            ArticleRevision.objects.filter(pk=self.pk).update(
+                content="",
+                compressed_content=None,
+                shared_content=self.shared_content,
+                content_hash=self.content_hash,
+            )
+        return True
+
+    def store_content_inline(self):
+        """Stores the full, uncompressed content in the revision again,
+        however it is stored. Done by Article.save() for the revision that
+        becomes current."""
+        self.expand()
+        self.decompress()
+        self.unshare_content()
+
+    def unshare_content(self):
+        """Stores the content in the revision again if it is shared. The
+        :class:`RevisionContent` is left for the other revisions, see the
+        ``wiki_share_revision_content`` management command for removing the
+        ones that aren't used anymore."""
+        if self.shared_content_id is not None:
+            content = self.content
+            self.shared_content = None
+            ArticleRevision.objects.filter(pk=self.pk).update(
+                content=content, shared_content=None
+            )
+
     class Meta:
         get_latest_by = "revision_number"
         ordering = ("created",)
@@ -446,20 +1067,25 @@ class ArticleRevision(BaseRevisionMixin, models.Model):
 
 # clear the ancestor cache when saving or deleting articles so things like
 # article_lists will be refreshed
-def _clear_ancestor_cache(article):
-    for ancestor in article.ancestor_objects():
-        ancestor.article.clear_cache()
+def _clear_article_cache(article):
+    # One query for the ancestors and one cache round trip, however deep
+    # the article is
+    cache.delete_many(
+        article.ancestor_articles().get_cache_keys() + article.get_cache_keys()
+    )
 
 
 @disable_signal_for_loaddata
 def on_article_save_clear_cache(instance, **kwargs):
-    on_article_delete_clear_cache(instance, **kwargs)
+    run_after_write(
+        partial(_clear_article_cache, instance), key=("clear_cache", instance.pk)
+    )
 
 
 @disable_signal_for_loaddata
+@disable_signal_for_bulk_delete
 def on_article_delete_clear_cache(instance, **kwargs):
-    _clear_ancestor_cache(instance)
-    instance.clear_cache()
+    _clear_article_cache(instance)
 
 
 @disable_signal_for_loaddata
@@ -476,11 +1102,7 @@ def on_article_revision_pre_save(**kwargs):
             instance.previous_revision = instance.article.current_revision
 
     if not instance.revision_number:
-        try:
-            previous_revision = instance.article.articlerevision_set.latest()
-            instance.revision_number = previous_revision.revision_number + 1
-        except ArticleRevision.DoesNotExist:
-            instance.revision_number = 1
+        instance.revision_number = instance.article.reserve_revision_number()
 
 
 @disable_signal_for_loaddata
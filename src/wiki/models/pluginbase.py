@@ -25,6 +25,7 @@ from wiki.decorators import disable_signal_for_loaddata
 
 from .article import ArticleRevision
 from .article import BaseRevisionMixin
+from .article import RevisionCounterMixin
 
 __all__ = [
     "ArticlePlugin",
@@ -152,7 +153,7 @@ class SimplePlugin(ArticlePlugin):
         return _("A plugin was changed")
 
 
-class RevisionPlugin(ArticlePlugin):
+class RevisionPlugin(RevisionCounterMixin, ArticlePlugin):
 
     """
     If you want your plugin to maintain revisions, extend from this one,
@@ -187,12 +188,11 @@ class RevisionPlugin(ArticlePlugin):
             "without using save=True"
         )
         if not self.id:
+            self.revision_counter = 1
             self.save()
-        revisions = self.revision_set.all()
-        try:
-            new_revision.revision_number = revisions.latest().revision_number + 1
-        except RevisionPluginRevision.DoesNotExist:
-            new_revision.revision_number = 0
+            new_revision.revision_number = 1
+        else:
+            new_revision.revision_number = self.reserve_revision_number()
         new_revision.plugin = self
         new_revision.previous_revision = self.current_revision
         if save:
@@ -307,11 +307,7 @@ def on_revision_plugin_revision_pre_save(**kwargs):
             instance.previous_revision = instance.plugin.current_revision
 
     if not instance.revision_number:
-        try:
-            previous_revision = instance.plugin.revision_set.latest()
-            instance.revision_number = previous_revision.revision_number + 1
-        except RevisionPluginRevision.DoesNotExist:
-            instance.revision_number = 1
+        instance.revision_number = instance.plugin.reserve_revision_number()
 
 
 @disable_signal_for_loaddata
@@ -7,8 +7,11 @@ from django.contrib.sites.models import Site
 from django.core.exceptions import ValidationError
 from django.db import models
 from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete
 from django.db.models.signals import post_save
 from django.db.models.signals import pre_delete
+from django.db.models.signals import pre_save
 from django.urls import reverse
 from django.utils.translation import gettext
 from django.utils.translation import gettext_lazy as _
@@ -18,6 +21,8 @@ from wiki import managers
 from wiki.conf import settings
 from wiki.core.exceptions import MultipleRootURLs
 from wiki.core.exceptions import NoRootURL
+from wiki.decorators import bulk_delete
+from wiki.decorators import disable_signal_for_bulk_delete
 from wiki.decorators import disable_signal_for_loaddata
 from wiki.models.article import Article
 from wiki.models.article import ArticleForObject
@@ -25,6 +30,7 @@ from wiki.models.article import ArticleRevision
 
 __all__ = [
     "URLPath",
+    "URLPathRedirect",
 ]
 
 
@@ -91,6 +97,14 @@ class URLPath(MPTTModel):
         related_name="moved_from",
     )
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Kept to tell if the node is moved before saving
+        if "parent_id" in instance.__dict__:
+            instance._loaded_parent_id = instance.parent_id
+        return instance
+
     def __cached_ancestors(self):
         """
         This returns the ancestors of this urlpath. These ancestors are hopefully
@@ -104,9 +118,9 @@ class URLPath(MPTTModel):
         # "not self.pk": HACK needed till PR#591 is included in all supported django-mptt
         #   versions. Prevent accessing a deleted URLPath when deleting it from the admin
         #   interface.
-        if not self.pk or not self.get_ancestors().exists():
+        if not self.pk:
             self._cached_ancestors = []
-        if not hasattr(self, "_cached_ancestors"):
+        elif not hasattr(self, "_cached_ancestors"):
             self._cached_ancestors = list(self.get_ancestors().select_related_common())
 
         return self._cached_ancestors
@@ -147,8 +161,31 @@ class URLPath(MPTTModel):
 
     @transaction.atomic
     def _delete_subtree(self):
-        for descendant in self.get_descendants(include_self=True).order_by("-level"):
-            descendant.article.delete()
+        # Use the current tree values from the database, ours might be stale
+        self.refresh_from_db(fields=["lft", "rght", "tree_id"])
+        subtree = URLPath.objects.filter(
+            tree_id=self.tree_id, lft__gte=self.lft, rght__lte=self.rght
+        )
+        articles = Article.objects.filter(id__in=subtree.values("article_id"))
+        # The ancestors list the deleted section in their cached children.
+        # Clear those and the subtree's own caches in one go rather than
+        # walking the ancestors once for every deleted article.
+        Article.objects.filter(
+            Q(id__in=articles.values("id"))
+            | Q(urlpath__in=self.get_ancestors().values("id"))
+        ).clear_cache()
+        # Every descendant goes as well, so there is nothing to move to
+        # lost-and-found. Deleting the articles as one queryset lets the
+        # collector remove revisions, plugins and URLPaths in batched
+        # statements; the delete handlers of attachments and images still
+        # run and remove their files.
+        with bulk_delete():
+            articles.delete()
+        # The URLPaths are removed by the cascading article deletes, which
+        # bypass MPTTModel.delete(), so close the gap they leave in the tree
+        # here. Inside URLPath.objects.delay_tree_updates() this only marks the
+        # tree for the rebuild at the end of the block.
+        URLPath.objects._close_gap(self.rght - self.lft + 1, self.rght, self.tree_id)
 
     def delete_subtree(self):
         """
@@ -276,6 +313,10 @@ class URLPath(MPTTModel):
         Creates a new urlpath with an article and a new revision for the
         article
 
+        When creating many urlpaths, wrap the calls in
+        ``URLPath.objects.delay_tree_updates()`` so the tree is only
+        renumbered once.
+
         :returns: A new URLPath instance
         """
         if not site:
@@ -339,6 +380,93 @@ class URLPath(MPTTModel):
         return self.children.order_by("slug")
 
 
+class URLPathRedirect(models.Model):
+
+    """
+    A lightweight redirect from a path that no longer exists to the
+    :class:`URLPath` that used to live there. Redirects are created when
+    moving articles and are only consulted when a path lookup misses, so they
+    cost a single indexed lookup and do not add nodes to the URLPath tree.
+
+    Since ``urlpath`` is a foreign key, the redirect keeps pointing to the
+    right place if the target is moved again later on.
+    """
+
+    site = models.ForeignKey(Site, on_delete=models.CASCADE)
+    old_path = models.CharField(
+        verbose_name=_("old path"),
+        max_length=512,
+        help_text=_("Path that should be redirected, for instance 'old/slug/'."),
+    )
+    urlpath = models.ForeignKey(
+        URLPath,
+        on_delete=models.CASCADE,
+        verbose_name=_("redirect to"),
+        related_name="redirects",
+    )
+    created = models.DateTimeField(auto_now_add=True, verbose_name=_("created"))
+
+    class Meta:
+        verbose_name = _("URL path redirect")
+        verbose_name_plural = _("URL path redirects")
+        unique_together = ("site", "old_path")
+
+    def __str__(self):
+        return "%s -> %s" % (self.old_path, self.urlpath)
+
+    @staticmethod
+    def normalize_path(path):
+        """Returns ``path`` in the same form as :attr:`URLPath.path`"""
+        path = path.strip("/")
+        if not settings.URL_CASE_SENSITIVE:
+            path = path.lower()
+        return path + "/" if path else ""
+
+    @classmethod
+    def get_target(cls, path, site=None):
+        """
+        Returns the URLPath that ``path`` redirects to, or None if there is no
+        redirect for it.
+        """
+        if not site:
+            site = Site.objects.get_current()
+        redirect = (
+            cls.objects.filter(site=site, old_path=cls.normalize_path(path))
+            .select_related("urlpath")
+            .first()
+        )
+        return redirect.urlpath if redirect else None
+
+    @classmethod
+    @transaction.atomic
+    def create_for_move(cls, urlpath, old_path):
+        """
+        Creates a redirect from ``old_path`` to ``urlpath`` and from the old
+        location of every descendant to its new location. Call this after
+        ``urlpath`` has been moved.
+
+        :returns: The number of redirects created
+        """
+        site = urlpath.site
+        old_path = cls.normalize_path(old_path)
+        redirects = {old_path: cls(site=site, old_path=old_path, urlpath=urlpath)}
+        # Paths relative to the moved urlpath. Descendants come in tree order,
+        # so a parent is always seen before its children.
+        relative_paths = {urlpath.pk: ""}
+        for descendant in urlpath.get_descendants():
+            relative_path = relative_paths[descendant.parent_id] + (
+                descendant.slug or ""
+            )
+            relative_paths[descendant.pk] = relative_path + "/"
+            src_path = cls.normalize_path(old_path + relative_path)
+            redirects[src_path] = cls(site=site, old_path=src_path, urlpath=descendant)
+        # An old redirect may already exist for one of the paths, in which case
+        # it is replaced by the most recent move.
+        cls.objects.filter(site=site, old_path__in=redirects.keys()).delete()
+        cls.objects.bulk_create(redirects.values())
+        return len(redirects)
+
+
 ######################################################
 # SIGNAL HANDLERS
 ######################################################
@@ -360,6 +488,49 @@ def on_article_relation_save(**kwargs):
 post_save.connect(on_article_relation_save, ArticleForObject)
 
 
+def _clear_parent_cache(parent_id):
+    # The parent article caches its children, see Article.get_cached_children
+    if parent_id is None:
+        return
+    for article in Article.objects.filter(urlpath__id=parent_id).select_related(
+        "current_revision"
+    ):
+        article.clear_cache()
+
+
+@disable_signal_for_loaddata
+def on_urlpath_pre_save(instance, **kwargs):
+    if instance._state.adding:
+        return
+    try:
+        old_parent_id = instance._loaded_parent_id
+    except AttributeError:
+        # Loaded without its parent
+        old_parent_id = (
+            URLPath.objects.filter(pk=instance.pk)
+            .values_list("parent_id", flat=True)
+            .first()
+        )
+    if old_parent_id != instance.parent_id:
+        _clear_parent_cache(old_parent_id)
+
+
+@disable_signal_for_loaddata
+def on_urlpath_save_clear_cache(instance, **kwargs):
+    instance._loaded_parent_id = instance.parent_id
+    _clear_parent_cache(instance.parent_id)
+
+
+@disable_signal_for_bulk_delete
+def on_urlpath_delete_clear_cache(instance, **kwargs):
+    _clear_parent_cache(instance.parent_id)
+
+
+pre_save.connect(on_urlpath_pre_save, URLPath)
+post_save.connect(on_urlpath_save_clear_cache, URLPath)
+post_delete.connect(on_urlpath_delete_clear_cache, URLPath)
+
+
 class Namespace:
     # An instance of Namespace simulates "nonlocal variable_name" declaration
     # in any nested function, that is possible in Python 3. It allows assigning
@@ -367,6 +538,7 @@ class Namespace:
     pass
 
 
+@disable_signal_for_bulk_delete
 def on_article_delete(instance, *args, **kwargs):
     # If an article is deleted, then throw out its URLPaths
     # But move all descendants to a lost-and-found node.
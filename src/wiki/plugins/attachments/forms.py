@@ -1,12 +1,15 @@
-import tempfile
 import zipfile
 
 from django import forms
 from django.core.files.uploadedfile import File
+from django.db import transaction
+from django.db.models import signals
+from django.template.defaultfilters import filesizeformat
 from django.utils.translation import gettext
 from django.utils.translation import gettext_lazy as _
 from wiki.core.permissions import can_moderate
 from wiki.plugins.attachments import models
+from wiki.plugins.attachments import settings
 from wiki.plugins.attachments.models import IllegalFileExtension
 
 
@@ -89,23 +92,54 @@ class AttachmentArchiveForm(AttachmentForm):
     )
 
     def clean_file(self):
-        uploaded_file = self.cleaned_data.get("file", None)
-        if uploaded_file and self.cleaned_data.get("unzip_archive", False):
+        # Checked in clean(), once it's known if the file is an archive to
+        # unzip
+        return self.cleaned_data.get("file", None)
+
+    def clean_archive(self, uploaded_file):
+        try:
+            self.zipfile = zipfile.ZipFile(uploaded_file.file, mode="r")
+        except zipfile.BadZipfile:
+            raise forms.ValidationError(gettext("Not a zip file"))
+        total_size = 0
+        for zipinfo in self.zipfile.infolist():
             try:
-                self.zipfile = zipfile.ZipFile(uploaded_file.file, mode="r")
-                for zipinfo in self.zipfile.filelist:
-                    try:
-                        models.extension_allowed(zipinfo.filename)
-                    except IllegalFileExtension as e:
-                        raise forms.ValidationError(e)
-            except zipfile.BadZipfile:
-                raise forms.ValidationError(gettext("Not a zip file"))
-        else:
-            return super().clean_file()
-        return uploaded_file
+                models.extension_allowed(zipinfo.filename)
+            except IllegalFileExtension as e:
+                raise forms.ValidationError(e)
+            # A member is never extracted beyond the size in the archive
+            if (
+                settings.ARCHIVE_MAX_FILE_SIZE is not None
+                and zipinfo.file_size > settings.ARCHIVE_MAX_FILE_SIZE
+            ):
+                raise forms.ValidationError(
+                    gettext("{filename:s} is larger than {size:s}").format(
+                        filename=zipinfo.filename,
+                        size=filesizeformat(settings.ARCHIVE_MAX_FILE_SIZE),
+                    )
+                )
+            total_size += zipinfo.file_size
+        if (
+            settings.ARCHIVE_MAX_SIZE is not None
+            and total_size > settings.ARCHIVE_MAX_SIZE
+        ):
+            raise forms.ValidationError(
+                gettext("The files in the archive are larger than {size:s}").format(
+                    size=filesizeformat(settings.ARCHIVE_MAX_SIZE)
+                )
+            )
 
     def clean(self):
         super().clean()
+        uploaded_file = self.cleaned_data.get("file", None)
+        if uploaded_file:
+            try:
+                if self.cleaned_data.get("unzip_archive", False):
+                    self.clean_archive(uploaded_file)
+                else:
+                    super().clean_file()
+            except forms.ValidationError as e:
+                self.add_error("file", e)
         if not can_moderate(self.article, self.request.user):
             raise forms.ValidationError(
                 gettext("User not allowed to moderate this article")
@@ -119,38 +153,81 @@ class AttachmentArchiveForm(AttachmentForm):
             self._meta.fields.append("file")
 
         if self.cleaned_data["unzip_archive"]:
-            new_attachments = []
-            try:
-                uploaded_file = self.cleaned_data.get("file", None)
-                self.zipfile = zipfile.ZipFile(uploaded_file.file, mode="r")
-                for zipinfo in self.zipfile.filelist:
-                    f = tempfile.NamedTemporaryFile(mode="w+b")
-                    f.write(self.zipfile.read(zipinfo.filename))
-                    f = File(f, name=zipinfo.filename)
-                    try:
-                        attachment = models.Attachment()
-                        attachment.article = self.article
-                        attachment.original_filename = zipinfo.filename
-                        attachment.save()
-                        attachment.articles.add(self.article)
-                        attachment_revision = models.AttachmentRevision()
-                        attachment_revision.file = f
-                        attachment_revision.description = self.cleaned_data[
-                            "description"
-                        ]
-                        attachment_revision.attachment = attachment
-                        attachment_revision.set_from_request(self.request)
-                        attachment_revision.save()
-                        f.close()
-                    except models.IllegalFileExtension:
-                        raise
-                    new_attachments.append(attachment_revision)
-            except zipfile.BadZipfile:
-                raise
-            return new_attachments
+            return self.save_archive()
         else:
             return super().save(*args, **kwargs)
 
+    def save_archive(self):
+        """
+        Creates an attachment for every file in the archive, in one
+        transaction, and returns their revisions. Every file is streamed from
+        the archive to the storage in chunks. The revisions are created in
+        bulk, so pre_save of AttachmentRevision isn't sent and what it would
+        do is done here. post_save is sent for every revision afterwards.
+        """
+        uploaded_file = self.cleaned_data["file"]
+        self.zipfile = zipfile.ZipFile(uploaded_file.file, mode="r")
+        storage = models.AttachmentRevision._meta.get_field("file").storage
+        stored = []
+        try:
+            with transaction.atomic():
+                attachments = []
+                revisions = []
+                for zipinfo in self.zipfile.infolist():
+                    attachment = models.Attachment(
+                        article=self.article,
+                        original_filename=zipinfo.filename,
+                        revision_counter=1,
+                    )
+                    attachment.save()
+                    attachments.append(attachment)
+                    revision = models.AttachmentRevision(
+                        attachment=attachment,
+                        revision_number=1,
+                        description=self.cleaned_data["description"],
+                    )
+                    revision.set_from_request(self.request)
+                    with self.zipfile.open(zipinfo) as member:
+                        content = File(member, name=zipinfo.filename)
+                        content.size = zipinfo.file_size
+                        revision.file.save(zipinfo.filename, content, save=False)
+                    stored.append(revision.file.name)
+                    revisions.append(revision)
+
+                Through = models.Attachment.articles.through
+                Through.objects.bulk_create(
+                    Through(reusableplugin_id=attachment.pk, article_id=self.article.pk)
+                    for attachment in attachments
+                )
+                models.AttachmentRevision.objects.bulk_create(revisions)
+                # Not every database returns the ids from a bulk insert
+                revision_ids = dict(
+                    models.AttachmentRevision.objects.filter(
+                        attachment__in=attachments
+                    ).values_list("attachment_id", "id")
+                )
+                for attachment, revision in zip(attachments, revisions):
+                    revision.pk = revision_ids[attachment.pk]
+                    attachment.current_revision = revision
+                models.Attachment.objects.bulk_update(attachments, ["current_revision"])
+                # bulk_create() doesn't send post_save, which the
+                # notifications plugin and others listen to. The receivers of
+                # this plugin find the attachments complete already.
+                for revision in revisions:
+                    signals.post_save.send(
+                        sender=models.AttachmentRevision,
+                        instance=revision,
+                        created=True,
+                        update_fields=None,
+                        raw=False,
+                        using=revision._state.db,
+                    )
+        except Exception:
+            for name in stored:
+                storage.delete(name)
+            raise
+        return revisions
+
     class Meta(AttachmentForm.Meta):
         fields = [
             "description",
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:10
+from django.db import migrations
+from django.db import models
+from django.db.models import Max
+from django.db.models import OuterRef
+from django.db.models import Subquery
+from django.db.models.functions import Coalesce
+
+
+def init_revision_counters(apps, schema_editor):
+    # Continue numbering after the highest existing revision number
+    revisions = apps.get_model("wiki_attachments", "AttachmentRevision").objects.filter(
+        attachment=OuterRef("pk")
+    )
+    apps.get_model("wiki_attachments", "Attachment").objects.update(
+        revision_counter=Coalesce(
+            Subquery(
+                revisions.values("attachment")
+                .annotate(max_number=Max("revision_number"))
+                .values("max_number")
+            ),
+            0,
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("wiki_attachments", "0002_auto_20151118_1816"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="attachment",
+            name="revision_counter",
+            field=models.PositiveIntegerField(
+                default=0, editable=False, verbose_name="revision counter"
+            ),
+        ),
+        migrations.RunPython(init_revision_counters, migrations.RunPython.noop),
+    ]
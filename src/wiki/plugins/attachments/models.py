@@ -6,8 +6,10 @@ from django.db.models import signals
 from django.utils.translation import gettext
 from django.utils.translation import gettext_lazy as _
 from wiki import managers
+from wiki.core.http import clear_file_metadata
 from wiki.decorators import disable_signal_for_loaddata
 from wiki.models.article import BaseRevisionMixin
+from wiki.models.article import RevisionCounterMixin
 from wiki.models.pluginbase import ReusablePlugin
 
 from . import settings
@@ -20,7 +22,7 @@ class IllegalFileExtension(Exception):
     pass
 
 
-class Attachment(ReusablePlugin):
+class Attachment(RevisionCounterMixin, ReusablePlugin):
 
     objects = managers.ArticleFkManager()
 
@@ -166,6 +168,8 @@ def on_revision_delete(instance, *args, **kwargs):
 
     # Remove file
     path = instance.file.path.split("/")[:-1]
+    # Another revision can get the same name for its file
+    clear_file_metadata(instance.file.storage, instance.file.name, instance.created)
     instance.file.delete(save=False)
 
     # Clean up empty directories
@@ -204,13 +208,7 @@ def on_attachment_revision_pre_save(**kwargs):
             instance.previous_revision = instance.attachment.current_revision
 
     if not instance.revision_number:
-        try:
-            previous_revision = instance.attachment.attachmentrevision_set.latest()
-            instance.revision_number = previous_revision.revision_number + 1
-        # NB! The above should not raise the below exception, but somehow
-        # it does.
-        except (AttachmentRevision.DoesNotExist, Attachment.DoesNotExist):
-            instance.revision_number = 1
+        instance.revision_number = instance.attachment.reserve_revision_number()
 
 
 @disable_signal_for_loaddata
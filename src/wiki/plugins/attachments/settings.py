@@ -48,6 +48,18 @@ FILE_EXTENSIONS = getattr(
     django_settings, "WIKI_ATTACHMENTS_EXTENSIONS", ["pdf", "doc", "odt", "docx", "txt"]
 )
 
+#: Largest file, in bytes, that can be extracted from a zip archive, which
+#: is checked before anything is extracted. None for no limit.
+ARCHIVE_MAX_FILE_SIZE = getattr(
+    django_settings, "WIKI_ATTACHMENTS_ARCHIVE_MAX_FILE_SIZE", 100 * 1024 * 1024
+)
+
+#: Largest total size, in bytes, of the files extracted from a zip archive.
+#: Archives can unpack to far more than their upload size. None for no limit.
+ARCHIVE_MAX_SIZE = getattr(
+    django_settings, "WIKI_ATTACHMENTS_ARCHIVE_MAX_SIZE", 500 * 1024 * 1024
+)
+
 #: Storage backend to use, default is to use the same as the rest of the
 #: wiki, which is set in ``WIKI_STORAGE_BACKEND``, but you can override it
 #: with ``WIKI_ATTACHMENTS_STORAGE_BACKEND``.
@@ -59,10 +71,12 @@ STORAGE_BACKEND = getattr(
 #: something nasty does not get executed on the server. SAFETY FIRST!
 APPEND_EXTENSION = getattr(django_settings, "WIKI_ATTACHMENTS_APPEND_EXTENSION", True)
 
-#: Important for e.g. S3 backends: If your storage backend does not have a .path
-#: attribute for the file, but only a .url attribute, you should use False.
-#: This will reveal the direct download URL so it does not work perfectly for
-#: files you wish to be kept private.
+#: Send attachments through the wiki, which checks the permissions of the
+#: article. They are streamed from the storage backend, which doesn't need
+#: local paths, or sent by the web server, see ``WIKI_SENDFILE_BACKEND``.
+#: With False, downloads redirect to the .url of the file in the storage
+#: backend. This reveals the direct download URL so it does not work
+#: perfectly for files you wish to be kept private.
 USE_LOCAL_PATH = getattr(django_settings, "WIKI_ATTACHMENTS_LOCAL_PATH", True)
 
 if (not USE_LOCAL_PATH) and APPEND_EXTENSION:
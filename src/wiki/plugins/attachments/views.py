@@ -11,7 +11,7 @@ from django.views.generic import FormView
 from django.views.generic import ListView
 from django.views.generic import TemplateView
 from django.views.generic import View
-from wiki.core.http import send_file
+from wiki.core.http import send_stored_file
 from wiki.core.paginator import WikiPaginator
 from wiki.decorators import get_article
 from wiki.decorators import response_forbidden
@@ -243,15 +243,21 @@ class AttachmentDownloadView(ArticleMixin, View):
     def get(self, request, *args, **kwargs):
         if self.revision:
             if settings.USE_LOCAL_PATH:
+                storage = self.revision.file.storage
                 try:
-                    return send_file(
+                    return send_stored_file(
                         request,
-                        self.revision.file.path,
+                        storage,
+                        self.revision.file.name,
                         self.revision.created,
                         self.attachment.original_filename,
                     )
                 except OSError:
                     pass
+                except Exception:
+                    # Other storages have their own errors for missing files
+                    if storage.exists(self.revision.file.name):
+                        raise
             else:
                 return HttpResponseRedirect(self.revision.file.url)
         raise Http404
@@ -0,0 +1,53 @@
+from django.contrib.auth.decorators import login_required
+from django.contrib.syndication.views import Feed
+from django.urls import reverse
+from django.utils.decorators import method_decorator
+from django.utils.translation import gettext_lazy as _
+
+from .views import recent_activity
+
+
+class RecentChangesFeed(Feed):
+
+    """The latest changes to the articles that the user may read. Like the
+    global history, it is only served to logged in users."""
+
+    title = _("Recent changes")
+    description = _("The latest changes in the wiki.")
+    #: How many changes the feed lists
+    limit = 30
+
+    @method_decorator(login_required)
+    def __call__(self, request, *args, **kwargs):
+        return super().__call__(request, *args, **kwargs)
+
+    def get_object(self, request, *args, **kwargs):
+        return request.user
+
+    def link(self):
+        return reverse("wiki:globalhistory")
+
+    def items(self, user):
+        return recent_activity(user)[: self.limit]
+
+    def item_title(self, activity):
+        return "%s (#%d)" % (activity.article, activity.revision.revision_number)
+
+    def item_description(self, activity):
+        revision = activity.revision
+        return revision.user_message or revision.automatic_log
+
+    def item_link(self, activity):
+        return reverse("wiki:get", kwargs={"article_id": activity.article_id})
+
+    def item_guid(self, activity):
+        return str(activity.revision_id)
+
+    item_guid_is_permalink = False
+
+    def item_pubdate(self, activity):
+        return activity.modified
+
+    def item_author_name(self, activity):
+        user = activity.revision.user
+        return user.get_username() if user else None
@@ -0,0 +1,134 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:02
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations
+from django.db import models
+from wiki.conf.settings import GROUP_MODEL
+
+
+def create_activity(apps, schema_editor):
+    """Writes the activity of the revisions that exist already."""
+    ArticleRevision = apps.get_model("wiki", "ArticleRevision")
+    Activity = apps.get_model("wiki_globalhistory", "Activity")
+    revisions = ArticleRevision.objects.values_list(
+        "id",
+        "article_id",
+        "modified",
+        "article__current_revision_id",
+        "article__owner_id",
+        "article__group_id",
+        "article__group_read",
+        "article__other_read",
+    ).order_by("id")
+    batch = []
+    for (
+        revision_id,
+        article_id,
+        modified,
+        current_revision_id,
+        owner_id,
+        group_id,
+        group_read,
+        other_read,
+    ) in revisions.iterator(chunk_size=2000):
+        batch.append(
+            Activity(
+                article_id=article_id,
+                revision_id=revision_id,
+                modified=modified,
+                current=revision_id == current_revision_id,
+                owner_id=owner_id,
+                group_id=group_id,
+                group_read=group_read,
+                other_read=other_read,
+            )
+        )
+        if len(batch) == 2000:
+            Activity.objects.bulk_create(batch)
+            batch = []
+    Activity.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("wiki", "0007_revision_compressed_content"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Activity",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("modified", models.DateTimeField()),
+                ("current", models.BooleanField(default=False)),
+                ("group_read", models.BooleanField(default=True)),
+                ("other_read", models.BooleanField(default=True)),
+                (
+                    "article",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="wiki.article",
+                    ),
+                ),
+                (
+                    "group",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=GROUP_MODEL,
+                    ),
+                ),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "revision",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="wiki.articlerevision",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "activity",
+                "verbose_name_plural": "activity",
+                "indexes": [
+                    models.Index(
+                        fields=["-modified", "-id"], name="wiki_activity_modified"
+                    ),
+                    models.Index(
+                        fields=["current", "-modified", "-id"],
+                        name="wiki_activity_current",
+                    ),
+                    models.Index(
+                        fields=["article", "current"], name="wiki_activity_article"
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(create_activity, migrations.RunPython.noop),
+    ]
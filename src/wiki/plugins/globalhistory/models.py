@@ -0,0 +1,182 @@
+from django.conf import settings as django_settings
+from django.db import models
+from django.db.models import Q
+from django.db.models import signals
+from django.utils.translation import gettext_lazy as _
+from wiki import models as wiki_models
+from wiki.conf import settings as wiki_settings
+from wiki.decorators import disable_signal_for_loaddata
+from wiki.models.article import descendants_updated
+from wiki.managers import user_group_ids
+
+# The fields of Article that are copied to its activity, for filtering by
+# read access
+PERMISSION_FIELDS = ("owner_id", "group_id", "group_read", "other_read")
+
+
+class ActivityQuerySet(models.QuerySet):
+    def can_read(self, user):
+        """Filter the activity of the articles that a user has reading access
+        to, like ArticleRevision.objects.can_read()"""
+        if user.has_perm("wiki.moderate"):
+            return self
+        if user.is_anonymous:
+            return self.filter(other_read=True)
+        return self.filter(
+            Q(other_read=True)
+            | Q(owner=user)
+            | Q(group_read=True, group__in=user_group_ids(user))
+        )
+
+
+class Activity(models.Model):
+
+    """
+    An entry in the activity feed of the wiki, written when an article
+    revision is saved.
+
+    It repeats the read permissions of the article and whether the revision
+    is current, so the latest changes that a user may read are found with
+    an index on ``modified`` instead of joining the revisions and articles.
+    """
+
+    objects = ActivityQuerySet.as_manager()
+
+    article = models.ForeignKey(
+        wiki_models.Article,
+        on_delete=models.CASCADE,
+        related_name="+",
+        # Covered by the index on (article, current)
+        db_index=False,
+    )
+    revision = models.OneToOneField(
+        wiki_models.ArticleRevision, on_delete=models.CASCADE, related_name="+"
+    )
+    modified = models.DateTimeField()
+    current = models.BooleanField(default=False)
+
+    owner = models.ForeignKey(
+        django_settings.AUTH_USER_MODEL,
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+    group = models.ForeignKey(
+        wiki_settings.GROUP_MODEL,
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+    group_read = models.BooleanField(default=True)
+    other_read = models.BooleanField(default=True)
+
+    class Meta:
+        verbose_name = _("activity")
+        verbose_name_plural = _("activity")
+        indexes = [
+            models.Index(fields=["-modified", "-id"], name="wiki_activity_modified"),
+            models.Index(
+                fields=["current", "-modified", "-id"], name="wiki_activity_current"
+            ),
+            models.Index(fields=["article", "current"], name="wiki_activity_article"),
+        ]
+
+    def __str__(self):
+        return str(self.revision_id)
+
+
+def update_current(article):
+    """Marks the activity of the current revision of an article as current,
+    and no other."""
+    Activity.objects.filter(article=article, current=True).exclude(
+        revision_id=article.current_revision_id
+    ).update(current=False)
+    Activity.objects.filter(
+        revision_id=article.current_revision_id, current=False
+    ).update(current=True)
+
+
+@disable_signal_for_loaddata
+def on_article_revision_save(instance, created, **kwargs):
+    if not created:
+        Activity.objects.filter(revision=instance).update(modified=instance.modified)
+        return
+    article = instance.article
+    Activity.objects.create(
+        article=article,
+        revision=instance,
+        modified=instance.modified,
+        **{field: getattr(article, field) for field in PERMISSION_FIELDS}
+    )
+    if article.current_revision_id == instance.pk:
+        update_current(article)
+
+
+ACTIVITY_STATE_FIELDS = ("current_revision_id",) + PERMISSION_FIELDS
+
+
+def get_activity_state(article):
+    # Deferred fields are left out rather than loaded
+    return {
+        field: article.__dict__[field]
+        for field in ACTIVITY_STATE_FIELDS
+        if field in article.__dict__
+    }
+
+
+def on_article_init(instance, **kwargs):
+    # Remember what the activity of the article was written with, so saving
+    # an article without changing its permissions or current revision costs
+    # no queries
+    instance._activity_state = get_activity_state(instance)
+
+
+@disable_signal_for_loaddata
+def on_article_pre_save(instance, **kwargs):
+    if instance._state.adding:
+        return
+    state = get_activity_state(instance)
+    previous_state = instance._activity_state
+    loaded = [field for field in state if field not in previous_state]
+    if loaded:
+        # Deferred when the article was loaded, and loaded or assigned since
+        previous_state = dict(
+            previous_state,
+            **wiki_models.Article.objects.filter(pk=instance.pk).values(*loaded).get()
+        )
+    instance._activity_changes = {
+        field: value for field, value in state.items() if previous_state[field] != value
+    }
+
+
+@disable_signal_for_loaddata
+def on_article_save(instance, created, **kwargs):
+    changes = instance.__dict__.pop("_activity_changes", {})
+    instance._activity_state = get_activity_state(instance)
+    permissions = {
+        field: value for field, value in changes.items() if field in PERMISSION_FIELDS
+    }
+    if permissions:
+        Activity.objects.filter(article=instance).update(**permissions)
+    if "current_revision_id" in changes:
+        update_current(instance)
+
+
+def on_descendants_updated(descendants, fields, **kwargs):
+    # The recursive permission methods don't save the articles
+    fields = {
+        name: value
+        for name, value in fields.items()
+        if name in PERMISSION_FIELDS or name + "_id" in PERMISSION_FIELDS
+    }
+    if fields:
+        Activity.objects.filter(article__in=descendants).update(**fields)
+
+
+signals.post_save.connect(on_article_revision_save, sender=wiki_models.ArticleRevision)
+signals.post_init.connect(on_article_init, sender=wiki_models.Article)
+signals.pre_save.connect(on_article_pre_save, sender=wiki_models.Article)
+signals.post_save.connect(on_article_save, sender=wiki_models.Article)
+descendants_updated.connect(on_descendants_updated, sender=wiki_models.Article)
@@ -1,18 +1,45 @@
 from django.contrib.auth.decorators import login_required
-from django.db.models import F
 from django.utils.decorators import method_decorator
 from django.views.generic import ListView
-from wiki import models
 from wiki.core.paginator import WikiPaginator
+from wiki.managers import REVISION_CONTENT_FIELDS
+from wiki.views.mixins import KeysetPaginationMixin
 
+from . import models
 
-class GlobalHistory(ListView):
+
+def recent_activity(user, only_last=False):
+    """Returns the activity of the articles that ``user`` may read, latest
+    first, with the revisions and articles it shows loaded without their
+    content."""
+    activities = models.Activity.objects.can_read(user)
+    if only_last:
+        activities = activities.filter(current=True)
+    related = (
+        "revision",
+        "revision__previous_revision",
+        "article__current_revision",
+    )
+    return (
+        activities.select_related("revision__user", *related)
+        .defer(
+            *(
+                relation + "__" + field
+                for relation in related
+                for field in REVISION_CONTENT_FIELDS
+            )
+        )
+        .order_by("-modified", "-id")
+    )
+
+
+class GlobalHistory(KeysetPaginationMixin, ListView):
 
     template_name = "wiki/plugins/globalhistory/globalhistory.html"
     paginator_class = WikiPaginator
     paginate_by = 30
-    model = models.ArticleRevision
-    context_object_name = "revisions"
+    context_object_name = "activities"
+    keyset_ordering = ("-modified", "-id")
 
     @method_decorator(login_required)
     def dispatch(self, request, *args, **kwargs):
@@ -20,14 +47,7 @@ class GlobalHistory(ListView):
         return super().dispatch(request, *args, **kwargs)
 
     def get_queryset(self):
-        if self.only_last == "1":
-            return (
-                self.model.objects.can_read(self.request.user)
-                .filter(article__current_revision=F("id"))
-                .order_by("-modified")
-            )
-        else:
-            return self.model.objects.can_read(self.request.user).order_by("-modified")
+        return recent_activity(self.request.user, only_last=self.only_last == "1")
 
     def get_context_data(self, **kwargs):
         kwargs["only_last"] = self.only_last
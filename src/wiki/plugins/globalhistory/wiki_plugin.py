@@ -2,6 +2,7 @@ from django.urls import re_path
 from wiki.core.plugins import registry
 from wiki.core.plugins.base import BasePlugin
 
+from . import feeds
 from . import settings
 from . import views
 
@@ -17,6 +18,7 @@ class GlobalHistoryPlugin(BasePlugin):
                 views.GlobalHistory.as_view(),
                 name="globalhistory",
             ),
+            re_path(r"^feed/$", feeds.RecentChangesFeed(), name="globalhistory_feed"),
         ]
     }
 
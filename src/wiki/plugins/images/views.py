@@ -77,9 +77,7 @@ class DeleteView(ArticleMixin, RedirectView):
         new_revision = models.ImageRevision()
         new_revision.inherit_predecessor(self.image)
         new_revision.set_from_request(self.request)
-        new_revision.revision_number = RevisionPluginRevision.objects.filter(
-            plugin=self.image
-        ).count()
+        new_revision.revision_number = self.image.reserve_revision_number()
         new_revision.deleted = not self.restore
         new_revision.save()
         self.image.current_revision = new_revision
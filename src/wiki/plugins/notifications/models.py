@@ -1,3 +1,5 @@
+from functools import partial
+
 from django.db import models
 from django.db.models import signals
 from django.urls import reverse
@@ -6,6 +8,7 @@ from django_nyt.models import Subscription
 from django_nyt.utils import notify
 from wiki import models as wiki_models
 from wiki.decorators import disable_signal_for_loaddata
+from wiki.models.article import run_after_write
 from wiki.models.pluginbase import ArticlePlugin
 from wiki.plugins.notifications import settings
 from wiki.plugins.notifications.util import get_title
@@ -35,36 +38,41 @@ def default_url(article, urlpath=None):
     return article.get_absolute_url()
 
 
+def notify_article_revision(revision):
+    url = default_url(revision.article)
+    filter_exclude = {"settings__user": revision.user}
+    if revision.deleted:
+        notify(
+            _("Article deleted: %s") % get_title(revision),
+            settings.ARTICLE_EDIT,
+            target_object=revision.article,
+            url=url,
+            filter_exclude=filter_exclude,
+        )
+    elif revision.previous_revision:
+        notify(
+            _("Article modified: %s") % get_title(revision),
+            settings.ARTICLE_EDIT,
+            target_object=revision.article,
+            url=url,
+            filter_exclude=filter_exclude,
+        )
+    else:
+        notify(
+            _("New article created: %s") % get_title(revision),
+            settings.ARTICLE_EDIT,
+            target_object=revision,
+            url=url,
+            filter_exclude=filter_exclude,
+        )
+
+
 @disable_signal_for_loaddata
 def post_article_revision_save(**kwargs):
     instance = kwargs["instance"]
     if kwargs.get("created", False):
-        url = default_url(instance.article)
-        filter_exclude = {"settings__user": instance.user}
-        if instance.deleted:
-            notify(
-                _("Article deleted: %s") % get_title(instance),
-                settings.ARTICLE_EDIT,
-                target_object=instance.article,
-                url=url,
-                filter_exclude=filter_exclude,
-            )
-        elif instance.previous_revision:
-            notify(
-                _("Article modified: %s") % get_title(instance),
-                settings.ARTICLE_EDIT,
-                target_object=instance.article,
-                url=url,
-                filter_exclude=filter_exclude,
-            )
-        else:
-            notify(
-                _("New article created: %s") % get_title(instance),
-                settings.ARTICLE_EDIT,
-                target_object=instance,
-                url=url,
-                filter_exclude=filter_exclude,
-            )
+        # Inside Article.add_revision(), this waits for the commit
+        run_after_write(partial(notify_article_revision, instance))
 
 
 # Whenever a new revision is created, we notifý users that an article
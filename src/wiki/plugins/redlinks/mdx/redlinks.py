@@ -68,6 +68,9 @@ class LinkTreeprocessor(Treeprocessor):
             Article.DoesNotExist,
         ):
             return self.broken_class
+        except wiki.core.exceptions.URLPathMoved:
+            # The target has moved, but the link still works through a redirect
+            pass
 
         return self.internal_class
 
@@ -46,6 +46,9 @@ class WikiSite:
         self.article_move_view = getattr(
             self, "article_move_view", article.Move.as_view()
         )
+        self.article_tree_view = getattr(
+            self, "article_tree_view", article.Tree.as_view()
+        )
         self.article_preview_view = getattr(
             self, "article_preview_view", article.Preview.as_view()
         )
@@ -170,6 +173,7 @@ class WikiSite:
             re_path(r"^deleted/$", self.article_deleted_view, name="deleted"),
             re_path(r"^edit/$", self.article_edit_view, name="edit"),
             re_path(r"^move/$", self.article_move_view, name="move"),
+            re_path(r"^tree/$", self.article_tree_view, name="tree"),
             re_path(r"^preview/$", self.article_preview_view, name="preview"),
             re_path(r"^history/$", self.article_history_view, name="history"),
             re_path(r"^settings/$", self.article_settings_view, name="settings"),
@@ -206,6 +210,7 @@ class WikiSite:
             ),
             re_path(r"^(?P<path>.+/|)_edit/$", self.article_edit_view, name="edit"),
             re_path(r"^(?P<path>.+/|)_move/$", self.article_move_view, name="move"),
+            re_path(r"^(?P<path>.+/|)_tree/$", self.article_tree_view, name="tree"),
             re_path(
                 r"^(?P<path>.+/|)_preview/$", self.article_preview_view, name="preview"
             ),
@@ -31,6 +31,7 @@ class WikiURLPatterns:
     article_dir_view_class = article.Dir
     article_edit_view_class = article.Edit
     article_move_view_class = article.Move
+    article_tree_view_class = article.Tree
     article_preview_view_class = article.Preview
     article_history_view_class = article.History
     article_settings_view_class = article.Settings
@@ -173,6 +174,11 @@ class WikiURLPatterns:
                 self.article_move_view_class.as_view(),
                 name="move",
             ),
+            re_path(
+                r"^(?P<article_id>[0-9]+)/tree/$",
+                self.article_tree_view_class.as_view(),
+                name="tree",
+            ),
             re_path(
                 r"^(?P<article_id>[0-9]+)/preview/$",
                 self.article_preview_view_class.as_view(),
@@ -239,6 +245,11 @@ class WikiURLPatterns:
                 self.article_move_view_class.as_view(),
                 name="move",
             ),
+            re_path(
+                r"^(?P<path>.+/|)_tree/$",
+                self.article_tree_view_class.as_view(),
+                name="tree",
+            ),
             re_path(
                 r"^(?P<path>.+/|)_preview/$",
                 self.article_preview_view_class.as_view(),
@@ -1,9 +1,8 @@
-import difflib
 import logging
-from urllib.parse import urljoin
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
 from django.db import transaction
 from django.db.models import Q
 from django.http import Http404
@@ -26,13 +25,15 @@ from wiki import forms
 from wiki import models
 from wiki.conf import settings
 from wiki.core import permissions
-from wiki.core.diff import simple_merge
+from wiki.core.diff import diff_lines
+from wiki.core.diff import three_way_merge
 from wiki.core.exceptions import NoRootURL
 from wiki.core.paginator import WikiPaginator
 from wiki.core.plugins import registry as plugin_registry
 from wiki.core.utils import object_to_json_response
 from wiki.decorators import get_article
 from wiki.views.mixins import ArticleMixin
+from wiki.views.mixins import KeysetPaginationMixin
 
 log = logging.getLogger(__name__)
 
@@ -439,9 +440,9 @@ class Move(ArticleMixin, FormView):
                 return redirect("wiki:move", article_id=self.article.id)
             tmp_path = tmp_path.parent
 
-        # Clear cache to update article lists (Old links)
-        for ancestor in self.article.ancestor_objects():
-            ancestor.article.clear_cache()
+        # The article lists of the old ancestors are cleared along with the
+        # new ones below, in one cache round trip
+        cache_keys = self.article.ancestor_articles().get_cache_keys()
 
         # Save the old path for later
         old_path = self.urlpath.path
@@ -453,57 +454,26 @@ class Move(ArticleMixin, FormView):
         # Reload url path form database
         self.urlpath = models.URLPath.objects.get(pk=self.urlpath.pk)
 
-        # Use a copy of ourself (to avoid cache) and update article links again
-        for ancestor in models.Article.objects.get(
-            pk=self.article.pk
-        ).ancestor_objects():
-            ancestor.article.clear_cache()
+        # Clear cache to update article lists (old and new links)
+        cache.delete_many(
+            cache_keys + self.article.ancestor_articles().get_cache_keys()
+        )
 
-        # Create a redirect page for every moved article
+        # Create a redirect for every moved article
         # /old-slug
         # /old-slug/child
         # /old-slug/child/grand-child
         if form.cleaned_data["redirect"]:
-
-            # NB! Includes self!
-            descendants = list(
-                self.urlpath.get_descendants(include_self=True).order_by("level")
+            redirect_count = models.URLPathRedirect.create_for_move(
+                self.urlpath, old_path
             )
-
-            root_len = len(descendants[0].path)
-
-            for descendant in descendants:
-                # Without this descendant.get_ancestors() and as a result
-                # descendant.path is wrong after the first create_article() due
-                # to path caching
-                descendant.refresh_from_db()
-                dst_path = descendant.path
-                src_path = urljoin(old_path, dst_path[root_len:])
-                src_len = len(src_path)
-                pos = src_path.rfind("/", 0, src_len - 1)
-                slug = src_path[pos + 1 : src_len - 1]
-                parent_urlpath = models.URLPath.get_by_path(src_path[0 : max(pos, 0)])
-
-                link = "[wiki:/{path}](wiki:/{path})".format(path=dst_path)
-                urlpath_new = models.URLPath._create_urlpath_from_request(
-                    self.request,
-                    self.article,
-                    parent_urlpath,
-                    slug,
-                    _("Moved: {title}").format(title=descendant.article),
-                    _("Article moved to {link}").format(link=link),
-                    _("Created redirect (auto)"),
-                )
-                urlpath_new.moved_to = descendant
-                urlpath_new.save()
-
             messages.success(
                 self.request,
                 ngettext(
                     "Article successfully moved! Created {n} redirect.",
                     "Article successfully moved! Created {n} redirects.",
-                    len(descendants),
-                ).format(n=len(descendants)),
+                    redirect_count,
+                ).format(n=redirect_count),
             )
 
         else:
@@ -511,6 +481,65 @@ class Move(ArticleMixin, FormView):
         return redirect("wiki:get", path=self.urlpath.path)
 
 
+class Tree(View):
+
+    """Return one level of the article tree as JSON so clients such as the
+    move dialog can browse the wiki one branch at a time.
+
+    Children are fetched with a single query and paginated with ``?page=``.
+    Whether a child has children of its own is read from its MPTT fields,
+    so no extra queries are made per node."""
+
+    per_page = 50
+
+    @method_decorator(get_article(can_read=True))
+    def dispatch(self, request, article, *args, **kwargs):
+        urlpath = kwargs.pop("urlpath", None)
+        if not urlpath:
+            raise Http404()
+
+        try:
+            page = max(int(request.GET.get("page", 1)), 1)
+        except ValueError:
+            page = 1
+        offset = (page - 1) * self.per_page
+
+        children = list(
+            models.URLPath.objects.filter(parent=urlpath)
+            .can_read(request.user)
+            .active()
+            .select_related("article__current_revision")
+            .order_by("slug", "pk")[offset : offset + self.per_page + 1]
+        )
+        has_next = len(children) > self.per_page
+
+        nodes = []
+        for child in children[: self.per_page]:
+            child.parent = urlpath
+            child.set_cached_ancestors_from_parent(urlpath)
+            nodes.append(
+                {
+                    "id": child.pk,
+                    "slug": child.slug,
+                    "title": child.article.current_revision.title,
+                    "path": child.path,
+                    "has_children": child.get_descendant_count() > 0,
+                    "tree_url": reverse("wiki:tree", kwargs={"path": child.path}),
+                }
+            )
+
+        return object_to_json_response(
+            {
+                "id": urlpath.pk,
+                "path": urlpath.path,
+                "children": nodes,
+                "next": "{}?page={}".format(request.path, page + 1)
+                if has_next
+                else None,
+            }
+        )
+
+
 class Deleted(Delete):
 
     """Tell a user that an article has been deleted. If user has permissions,
@@ -588,19 +617,24 @@ class Source(ArticleMixin, TemplateView):
         return super().get_context_data(**kwargs)
 
 
-class History(ListView, ArticleMixin):
+class History(KeysetPaginationMixin, ListView, ArticleMixin):
 
     template_name = "wiki/history.html"
     allow_empty = True
     context_object_name = "revisions"
     paginator_class = WikiPaginator
     paginate_by = 10
+    keyset_ordering = ("-created", "-id")
 
     def get_queryset(self):
+        # The list doesn't show the content, which can be large
         return (
-            models.ArticleRevision.objects.select_related("article")
+            models.ArticleRevision.objects.select_related(
+                "article", "user", "previous_revision"
+            )
+            .defer_content("previous_revision")
             .filter(article=self.article)
-            .order_by("-created")
+            .order_by(*self.keyset_ordering)
         )
 
     def get_context_data(self, **kwargs):
@@ -617,7 +651,7 @@ class History(ListView, ArticleMixin):
         return super().dispatch(request, article, *args, **kwargs)
 
 
-class Dir(ListView, ArticleMixin):
+class Dir(KeysetPaginationMixin, ListView, ArticleMixin):
 
     template_name = "wiki/dir.html"
     allow_empty = True
@@ -625,6 +659,7 @@ class Dir(ListView, ArticleMixin):
     model = models.URLPath
     paginator_class = WikiPaginator
     paginate_by = 30
+    keyset_ordering = ("article__current_revision__title", "id")
 
     @method_decorator(get_article(can_read=True))
     def dispatch(self, request, article, *args, **kwargs):
@@ -644,9 +679,7 @@ class Dir(ListView, ArticleMixin):
             )
         if not self.article.can_moderate(self.request.user):
             children = children.active()
-        children = children.select_related_common().order_by(
-            "article__current_revision__title"
-        )
+        children = children.select_related_common().order_by(*self.keyset_ordering)
         return children
 
     def get_context_data(self, **kwargs):
@@ -667,12 +700,13 @@ class Dir(ListView, ArticleMixin):
         return kwargs
 
 
-class SearchView(ListView):
+class SearchView(KeysetPaginationMixin, ListView):
 
     template_name = "wiki/search.html"
     paginator_class = WikiPaginator
     paginate_by = 25
     context_object_name = "articles"
+    keyset_ordering = ("-current_revision__created", "-id")
 
     def dispatch(self, request, *args, **kwargs):
         self.urlpath = None
@@ -688,7 +722,7 @@ class SearchView(ListView):
 
     def get_queryset(self):
         if not self.query:
-            return models.Article.objects.none().order_by("-current_revision__created")
+            return models.Article.objects.none().order_by(*self.keyset_ordering)
         articles = models.Article.objects
         path = self.kwargs.get("path", None)
         if path:
@@ -708,7 +742,7 @@ class SearchView(ListView):
             models.URLPath.root().article, self.request.user
         ):
             articles = articles.active().can_read(self.request.user)
-        return articles.order_by("-current_revision__created")
+        return articles.order_by(*self.keyset_ordering)
 
     def get_context_data(self, **kwargs):
         kwargs = super().get_context_data(**kwargs)
@@ -883,25 +917,37 @@ class DiffView(DetailView):
     model = models.ArticleRevision
     pk_url_kwarg = "revision_id"
 
+    @staticmethod
+    def get_content_key(revision):
+        if revision is None:
+            return ""
+        # Revisions inserted without save(), e.g. by loaddata, have no hash
+        return revision.content_hash or "revision-{id}".format(id=revision.pk)
+
     def render_to_response(self, context, **response_kwargs):
-        revision = self.get_object()
+        revision = self.object
         other_revision = revision.previous_revision
 
-        baseText = other_revision.content if other_revision is not None else ""
-        newText = revision.content
-
-        differ = difflib.Differ(charjunk=difflib.IS_CHARACTER_JUNK)
-        diff = differ.compare(
-            baseText.splitlines(keepends=True), newText.splitlines(keepends=True)
+        # The diff only depends on the content, so revisions with the same
+        # content share it, for instance after reverting
+        cache_key = "wiki-diff-{key}-{other_key}".format(
+            key=self.get_content_key(revision),
+            other_key=self.get_content_key(other_revision),
         )
+        diff = cache.get(cache_key)
+        if diff is None:
+            baseText = other_revision.content if other_revision is not None else ""
+            newText = revision.content
+            diff = diff_lines(
+                baseText.splitlines(keepends=True), newText.splitlines(keepends=True)
+            )
+            cache.set(cache_key, diff, settings.CACHE_TIMEOUT)
         other_changes = []
 
         if not other_revision or other_revision.title != revision.title:
             other_changes.append((_("New title"), revision.title))
 
-        return object_to_json_response(
-            {"diff": list(diff), "other_changes": other_changes}
-        )
+        return object_to_json_response({"diff": diff, "other_changes": other_changes})
 
 
 class MergeView(View):
@@ -924,8 +970,19 @@ class MergeView(View):
             article.current_revision.content if article.current_revision else ""
         )
         new_text = revision.content
+        base = (
+            revision.get_common_ancestor(article.current_revision)
+            if article.current_revision
+            else None
+        )
 
-        content = simple_merge(current_text, new_text)
+        content, conflicts = three_way_merge(
+            base.content if base else "",
+            current_text,
+            new_text,
+            _("current revision"),
+            _("revision #%d") % revision.revision_number,
+        )
 
         # Save new revision
         if not self.preview:
@@ -960,6 +1017,16 @@ class MergeView(View):
                 )
                 % {"r1": revision.revision_number, "r2": old_revision.revision_number},
             )
+            if conflicts:
+                messages.warning(
+                    request,
+                    ngettext(
+                        "Both revisions changed the same text in one place. Please resolve the conflict marked in the content.",
+                        "Both revisions changed the same text in %(count)d places. Please resolve the conflicts marked in the content.",
+                        conflicts,
+                    )
+                    % {"count": conflicts},
+                )
             if self.urlpath:
                 return redirect("wiki:edit", path=self.urlpath.path)
             else:
@@ -972,6 +1039,7 @@ class MergeView(View):
             "merge1": revision,
             "merge2": article.current_revision,
             "merge": True,
+            "merge_conflicts": conflicts,
             "content": content,
         }
         return render(request, self.template_name, c)
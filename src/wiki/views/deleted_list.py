@@ -1,11 +1,24 @@
+from django.contrib import messages
 from django.shortcuts import redirect
-from django.views.generic.base import TemplateView
+from django.utils.translation import gettext as _
+from django.utils.translation import ngettext
+from django.views.generic import ListView
+from wiki import forms
 from wiki import models
+from wiki.core.paginator import WikiPaginator
+from wiki.managers import REVISION_CONTENT_FIELDS
+from wiki.models.article import batch_side_effects
+from wiki.views.mixins import KeysetPaginationMixin
 
 
-class DeletedListView(TemplateView):
+class DeletedListView(KeysetPaginationMixin, ListView):
 
     template_name = "wiki/deleted_list.html"
+    allow_empty = True
+    context_object_name = "deleted_articles"
+    paginator_class = WikiPaginator
+    paginate_by = 50
+    keyset_ordering = ("-modified", "-id")
 
     def dispatch(self, request, *args, **kwargs):
         # Let logged in super users continue
@@ -14,11 +27,83 @@ class DeletedListView(TemplateView):
 
         return super().dispatch(request, *args, **kwargs)
 
-    def get_context_data(self, **kwargs):
-        article_list = models.Article.objects.all()
-        deleted_articles = []
-        for article in article_list:
-            if article.current_revision.deleted:
-                deleted_articles.append(article)
-        kwargs["deleted_articles"] = deleted_articles
-        return super().get_context_data(**kwargs)
+    def get_queryset(self):
+        # The list only shows the titles of the current revisions
+        return (
+            models.Article.objects.deleted()
+            .select_related("current_revision")
+            .defer(*("current_revision__" + field for field in REVISION_CONTENT_FIELDS))
+            .order_by(*self.keyset_ordering)
+        )
+
+    def post(self, request, *args, **kwargs):
+        form = forms.DeletedArticlesForm(request.POST)
+        if not form.is_valid():
+            for errors in form.errors.values():
+                for error in errors:
+                    messages.error(request, error)
+            return redirect("wiki:deleted_list")
+        articles = form.cleaned_data["articles"]
+        if form.cleaned_data["action"] == form.ACTION_RESTORE:
+            count = self.restore(articles)
+            messages.success(
+                request,
+                ngettext(
+                    "%(count)d article and its children are now restored.",
+                    "%(count)d articles and their children are now restored.",
+                    count,
+                )
+                % {"count": count},
+            )
+        else:
+            count = self.purge(articles)
+            messages.success(
+                request,
+                ngettext(
+                    "%(count)d article and its contents are now completely gone.",
+                    "%(count)d articles and their contents are now completely gone.",
+                    count,
+                )
+                % {"count": count},
+            )
+        return redirect("wiki:deleted_list")
+
+    def restore(self, articles):
+        count = 0
+        # Cache invalidation and notifications go out once the last article
+        # is restored
+        with batch_side_effects():
+            for article in articles.select_related("current_revision"):
+                revision = models.ArticleRevision()
+                revision.inherit_predecessor(article)
+                revision.set_from_request(self.request)
+                revision.deleted = False
+                revision.automatic_log = _("Restoring article")
+                article.add_revision(revision)
+                count += 1
+        return count
+
+    def purge(self, articles):
+        article_ids = set(articles.values_list("id", flat=True))
+        # The root article would take the whole wiki with it
+        urlpaths = models.URLPath.objects.filter(
+            article_id__in=article_ids, parent__isnull=False
+        ).order_by("tree_id", "lft")
+        with models.URLPath.objects.delay_tree_updates():
+            purged = []
+            for urlpath in urlpaths:
+                # A subtree that was already purged together with one of its
+                # ancestors
+                if any(
+                    urlpath.tree_id == tree_id and lft < urlpath.lft < rght
+                    for tree_id, lft, rght in purged
+                ):
+                    continue
+                purged.append((urlpath.tree_id, urlpath.lft, urlpath.rght))
+                urlpath.delete_subtree()
+            models.Article.objects.filter(
+                id__in=article_ids, urlpath__isnull=True
+            ).delete()
+        return (
+            len(article_ids) - models.Article.objects.filter(id__in=article_ids).count()
+        )
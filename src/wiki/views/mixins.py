@@ -1,7 +1,10 @@
 import logging
 
+from django.http import Http404
 from django.views.generic.base import TemplateResponseMixin
 from wiki.conf import settings
+from wiki.core.paginator import InvalidCursor
+from wiki.core.paginator import KeysetPaginator
 from wiki.core.plugins import registry
 
 log = logging.getLogger(__name__)
@@ -19,11 +22,13 @@ class ArticleMixin(TemplateResponseMixin):
         self.children_slice = []
         if settings.SHOW_MAX_CHILDREN > 0:
             try:
-                for child in self.article.get_children(
-                    max_num=settings.SHOW_MAX_CHILDREN + 1,
-                    articles__article__current_revision__deleted=False,
-                    user_can_read=request.user,
+                for child in self.article.get_cached_children(
+                    request.user, max_num=settings.SHOW_MAX_CHILDREN + 1
                 ):
+                    # Saves a query for the ancestors of each child when
+                    # rendering its path
+                    if self.urlpath and child.parent_id == self.urlpath.pk:
+                        child.set_cached_ancestors_from_parent(self.urlpath)
                     self.children_slice.append(child)
             except AttributeError as e:
                 log.error(
@@ -41,3 +46,28 @@ class ArticleMixin(TemplateResponseMixin):
         kwargs["children_slice_more"] = len(self.children_slice) > 20
         kwargs["plugins"] = registry.get_plugins()
         return kwargs
+
+
+class KeysetPaginationMixin:
+
+    """A mixin for list views that paginates by cursor instead of by page number
+    when ``WIKI_KEYSET_PAGINATION`` is enabled. ``keyset_ordering`` must give the
+    same order as the queryset and end with a unique field."""
+
+    keyset_ordering = ("pk",)
+    cursor_kwarg = "cursor"
+
+    def paginate_queryset(self, queryset, page_size):
+        if not settings.KEYSET_PAGINATION:
+            return super().paginate_queryset(queryset, page_size)
+        paginator = KeysetPaginator(
+            queryset,
+            page_size,
+            self.keyset_ordering,
+            count_limit=settings.KEYSET_PAGINATION_COUNT_LIMIT,
+        )
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor as e:
+            raise Http404(str(e))
+        return paginator, page, page.object_list, page.has_other_pages()
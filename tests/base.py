@@ -1,3 +1,4 @@
+import contextlib
 import os
 import unittest
 
@@ -89,7 +90,11 @@ class WebTestCommonMixin(RequireBasicData, django_functest.ShortcutLoginMixin):
 
 
 class WebTestBase(WebTestCommonMixin, django_functest.FuncWebTestMixin, TestCase):
-    pass
+    def committed(self):
+        """Runs the on-commit callbacks of the writes in the block when it
+        ends, like the cache invalidation of saved articles. A TestCase
+        never commits."""
+        return self.captureOnCommitCallbacks(execute=True)
 
 
 INCLUDE_SELENIUM_TESTS = os.environ.get("INCLUDE_SELENIUM_TESTS", "0") == "1"
@@ -102,6 +107,10 @@ class SeleniumBase(
     driver_name = "Chrome"
     display = os.environ.get("SELENIUM_SHOW_BROWSER", "0") == "1"
 
+    def committed(self):
+        # The live server commits every request
+        return contextlib.nullcontext()
+
     if not INCLUDE_SELENIUM_TESTS:
         # Don't call super() in setUpClass(), it will attempt to instantiate
         # a browser instance which is slow and might fail
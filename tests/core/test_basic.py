@@ -1,9 +1,19 @@
 import tempfile
 from datetime import datetime
+from datetime import timezone
+from unittest import mock
 
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.storage import Storage
+from django.test import RequestFactory
 from django.test import TestCase
 from wiki.conf import settings as wiki_settings
+from wiki.core.http import CHUNK_SIZE
+from wiki.core.http import clear_file_metadata
+from wiki.core.http import get_file_metadata
 from wiki.core.http import send_file
+from wiki.core.http import send_stored_file
 from wiki.forms import Group
 from wiki.models import Article
 from wiki.models import ArticleRevision
@@ -60,3 +70,190 @@ class HttpTests(TestCase):
         )
         assert response.has_header("Content-Disposition")
         fobject.close()
+
+    def get_file(self, content=b"0123456789"):
+        fobject = tempfile.NamedTemporaryFile(suffix=".bin")
+        fobject.write(content)
+        fobject.flush()
+        self.addCleanup(fobject.close)
+        return fobject.name
+
+    def test_send_file_streaming(self):
+        path = self.get_file(b"x" * (CHUNK_SIZE * 2 + 1))
+        response = send_file(RequestFactory().get("/"), path)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Length"], str(CHUNK_SIZE * 2 + 1))
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertNotIn("Content-Disposition", response)
+        chunks = list(response.streaming_content)
+        self.assertEqual([len(chunk) for chunk in chunks], [CHUNK_SIZE, CHUNK_SIZE, 1])
+        response.close()
+
+    def test_send_file_range(self):
+        path = self.get_file()
+        for header, status, body, content_range in (
+            ("bytes=2-4", 206, b"234", "bytes 2-4/10"),
+            ("bytes=7-", 206, b"789", "bytes 7-9/10"),
+            ("bytes=-2", 206, b"89", "bytes 8-9/10"),
+            ("bytes=8-20", 206, b"89", "bytes 8-9/10"),
+            # Several ranges and invalid ones get the whole file
+            ("bytes=0-1,4-5", 200, b"0123456789", None),
+            ("bytes=5-2", 200, b"0123456789", None),
+            ("lines=1-2", 200, b"0123456789", None),
+        ):
+            with self.subTest(header=header):
+                response = send_file(RequestFactory().get("/", HTTP_RANGE=header), path)
+                self.assertEqual(response.status_code, status)
+                self.assertEqual(b"".join(response.streaming_content), body)
+                self.assertEqual(response["Content-Length"], str(len(body)))
+                self.assertEqual(response.get("Content-Range"), content_range)
+                response.close()
+
+        response = send_file(RequestFactory().get("/", HTTP_RANGE="bytes=10-"), path)
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */10")
+
+    def test_send_file_if_range(self):
+        path = self.get_file()
+        etag = send_file(RequestFactory().get("/"), path)["ETag"]
+        response = send_file(
+            RequestFactory().get("/", HTTP_RANGE="bytes=2-4", HTTP_IF_RANGE=etag), path
+        )
+        self.assertEqual(response.status_code, 206)
+        response = send_file(
+            RequestFactory().get("/", HTTP_RANGE="bytes=2-4", HTTP_IF_RANGE='"old"'),
+            path,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), b"0123456789")
+
+    def test_send_file_not_modified(self):
+        path = self.get_file()
+        last_modified = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        response = send_file(RequestFactory().get("/"), path, last_modified)
+        etag = response["ETag"]
+        self.assertEqual(response["Last-Modified"], "Wed, 01 Jan 2020 00:00:00 GMT")
+
+        for headers in (
+            {"HTTP_IF_NONE_MATCH": etag},
+            {"HTTP_IF_MODIFIED_SINCE": "Wed, 01 Jan 2020 00:00:00 GMT"},
+        ):
+            response = send_file(
+                RequestFactory().get("/", **headers), path, last_modified, "a.jpeg"
+            )
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response["ETag"], etag)
+            self.assertNotIn("Content-Disposition", response)
+
+        response = send_file(
+            RequestFactory().get("/", HTTP_IF_NONE_MATCH='"old"'), path, last_modified
+        )
+        self.assertEqual(response.status_code, 200)
+        response.close()
+        response = send_file(
+            RequestFactory().get("/", HTTP_IF_MATCH='"old"'), path, last_modified
+        )
+        self.assertEqual(response.status_code, 412)
+
+
+class RemoteStorage(Storage):
+    """Stands in for a storage without local paths, like S3."""
+
+    def __init__(self):
+        self.location = tempfile.mkdtemp()
+        self.files = FileSystemStorage(location=self.location)
+
+    def _open(self, name, mode="rb"):
+        return self.files.open(name, mode)
+
+    def _save(self, name, content):
+        return self.files.save(name, content)
+
+    def delete(self, name):
+        self.files.delete(name)
+
+    def exists(self, name):
+        return self.files.exists(name)
+
+    def size(self, name):
+        return self.files.size(name)
+
+    def get_modified_time(self, name):
+        return self.files.get_modified_time(name)
+
+
+class StoredFileTests(TestCase):
+    def setUp(self):
+        self.storage = RemoteStorage()
+        self.name = self.storage.save("file.upload", ContentFile(b"0123456789"))
+        self.addCleanup(self.storage.delete, self.name)
+
+    def test_send_stored_file(self):
+        response = send_stored_file(
+            RequestFactory().get("/", HTTP_RANGE="bytes=2-4"),
+            self.storage,
+            self.name,
+            filename="file.txt",
+        )
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), b"234")
+        self.assertEqual(response["Content-Type"], "text/plain")
+        self.assertEqual(
+            response["Content-Disposition"], "attachment; filename=file.txt"
+        )
+        response.close()
+
+        response = send_stored_file(
+            RequestFactory().get("/", HTTP_IF_NONE_MATCH=response["ETag"]),
+            self.storage,
+            self.name,
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_metadata_cached(self):
+        self.assertEqual(get_file_metadata(self.storage, self.name)[0], 10)
+        with mock.patch.object(self.storage, "size") as size:
+            with mock.patch.object(self.storage, "get_modified_time") as modified:
+                get_file_metadata(self.storage, self.name)
+        self.assertFalse(size.called)
+        self.assertFalse(modified.called)
+
+        # A file stored under the same name later
+        last_modified = datetime(2020, 1, 1, tzinfo=timezone.utc)
+        get_file_metadata(self.storage, self.name, last_modified)
+        self.storage.delete(self.name)
+        self.storage.save(self.name, ContentFile(b"012"))
+        self.assertEqual(get_file_metadata(self.storage, self.name)[0], 10)
+        self.assertEqual(
+            get_file_metadata(self.storage, self.name, last_modified)[0], 10
+        )
+        clear_file_metadata(self.storage, self.name, last_modified)
+        self.assertEqual(
+            get_file_metadata(self.storage, self.name, last_modified)[0], 3
+        )
+        self.assertEqual(
+            get_file_metadata(self.storage, self.name, datetime.now(timezone.utc))[0], 3
+        )
+
+    @wiki_override_settings(
+        WIKI_SENDFILE_BACKEND="wiki.core.sendfile.XAccelRedirectBackend",
+        WIKI_SENDFILE_URL="/internal/wiki",
+    )
+    def test_x_accel_redirect(self):
+        with mock.patch.object(self.storage, "open") as storage_open:
+            response = send_stored_file(
+                RequestFactory().get("/"), self.storage, self.name, filename="a b.txt"
+            )
+        self.assertFalse(storage_open.called)
+        self.assertEqual(response["X-Accel-Redirect"], "/internal/wiki/" + self.name)
+        self.assertEqual(response["Content-Type"], "text/plain")
+        self.assertEqual(
+            response["Content-Disposition"], "attachment; filename=a%20b.txt"
+        )
+        self.assertEqual(response.content, b"")
+
+    @wiki_override_settings(WIKI_SENDFILE_BACKEND="wiki.core.sendfile.XSendfileBackend")
+    def test_x_sendfile(self):
+        storage = self.storage.files
+        response = send_stored_file(RequestFactory().get("/"), storage, self.name)
+        self.assertEqual(response["X-Sendfile"], storage.path(self.name))
@@ -1,10 +1,14 @@
 import os
 import sys
 import tempfile
+from io import StringIO
 
 from django.core.management import call_command
+from wiki.models import ArticleRevision
+from wiki.models import RevisionContent
 
 from ..base import ArticleTestBase
+from ..base import wiki_override_settings
 
 
 class TestManagementCommands(ArticleTestBase):
@@ -26,3 +30,99 @@ class TestManagementCommands(ArticleTestBase):
         call_command("loaddata", fixtures_file.name)
         sys.stdout = sysout
         os.unlink(fixtures_file.name)
+
+    @wiki_override_settings(WIKI_REVISION_KEYFRAME_INTERVAL=2)
+    def test_compact_revisions(self):
+        article = self.root_article
+        for number in range(2, 6):
+            revision = ArticleRevision(title="Revision %d" % number)
+            revision.content = "Root Article\r\nrevision %d\r\n" % number
+            article.add_revision(revision)
+        contents = [r.content for r in article.articlerevision_set.all()]
+        stdout = StringIO()
+        call_command("wiki_compact_revisions", stdout=stdout)
+        self.assertEqual(
+            stdout.getvalue(),
+            "2 revisions are stored as deltas, %d with full content\n"
+            % ArticleRevision.objects.filter(delta_base=None).count(),
+        )
+        self.assertEqual(
+            list(
+                article.articlerevision_set.values_list(
+                    "delta_base__revision_number", flat=True
+                )
+            ),
+            [None, 1, None, 3, None],
+        )
+        self.assertEqual(
+            [r.content for r in article.articlerevision_set.all()], contents
+        )
+
+        with wiki_override_settings(WIKI_REVISION_KEYFRAME_INTERVAL=3):
+            call_command("wiki_compact_revisions", stdout=stdout)
+        self.assertEqual(
+            list(
+                article.articlerevision_set.values_list(
+                    "delta_base__revision_number", flat=True
+                )
+            ),
+            [None, 1, 1, None, None],
+        )
+        self.assertEqual(
+            [r.content for r in article.articlerevision_set.all()], contents
+        )
+
+        call_command("wiki_compact_revisions", "--expand", stdout=stdout)
+        self.assertFalse(article.articlerevision_set.exclude(delta_base=None).exists())
+        self.assertEqual(
+            [r.content for r in article.articlerevision_set.all()], contents
+        )
+
+    def test_compress_revisions(self):
+        article = self.root_article
+        revision = ArticleRevision(title="Root Article", content="Replaced")
+        article.add_revision(revision)
+        stdout = StringIO()
+        call_command("wiki_compress_revisions", stdout=stdout)
+        self.assertRegex(stdout.getvalue(), r"^1 revisions compressed from 20 to \d+ ")
+        self.assertEqual(
+            [
+                r.compressed_content is None
+                for r in article.articlerevision_set.order_by("revision_number")
+            ],
+            [False, True],
+        )
+        self.assertEqual(
+            [r.content for r in article.articlerevision_set.all()],
+            ["root article content", "Replaced"],
+        )
+
+        call_command("wiki_compress_revisions", "--decompress", stdout=stdout)
+        self.assertFalse(
+            ArticleRevision.objects.exclude(compressed_content=None).exists()
+        )
+
+    def test_share_revision_content(self):
+        article = self.root_article
+        for content in ("A", "B", "A", "B", "C"):
+            article.add_revision(ArticleRevision(title="Root Article", content=content))
+        stdout = StringIO()
+        call_command("wiki_share_revision_content", stdout=stdout)
+        self.assertEqual(
+            stdout.getvalue(),
+            "4 revisions share their content now\n0 unused contents removed\n",
+        )
+        revisions = article.articlerevision_set.order_by("revision_number")
+        self.assertEqual(RevisionContent.objects.count(), 2)
+        self.assertEqual(
+            [r.shared_content_id is not None for r in revisions],
+            [False, True, True, True, True, False],
+        )
+        self.assertEqual(
+            [r.content for r in revisions],
+            ["root article content", "A", "B", "A", "B", "C"],
+        )
+
+        call_command("wiki_share_revision_content", "--unshare", stdout=stdout)
+        self.assertFalse(ArticleRevision.objects.exclude(shared_content=None).exists())
+        self.assertFalse(RevisionContent.objects.exists())
@@ -0,0 +1,18 @@
+from django.test import TestCase
+from wiki.core.compression import compress_text
+from wiki.core.compression import decompress_text
+
+
+class CompressionTests(TestCase):
+    def test_round_trip(self):
+        text = "Ünïcödé paragraph\r\n\r\n" * 100
+        for method in ("zlib", "lzma"):
+            data = compress_text(text, method)
+            self.assertLess(len(data), len(text))
+            self.assertEqual(decompress_text(data), text)
+            self.assertEqual(decompress_text(memoryview(data)), text)
+        self.assertEqual(decompress_text(compress_text("")), "")
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            compress_text("text", "bzip2")
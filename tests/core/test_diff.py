@@ -0,0 +1,135 @@
+import difflib
+import random
+
+from django.test import TestCase
+from wiki.core.diff import apply_delta
+from wiki.core.diff import diff_lines
+from wiki.core.diff import get_opcodes
+from wiki.core.diff import make_delta
+from wiki.core.diff import simple_merge
+from wiki.core.diff import three_way_merge
+
+
+class DeltaTests(TestCase):
+    def test_round_trip(self):
+        base = "# Title\r\n\r\nFirst paragraph\r\n\r\nSecond paragraph\r\n"
+        for text in (
+            base,
+            "",
+            base.replace("First", "Changed"),
+            "Prepended\r\n" + base + "Appended without line ending",
+            "Ünïcödé line separator\r\n" + base[20:],
+        ):
+            self.assertEqual(apply_delta(base, make_delta(base, text)), text)
+        self.assertEqual(apply_delta("", make_delta("", base)), base)
+
+    def test_unchanged_lines_are_referenced(self):
+        base = "".join("line %d\n" % i for i in range(100))
+        text = base.replace("line 50\n", "changed\n")
+        delta = make_delta(base, text)
+        self.assertEqual(delta, '[[0,50],"changed\\n",[51,100]]')
+
+    def test_repeated_lines_are_referenced(self):
+        # Too repetitive for the autojunk heuristic of difflib
+        lines = ["row\n" if i % 2 else "cell %d\n" % (i % 5) for i in range(400)]
+        base = "".join(lines)
+        lines[200] = "changed\n"
+        text = "".join(lines)
+        delta = make_delta(base, text)
+        self.assertEqual(delta, '[[0,200],"changed\\n",[201,400]]')
+        self.assertEqual(apply_delta(base, delta), text)
+
+
+class DiffLinesTests(TestCase):
+    def assertOpcodesApply(self, a, b):
+        result = []
+        for tag, i1, i2, j1, j2 in get_opcodes(a, b):
+            if tag == "equal":
+                self.assertEqual(a[i1:i2], b[j1:j2])
+                result.extend(a[i1:i2])
+            else:
+                result.extend(b[j1:j2])
+        self.assertEqual(result, b)
+
+    def test_matches_differ(self):
+        base = "# Title\n\nFirst paragraph\n\nSecond paragraph\n".splitlines(True)
+        differ = difflib.Differ(charjunk=difflib.IS_CHARACTER_JUNK)
+        for lines in (
+            base,
+            [],
+            ["# Title\n", "\n", "First paragraph, changed\n", "\n", "Appended"],
+            ["Prepended\n"] + base[2:],
+        ):
+            self.assertEqual(diff_lines(base, lines), list(differ.compare(base, lines)))
+            self.assertEqual(diff_lines(lines, base), list(differ.compare(lines, base)))
+
+    def test_opcodes(self):
+        rng = random.Random(0)
+        a = ["line %d\n" % rng.randrange(50) for i in range(500)]
+        for i in range(20):
+            b = list(a)
+            for j in range(rng.randrange(1, 30)):
+                position = rng.randrange(len(b) + 1)
+                if rng.random() < 0.5:
+                    b.insert(position, "new %d\n" % rng.randrange(50))
+                else:
+                    del b[position : position + rng.randrange(5)]
+            self.assertOpcodesApply(a, b)
+            self.assertOpcodesApply(b, a)
+
+    def test_large_replacement(self):
+        # Replaced blocks that are too large for character hints are listed
+        # as removed and added lines
+        a = ["old %d\n" % i for i in range(1000)]
+        b = ["new %d\n" % i for i in range(1000)]
+        diff = diff_lines(["same\n"] + a, ["same\n"] + b)
+        self.assertEqual(
+            diff, ["  same\n"] + ["- " + x for x in a] + ["+ " + x for x in b]
+        )
+
+
+class ThreeWayMergeTests(TestCase):
+    base = "# Title\r\n\r\nFirst paragraph\r\n\r\nSecond paragraph\r\n"
+
+    def test_merge(self):
+        self.assertEqual(
+            three_way_merge(
+                self.base,
+                self.base.replace("First", "Changed first"),
+                self.base.replace("Second", "Changed second") + "Appended\r\n",
+            ),
+            (
+                "# Title\r\n\r\nChanged first paragraph\r\n\r\n"
+                "Changed second paragraph\r\nAppended\r\n",
+                0,
+            ),
+        )
+        # The same change in both isn't doubled
+        changed = self.base.replace("First", "Changed")
+        self.assertEqual(three_way_merge(self.base, changed, changed), (changed, 0))
+        self.assertEqual(three_way_merge(self.base, "", self.base), ("", 0))
+
+    def test_conflict(self):
+        self.assertEqual(
+            three_way_merge(
+                self.base,
+                self.base.replace("First", "Mine"),
+                self.base.replace("First", "Theirs").rstrip(),
+                "current",
+                "other",
+            ),
+            (
+                "# Title\r\n\r\n<<<<<<< current\r\nMine paragraph\r\n=======\r\n"
+                "Theirs paragraph\r\n>>>>>>> other\r\n\r\nSecond paragraph\r\n",
+                1,
+            ),
+        )
+        self.assertEqual(
+            three_way_merge("", "one\n", "two"),
+            ("<<<<<<<\none\n=======\ntwo\n>>>>>>>\n", 1),
+        )
+
+    def test_simple_merge(self):
+        with self.assertWarns(DeprecationWarning):
+            merged = simple_merge("a\nb\nc\n", "a\nB\nc\nd\n")
+        self.assertEqual(merged, "a\nb\nB\nc\nd\n")
@@ -4,11 +4,15 @@ because the pattern of building them is different from Django
 1.5 to 1.6 to 1.7 so there will be 3 patterns in play at the
 same time.
 """
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from wiki.models import Article
+from wiki.models import ArticleRevision
 from wiki.models import URLPath
 from wiki.plugins.attachments.models import Attachment
 
 from ..base import ArticleTestBase
+from tests.testdata.models import CustomGroup
 
 
 class ArticleManagerTests(ArticleTestBase):
@@ -38,6 +42,51 @@ class ArticleManagerTests(ArticleTestBase):
         self.assertEqual(Article.objects.none().can_write(self.superuser1).count(), 0)
         self.assertEqual(Article.objects.none().active().count(), 0)
 
+    def test_group_permissions(self):
+        group, other_group = CustomGroup.objects.create(), CustomGroup.objects.create()
+        group.user_set.add(self.normaluser1)
+        other_group.user_set.add(self.normaluser1, self.superuser1)
+        for slug, group, group_read, group_write in (
+            ("group", group, True, False),
+            ("other-group", other_group, True, True),
+            ("no-group-read", group, False, True),
+            ("not-a-member", CustomGroup.objects.create(), True, True),
+        ):
+            URLPath.create_urlpath(
+                self.root,
+                slug,
+                title=slug,
+                article_kwargs={
+                    "group": group,
+                    "group_read": group_read,
+                    "group_write": group_write,
+                    "other_read": False,
+                    "other_write": False,
+                },
+            )
+
+        def slugs(queryset, field="urlpath__slug"):
+            # Leave out the root, its slug is None
+            return sorted(filter(None, queryset.values_list(field, flat=True)))
+
+        with CaptureQueriesContext(connection) as ctx:
+            readable = slugs(Article.objects.can_read(self.normaluser1))
+        self.assertNotIn("GROUP BY", ctx.captured_queries[0]["sql"])
+        self.assertEqual(readable, ["group", "other-group"])
+        self.assertEqual(
+            slugs(Article.objects.can_write(self.normaluser1)),
+            ["no-group-read", "other-group"],
+        )
+        self.assertEqual(
+            slugs(URLPath.objects.can_read(self.normaluser1), "slug"), readable
+        )
+        self.assertEqual(
+            ArticleRevision.objects.can_write(self.normaluser1)
+            .filter(article__urlpath__slug="other-group")
+            .count(),
+            1,
+        )
+
 
 class AttachmentManagerTests(ArticleTestBase):
     def test_queryset_methods_directly_on_manager(self):
@@ -67,3 +116,39 @@ class URLPathManagerTests(ArticleTestBase):
     def test_related_manager_works_with_filters(self):
         root = URLPath.root()
         self.assertNotIn(root.id, [p.id for p in root.children.active()])
+
+    def _tree_values(self):
+        return list(
+            URLPath.objects.order_by("pk").values_list("pk", "lft", "rght", "level")
+        )
+
+    def test_delay_tree_updates(self):
+        root = URLPath.root()
+        with URLPath.objects.delay_tree_updates():
+            parent = URLPath.create_urlpath(root, "parent", title="Parent")
+            for i in range(5):
+                URLPath.create_urlpath(parent, "child%d" % i, title="Child")
+            URLPath.create_urlpath(root, "sibling", title="Sibling")
+        tree = self._tree_values()
+        URLPath.objects.rebuild()
+        self.assertEqual(tree, self._tree_values())
+        self.assertEqual(URLPath.get_by_path("parent/").get_descendants().count(), 5)
+
+    def test_delay_tree_updates_full_rebuild(self):
+        root = URLPath.root()
+        with URLPath.objects.delay_tree_updates(full_rebuild=True):
+            parent = URLPath.create_urlpath(root, "parent", title="Parent")
+            URLPath.create_urlpath(parent, "child", title="Child")
+        self.assertEqual(URLPath.get_by_path("parent/child/").level, 2)
+        self.assertEqual(URLPath.root().get_descendant_count(), 2)
+
+    def test_delete_subtree_closes_gap(self):
+        root = URLPath.root()
+        parent = URLPath.create_urlpath(root, "parent", title="Parent")
+        URLPath.create_urlpath(parent, "child", title="Child")
+        URLPath.create_urlpath(root, "sibling", title="Sibling")
+        parent.delete_subtree()
+        tree = self._tree_values()
+        URLPath.objects.rebuild()
+        self.assertEqual(tree, self._tree_values())
+        self.assertEqual(URLPath.root().get_descendant_count(), 1)
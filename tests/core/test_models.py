@@ -1,15 +1,36 @@
+from functools import partial
+from unittest.mock import patch
+
 from django.apps import apps
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
 from django.contrib.sites.models import Site
+from django.db import connection
+from django.db import transaction
+from django.db.migrations.loader import MigrationLoader
+from django.forms.models import model_to_dict
 from django.test.testcases import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import re_path
+from django.utils.text import slugify
+from wiki.admin import ArticleForm
 from wiki.conf import settings
+from wiki.core.compression import hash_text
 from wiki.managers import ArticleManager
 from wiki.models import Article
 from wiki.models import ArticleRevision
+from wiki.models import RevisionContent
 from wiki.models import URLPath
+from wiki.models.article import batch_side_effects
+from wiki.models.article import descendants_updated
+from wiki.models.article import run_after_write
 from wiki.urls import WikiURLPatterns
 
+from ..base import RequireRootArticleMixin
+from ..base import TestBase
+from ..base import wiki_override_settings
+from tests.testdata.models import CustomGroup
+
 User = get_user_model()
 Group = apps.get_model(settings.GROUP_MODEL)
 
@@ -148,3 +169,619 @@ class ArticleModelTest(TestCase):
         ar2.save()
 
         self.assertEqual(ar2.previous_revision, ar1)
+
+    def test_revision_numbers(self):
+        a = Article.objects.create()
+        stale = Article.objects.get(pk=a.pk)
+        a.add_revision(ArticleRevision(title="revision1"))
+        # A copy that has not seen the first revision still gets the next
+        # number, and saving it does not write back its old counter
+        stale.add_revision(ArticleRevision(title="revision2"))
+        a.save()
+        ar3 = ArticleRevision(article=a, title="revision3")
+        ar3.save()
+        self.assertEqual(
+            list(a.articlerevision_set.values_list("revision_number", flat=True)),
+            [1, 2, 3],
+        )
+        self.assertEqual(Article.objects.get(pk=a.pk).revision_counter, 3)
+
+    def test_add_revision_queries(self):
+        a = Article.objects.create()
+        a.add_revision(ArticleRevision(title="revision1"))
+        revision = ArticleRevision(title="revision2")
+        # Reserving the number takes an UPDATE and a SELECT of the counter
+        # and no longer looks for the latest revision
+        with CaptureQueriesContext(connection) as queries:
+            a.add_revision(revision)
+        self.assertEqual(revision.revision_number, 2)
+        self.assertFalse(
+            [q for q in queries if "ORDER BY" in q["sql"] and "revision" in q["sql"]]
+        )
+
+    def test_get_common_ancestor(self):
+        a = Article.objects.create()
+        revisions = []
+        for title in ("revision1", "revision2", "revision3"):
+            a.add_revision(ArticleRevision(title=title))
+            revisions.append(a.current_revision)
+        # Going back to the first revision and editing it branches off
+        a.current_revision = revisions[0]
+        a.save()
+        a.add_revision(ArticleRevision(title="revision4"))
+        branch = a.current_revision
+        self.assertEqual(branch.previous_revision, revisions[0])
+
+        with self.assertNumQueries(2):
+            self.assertEqual(revisions[2].get_common_ancestor(branch), revisions[0])
+        self.assertEqual(revisions[2].get_common_ancestor(revisions[1]), revisions[1])
+        self.assertEqual(revisions[1].get_common_ancestor(revisions[2]), revisions[1])
+        other = Article.objects.create()
+        other.add_revision(ArticleRevision(title="other"))
+        self.assertIsNone(branch.get_common_ancestor(other.current_revision))
+
+
+class RevisionDeltaStorageTest(RequireRootArticleMixin, TestBase):
+    def setUp(self):
+        super().setUp()
+        override = wiki_override_settings(
+            WIKI_REVISION_DELTA_STORAGE=True, WIKI_REVISION_KEYFRAME_INTERVAL=3
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        self.article = URLPath.create_urlpath(
+            self.root, "delta", title="Delta", content="line\n" * 10
+        ).article
+        for number in range(2, 8):
+            revision = ArticleRevision(title="Delta")
+            revision.content = "line\n" * 10 + "revision %d\n" % number
+            self.article.add_revision(revision)
+
+    def _stored(self):
+        return list(
+            self.article.articlerevision_set.order_by("revision_number").values_list(
+                "revision_number", "content", "delta_base__revision_number"
+            )
+        )
+
+    def test_compacted_on_add_revision(self):
+        stored = self._stored()
+        # Keyframes and the current revision keep their content
+        self.assertEqual(
+            [(number, base) for number, content, base in stored],
+            [(1, None), (2, 1), (3, 1), (4, None), (5, 4), (6, 4), (7, None)],
+        )
+        self.assertEqual(
+            [bool(content) for number, content, base in stored],
+            [True, False, False, True, False, False, True],
+        )
+        for revision in self.article.articlerevision_set.all():
+            expected = "line\r\n" * 10
+            if revision.revision_number > 1:
+                expected += "revision %d\r\n" % revision.revision_number
+            self.assertEqual(revision.content, expected)
+
+    def test_expand(self):
+        revision = self.article.articlerevision_set.get(revision_number=5)
+        content = revision.content
+        revision.expand()
+        revision = ArticleRevision.objects.get(pk=revision.pk)
+        self.assertIsNone(revision.delta_base)
+        self.assertEqual(revision.content, content)
+        # Saving a revision does not store its rebuilt content
+        revision = self.article.articlerevision_set.get(revision_number=6)
+        revision.title = "Renamed"
+        revision.save()
+        self.assertEqual(self._stored()[5], (6, "", 4))
+
+    def test_change_keyframe_content(self):
+        contents = {
+            revision.revision_number: revision.content
+            for revision in self.article.articlerevision_set.all()
+        }
+        for update_fields in (None, ["content"]):
+            with self.subTest(update_fields=update_fields):
+                for revision in self.article.articlerevision_set.filter(
+                    revision_number__in=(5, 6)
+                ):
+                    self.assertTrue(revision.compact())
+                keyframe = self.article.articlerevision_set.get(revision_number=4)
+                keyframe.content = "Changed %s" % update_fields
+                keyframe.save(update_fields=update_fields)
+                # Its deltas keep their content, stored in full now
+                stored = self._stored()
+                self.assertEqual(stored[4][2], None)
+                self.assertEqual(stored[5][2], None)
+                for revision in self.article.articlerevision_set.exclude(
+                    revision_number=4
+                ):
+                    self.assertEqual(
+                        revision.content, contents[revision.revision_number]
+                    )
+
+    def test_historical_model(self):
+        # As seen by data migrations right after the field was added
+        state = MigrationLoader(connection).project_state(
+            ("wiki", "0006_revision_delta")
+        )
+        model = state.apps.get_model("wiki", "ArticleRevision")
+        revision = model(content="Content")
+        self.assertEqual(revision.content, "Content")
+        self.assertEqual(
+            model._meta.get_field("content").pre_save(revision, True), "Content"
+        )
+
+    def test_delete_article(self):
+        self.article.delete()
+        self.assertFalse(ArticleRevision.objects.filter(title="Delta").exists())
+
+    def test_change_content(self):
+        revision = self.article.articlerevision_set.get(revision_number=5)
+        self.assertIn("revision 5", revision.content)
+        revision.content = "Changed"
+        revision.save(update_fields=["content"])
+        revision = ArticleRevision.objects.get(pk=revision.pk)
+        self.assertIsNone(revision.delta_base)
+        self.assertEqual(revision.__dict__["content"], "Changed")
+        self.assertEqual(revision.content_hash, hash_text("Changed"))
+
+
+class RevisionCompressionTest(RequireRootArticleMixin, TestBase):
+    def setUp(self):
+        super().setUp()
+        self.revision = self.root_article.current_revision
+        self.root_article.add_revision(
+            ArticleRevision(title="Root Article", content="Replaced")
+        )
+
+    def test_compress(self):
+        self.assertTrue(self.revision.compress("lzma"))
+        self.assertEqual(
+            ArticleRevision.objects.filter(pk=self.revision.pk)
+            .values_list("content", flat=True)
+            .get(),
+            "",
+        )
+        # Only decompressed when the content is read
+        revision = ArticleRevision.objects.get(pk=self.revision.pk)
+        self.assertEqual(revision.__dict__["content"], "")
+        self.assertEqual(revision.content, "root article content")
+        self.assertEqual(revision.__dict__["content"], "root article content")
+        revision = ArticleRevision.objects.defer("content").get(pk=self.revision.pk)
+        self.assertEqual(revision.content, "root article content")
+
+        revision.decompress()
+        revision = ArticleRevision.objects.get(pk=self.revision.pk)
+        self.assertIsNone(revision.compressed_content)
+        self.assertEqual(revision.__dict__["content"], "root article content")
+
+    def test_compact_compressed(self):
+        revision = ArticleRevision(title="Root Article")
+        revision.inherit_predecessor(self.root_article)
+        self.root_article.add_revision(revision)
+        self.assertTrue(self.revision.compress())
+        current = self.root_article.current_revision
+        previous = ArticleRevision.objects.get(pk=current.previous_revision_id)
+        self.assertTrue(previous.compress())
+
+        # Deltas are made against the decompressed keyframe and replace the
+        # compressed content
+        with wiki_override_settings(WIKI_REVISION_KEYFRAME_INTERVAL=2):
+            self.assertTrue(previous.compact(self.revision))
+        previous = ArticleRevision.objects.get(pk=previous.pk)
+        self.assertIsNone(previous.compressed_content)
+        self.assertEqual(previous.content, "Replaced")
+
+
+class RevisionSharingTest(RequireRootArticleMixin, TestBase):
+    def setUp(self):
+        super().setUp()
+        self.revision = self.root_article.current_revision
+        self.root_article.add_revision(
+            ArticleRevision(title="Root Article", content="Replaced")
+        )
+
+    def test_content_hash(self):
+        self.assertEqual(self.revision.content_hash, hash_text("root article content"))
+        # Saving a revision stored another way keeps the hash
+        self.assertTrue(self.revision.compress())
+        revision = ArticleRevision.objects.defer("content").get(pk=self.revision.pk)
+        revision.save()
+        revision.refresh_from_db()
+        self.assertEqual(revision.content_hash, hash_text("root article content"))
+
+    def test_change_content(self):
+        for store in (ArticleRevision.compress, ArticleRevision.share_content):
+            with self.subTest(store=store.__name__):
+                self.revision.content = "root article content"
+                self.revision.save()
+                self.assertTrue(store(self.revision))
+                # Assigned without reading the stored content first
+                revision = ArticleRevision.objects.get(pk=self.revision.pk)
+                revision.content = "Changed"
+                revision.save()
+                revision = ArticleRevision.objects.get(pk=self.revision.pk)
+                self.assertTrue(revision.has_inline_content())
+                self.assertEqual(revision.__dict__["content"], "Changed")
+                self.assertEqual(revision.content_hash, hash_text("Changed"))
+
+    def test_rollback_in_admin(self):
+        current_revision = self.root_article.current_revision
+        stores = (
+            partial(ArticleRevision.compact, keyframe=current_revision),
+            ArticleRevision.compress,
+            ArticleRevision.share_content,
+        )
+        for store in stores:
+            with self.subTest(store=store):
+                revision = ArticleRevision.objects.get(pk=self.revision.pk)
+                self.assertTrue(store(revision))
+                article = Article.objects.get(pk=self.root_article.pk)
+                data = model_to_dict(article)
+                data["current_revision"] = revision.pk
+                form = ArticleForm(data, instance=article)
+                self.assertTrue(form.is_valid(), form.errors)
+                form.save()
+                revision = ArticleRevision.objects.get(pk=revision.pk)
+                self.assertTrue(revision.has_inline_content())
+                # Found by the queries on the content column, like the search
+                self.assertTrue(
+                    Article.objects.filter(
+                        current_revision__content__icontains="root article content"
+                    ).exists()
+                )
+                article.current_revision = current_revision
+                article.save()
+
+    def test_share_content(self):
+        # Reverting to the first revision
+        revision = ArticleRevision(title="Root Article", content="root article content")
+        self.root_article.add_revision(revision)
+        self.root_article.add_revision(ArticleRevision(title="Root Article"))
+
+        self.assertTrue(self.revision.share_content())
+        self.assertTrue(revision.share_content())
+        self.assertEqual(revision.shared_content, self.revision.shared_content)
+        self.assertEqual(RevisionContent.objects.get().content, "root article content")
+        self.assertEqual(
+            list(
+                ArticleRevision.objects.filter(
+                    pk__in=[revision.pk, self.revision.pk]
+                ).values_list("content", flat=True)
+            ),
+            ["", ""],
+        )
+        revision = ArticleRevision.objects.get(pk=revision.pk)
+        self.assertEqual(revision.__dict__["content"], "")
+        self.assertEqual(revision.content, "root article content")
+        # Shared content isn't compressed on top
+        self.assertFalse(revision.compress())
+
+        revision.unshare_content()
+        revision = ArticleRevision.objects.get(pk=revision.pk)
+        self.assertIsNone(revision.shared_content_id)
+        self.assertEqual(revision.__dict__["content"], "root article content")
+        self.assertEqual(
+            ArticleRevision.objects.get(pk=self.revision.pk).content,
+            "root article content",
+        )
+
+    def test_share_compressed(self):
+        self.assertTrue(self.revision.compress())
+        self.assertTrue(self.revision.share_content())
+        revision = ArticleRevision.objects.get(pk=self.revision.pk)
+        self.assertIsNone(revision.compressed_content)
+        self.assertEqual(revision.content, "root article content")
+
+    @wiki_override_settings(WIKI_REVISION_DEDUPLICATION=True)
+    def test_add_revision_shares_previous(self):
+        previous = self.root_article.current_revision
+        self.root_article.add_revision(ArticleRevision(title="Root Article"))
+        previous = ArticleRevision.objects.get(pk=previous.pk)
+        self.assertEqual(previous.shared_content.content, "Replaced")
+        self.assertEqual(previous.content, "Replaced")
+        # The current revision keeps its content
+        self.assertIsNone(self.root_article.current_revision.shared_content_id)
+
+
+class ArticleChildrenTest(RequireRootArticleMixin, TestBase):
+    def setUp(self):
+        super().setUp()
+        for title in ("B child", "A child", "C child"):
+            URLPath.create_urlpath(self.root, slugify(title), title=title)
+        deleted = URLPath.create_urlpath(self.root, "deleted", title="0 deleted")
+        revision = ArticleRevision()
+        revision.inherit_predecessor(deleted.article)
+        revision.deleted = True
+        deleted.article.add_revision(revision)
+
+    def test_get_children(self):
+        children = self.root_article.get_children(
+            articles__article__current_revision__deleted=False
+        )
+        self.assertEqual(
+            [child.article.current_revision.title for child in children],
+            ["A child", "B child", "C child"],
+        )
+
+    def test_get_children_single_query(self):
+        with self.assertNumQueries(1):
+            children = list(
+                self.root_article.get_children(
+                    max_num=2,
+                    user_can_read=AnonymousUser(),
+                    article__current_revision__deleted=False,
+                )
+            )
+            self.assertEqual(
+                [child.article.current_revision.title for child in children],
+                ["A child", "B child"],
+            )
+
+    def _cached_titles(self, user):
+        return [
+            child.article.current_revision.title
+            for child in self.root_article.get_cached_children(user)
+        ]
+
+    def test_get_cached_children(self):
+        anonymous = AnonymousUser()
+        self.assertEqual(
+            self._cached_titles(anonymous), ["A child", "B child", "C child"]
+        )
+        with self.assertNumQueries(0):
+            self.root_article.get_cached_children(anonymous)
+
+        # Creating a child
+        new = URLPath.create_urlpath(self.root, "d-child", title="D child")
+        self.assertIn("D child", self._cached_titles(anonymous))
+
+        # Moving a child away
+        new.parent = URLPath.get_by_path("a-child/")
+        new.save()
+        self.assertNotIn("D child", self._cached_titles(anonymous))
+
+        # Changing permissions of a child
+        article = URLPath.get_by_path("b-child/").article
+        article.other_read = False
+        article.save()
+        self.assertEqual(self._cached_titles(anonymous), ["A child", "C child"])
+        self.assertEqual(
+            self._cached_titles(self.superuser1), ["A child", "B child", "C child"]
+        )
+
+        # Deleting a child
+        URLPath.get_by_path("c-child/").delete_subtree()
+        self.assertEqual(self._cached_titles(anonymous), ["A child"])
+
+    def test_get_cached_children_shared(self):
+        User = get_user_model()
+        other, member = (
+            User.objects.create_user(username, "nobody@example.com", "secret")
+            for username in ("other", "member")
+        )
+        self.root_article.get_cached_children(self.normaluser1)
+        # Nobody is restricted from any child, so all users share the cache
+        with self.assertNumQueries(0):
+            self.root_article.get_cached_children(other)
+
+        group = CustomGroup.objects.create()
+        group.user_set.add(other, member)
+        for slug, article_kwargs in (
+            ("owned", {"owner": self.normaluser1, "other_read": False}),
+            ("group", {"group": group, "other_read": False}),
+        ):
+            URLPath.create_urlpath(
+                self.root, slug, title=slug, article_kwargs=article_kwargs
+            )
+        public = ["A child", "B child", "C child"]
+        self.assertEqual(self._cached_titles(self.normaluser1), public + ["owned"])
+        self.assertEqual(self._cached_titles(other), public + ["group"])
+        self.assertEqual(
+            self._cached_titles(self.superuser1), public + ["group", "owned"]
+        )
+        self.assertEqual(self._cached_titles(AnonymousUser()), public)
+        # Members of the same groups share the cache
+        with patch.object(Article, "get_children") as get_children:
+            self.assertEqual(self._cached_titles(member), public + ["group"])
+        get_children.assert_not_called()
+
+    def test_save_without_moving(self):
+        urlpath = URLPath.get_by_path("a-child/")
+        with patch("wiki.models.urlpath._clear_parent_cache") as clear_parent_cache:
+            with CaptureQueriesContext(connection) as queries:
+                urlpath.save()
+        # The parent is only cleared once, after saving
+        clear_parent_cache.assert_called_once_with(self.root.pk)
+        self.assertFalse(
+            [query for query in queries if query["sql"].startswith("SELECT")]
+        )
+
+        urlpath.parent = URLPath.get_by_path("b-child/")
+        with patch("wiki.models.urlpath._clear_parent_cache") as clear_parent_cache:
+            urlpath.save()
+        self.assertEqual(
+            [call.args for call in clear_parent_cache.call_args_list],
+            [(self.root.pk,), (urlpath.parent_id,)],
+        )
+
+
+class ArticleAncestorCacheTest(RequireRootArticleMixin, TestBase):
+    def test_save_clears_ancestor_cache(self):
+        urlpath = self.root
+        for i in range(4):
+            urlpath = URLPath.create_urlpath(urlpath, "level%d" % i, title="Level")
+        ancestors = Article.objects.filter(urlpath__in=urlpath.get_ancestors())
+        self.assertEqual(set(urlpath.article.ancestor_articles()), set(ancestors))
+
+        article = Article.objects.get(pk=urlpath.article.pk)
+        with patch("wiki.models.article.cache") as cache:
+            # The UPDATE and one query for the ancestors
+            with self.assertNumQueries(2):
+                article.save()
+        cache.delete_many.assert_called_once()
+        keys = cache.delete_many.call_args[0][0]
+        for ancestor in list(ancestors) + [article]:
+            self.assertIn(ancestor.get_children_cache_key(), keys)
+            self.assertIn(ancestor.get_cache_key(), keys)
+
+    def test_add_revision_clears_cache_on_commit(self):
+        with patch("wiki.models.article.cache") as cache:
+            with self.captureOnCommitCallbacks() as callbacks:
+                self.root_article.add_revision(ArticleRevision(title="New"))
+            cache.delete_many.assert_not_called()
+            for callback in callbacks:
+                callback()
+        cache.delete_many.assert_called_once()
+
+    def test_add_revision_rollback(self):
+        with patch("wiki.models.article.cache") as cache:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                with self.assertRaises(ValueError):
+                    with batch_side_effects():
+                        self.root_article.add_revision(ArticleRevision(title="New"))
+                        raise ValueError
+        self.assertEqual(callbacks, [])
+        cache.delete_many.assert_not_called()
+        self.assertEqual(
+            Article.objects.get(pk=self.root_article.pk).current_revision.title,
+            "Root Article",
+        )
+
+    def test_savepoint_rollback_drops_side_effects(self):
+        calls = []
+        with self.captureOnCommitCallbacks(execute=True):
+            with batch_side_effects():
+                run_after_write(lambda: calls.append("kept"))
+                with self.assertRaises(ValueError):
+                    with transaction.atomic():
+                        run_after_write(lambda: calls.append("dropped"))
+                        raise ValueError
+        self.assertEqual(calls, ["kept"])
+
+
+class URLPathDeleteSubtreeTest(RequireRootArticleMixin, TestBase):
+    def _create_section(self, slug, width):
+        section = URLPath.create_urlpath(self.root, slug, title=slug)
+        for i in range(width):
+            child = URLPath.create_urlpath(section, "child%d" % i, title="Child")
+            URLPath.create_urlpath(child, "grandchild", title="Grandchild")
+        return section
+
+    def test_delete_subtree(self):
+        section = self._create_section("section", 2)
+        sibling = URLPath.create_urlpath(self.root, "sibling", title="Sibling")
+        self.root_article.get_cached_children(self.superuser1)
+        section.delete_subtree()
+        self.assertEqual(
+            list(URLPath.objects.exclude(parent=None)),
+            [URLPath.objects.get(pk=sibling.pk)],
+        )
+        self.assertEqual(Article.objects.count(), 2)
+        self.assertFalse(ArticleRevision.objects.filter(title="Child").exists())
+        # Nothing is moved to lost-and-found, as all descendants are gone
+        self.assertFalse(
+            URLPath.objects.filter(slug=settings.LOST_AND_FOUND_SLUG).exists()
+        )
+        self.assertEqual(
+            [
+                child.article.current_revision.title
+                for child in self.root_article.get_cached_children(self.superuser1)
+            ],
+            ["Sibling"],
+        )
+
+    def test_delete_subtree_queries(self):
+        small = self._create_section("small", 1)
+        large = self._create_section("large", 10)
+        with CaptureQueriesContext(connection) as small_queries:
+            small.delete_subtree()
+        with CaptureQueriesContext(connection) as large_queries:
+            large.delete_subtree()
+        self.assertEqual(len(small_queries), len(large_queries))
+
+
+class ArticleRecursivePermissionsTest(RequireRootArticleMixin, TestBase):
+    def setUp(self):
+        super().setUp()
+        self.section = URLPath.create_urlpath(self.root, "section", title="Section")
+        child = URLPath.create_urlpath(self.section, "child", title="Child")
+        URLPath.create_urlpath(child, "grandchild", title="Grandchild")
+        self.sibling = URLPath.create_urlpath(self.root, "sibling", title="Sibling")
+
+    def _descendants(self):
+        return Article.objects.filter(
+            urlpath__slug__in=["child", "grandchild"]
+        ).order_by("urlpath__level")
+
+    def test_descendant_articles(self):
+        self.assertEqual(
+            list(self.section.article.descendant_articles().order_by("urlpath__level")),
+            list(self._descendants()),
+        )
+
+    def test_set_permissions_recursive(self):
+        article = self.section.article
+        article.other_read = article.other_write = False
+        article.group_write = False
+        article.save()
+        # One query for the urlpath, one UPDATE, one to collect cache keys
+        # and one UPDATE of the activity of the globalhistory plugin
+        with self.assertNumQueries(4):
+            article.set_permissions_recursive()
+        self.assertEqual(
+            list(
+                self._descendants().values_list(
+                    "other_read", "other_write", "group_read", "group_write"
+                )
+            ),
+            [(False, False, True, False)] * 2,
+        )
+        self.sibling.article.refresh_from_db()
+        self.assertTrue(self.sibling.article.other_read)
+
+    def test_set_owner_and_group_recursive(self):
+        article = self.section.article
+        article.owner = self.normaluser1
+        article.group = CustomGroup.objects.create()
+        article.save()
+        article.set_owner_recursive()
+        article.set_group_recursive()
+        self.assertEqual(
+            set(self._descendants().values_list("owner", "group")),
+            {(self.normaluser1.pk, article.group.pk)},
+        )
+        self.assertIsNone(Article.objects.get(pk=self.sibling.article.pk).owner)
+
+    def test_set_permissions_recursive_clears_cache(self):
+        child = URLPath.get_by_path("section/child/")
+        self.assertEqual(len(child.article.get_cached_children(AnonymousUser())), 1)
+        article = self.section.article
+        article.other_read = False
+        article.set_permissions_recursive()
+        self.assertEqual(child.article.get_cached_children(AnonymousUser()), [])
+
+    def test_set_permissions_recursive_clears_own_children_cache(self):
+        article = self.section.article
+        article.other_read = False
+        article.save()
+        # Cached between saving the article and updating its descendants
+        self.assertEqual(len(article.get_cached_children(AnonymousUser())), 1)
+        article.set_permissions_recursive()
+        self.assertEqual(article.get_cached_children(AnonymousUser()), [])
+
+    def test_descendants_updated(self):
+        received = []
+
+        def receiver(article, descendants, fields, **kwargs):
+            received.append(
+                (article, list(descendants.order_by("urlpath__level")), fields)
+            )
+
+        descendants_updated.connect(receiver)
+        self.addCleanup(descendants_updated.disconnect, receiver)
+        article = self.section.article
+        article.set_owner_recursive()
+        self.assertEqual(
+            received, [(article, list(self._descendants()), {"owner": None})]
+        )
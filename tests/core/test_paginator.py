@@ -1,4 +1,9 @@
+import base64
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from wiki.core.paginator import InvalidCursor
+from wiki.core.paginator import KeysetPaginator
 from wiki.core.paginator import WikiPaginator
 
 
@@ -37,3 +42,76 @@ class PaginatorTest(TestCase):
 
         p.page(8)
         self.assertEqual(p.page_range, [1, 0, 6, 7, 8, 9])
+
+
+class KeysetPaginatorTest(TestCase):
+    """
+    Test the KeysetPaginator by walking through a list of users
+    """
+
+    def setUp(self):
+        User = get_user_model()
+        # Two users with the same name to check the tie-breaker on id
+        for username in ("e", "b", "d", "a", "c", "c"):
+            User.objects.create(
+                username=username + str(User.objects.count()), first_name=username
+            )
+        self.users = User.objects.all()
+
+    def walk(self, paginator):
+        pages = []
+        page = paginator.page()
+        pages.append(list(page))
+        while page.has_next():
+            page = paginator.page(page.next_cursor)
+            pages.append(list(page))
+        return page, pages
+
+    def test_forward(self):
+        paginator = KeysetPaginator(self.users, 2, ("first_name", "id"))
+        page, pages = self.walk(paginator)
+        self.assertEqual([len(p) for p in pages], [2, 2, 2])
+        self.assertEqual(
+            [u for p in pages for u in p], list(self.users.order_by("first_name", "id"))
+        )
+        self.assertFalse(paginator.page().has_previous())
+        self.assertIsNone(paginator.count)
+
+    def test_descending(self):
+        paginator = KeysetPaginator(self.users, 4, ("-first_name", "-id"))
+        page, pages = self.walk(paginator)
+        self.assertEqual(
+            [u for p in pages for u in p],
+            list(self.users.order_by("-first_name", "-id")),
+        )
+
+    def test_backward(self):
+        paginator = KeysetPaginator(self.users, 2, ("first_name", "id"))
+        page, pages = self.walk(paginator)
+        self.assertTrue(page.has_previous())
+        page = paginator.page(page.previous_cursor)
+        self.assertEqual(list(page), pages[1])
+        self.assertTrue(page.has_next())
+        page = paginator.page(page.previous_cursor)
+        self.assertEqual(list(page), pages[0])
+        self.assertFalse(page.has_previous())
+
+    def test_count_limit(self):
+        paginator = KeysetPaginator(self.users, 2, ("id",), count_limit=4)
+        self.assertEqual(paginator.count, 4)
+        self.assertFalse(paginator.count_is_exact)
+        paginator = KeysetPaginator(self.users, 2, ("id",), count_limit=100)
+        self.assertEqual(paginator.count, 6)
+        self.assertTrue(paginator.count_is_exact)
+
+    def test_invalid_cursor(self):
+        paginator = KeysetPaginator(self.users, 2, ("date_joined", "id"))
+        next_cursor = paginator.page().next_cursor
+        self.assertEqual(len(paginator.page(next_cursor)), 2)
+        with self.assertRaises(InvalidCursor):
+            paginator.page("garbage")
+        with self.assertRaises(InvalidCursor):
+            paginator.page(paginator.encode_cursor(self.users[0])[:-4])
+        bad_value = base64.urlsafe_b64encode(b'[false, ["not a date", 1]]').decode()
+        with self.assertRaises(InvalidCursor):
+            paginator.page(bad_value)
@@ -0,0 +1,92 @@
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth.models import Permission
+from wiki.core import permissions
+from wiki.models import Article
+from wiki.models import ArticleRevision
+from wiki.models import URLPath
+
+from ..base import ArticleTestBase
+from tests.testdata.models import CustomGroup
+
+
+class PermissionContextTests(ArticleTestBase):
+    def setUp(self):
+        super().setUp()
+        group = CustomGroup.objects.create()
+        group.user_set.add(self.normaluser1)
+        for slug, article_kwargs in (
+            ("public", {}),
+            ("owned", {"owner": self.normaluser1, "other_read": False}),
+            ("group", {"group": group, "other_read": False, "other_write": False}),
+            (
+                "other-group",
+                {"group": CustomGroup.objects.create(), "other_read": False},
+            ),
+            ("private", {"other_read": False, "other_write": False}),
+        ):
+            URLPath.create_urlpath(
+                self.root, slug, title=slug, article_kwargs=article_kwargs
+            )
+        deleted = URLPath.create_urlpath(
+            self.root, "deleted", title="deleted", article_kwargs={"other_write": False}
+        )
+        deleted.article.add_revision(ArticleRevision(title="deleted", deleted=True))
+        self.articles = list(
+            Article.objects.exclude(urlpath__parent=None)
+            .select_related("current_revision")
+            .order_by("urlpath__slug")
+        )
+
+    def slugs(self, articles):
+        return [article.urlpath_set.get().slug for article in articles]
+
+    def test_filter_readable(self):
+        # One query for the user's groups and two for the permissions
+        with self.assertNumQueries(3):
+            readable = permissions.filter_readable(self.articles, self.normaluser1)
+        self.assertEqual(self.slugs(readable), ["group", "owned", "public"])
+        self.assertEqual(
+            self.slugs(permissions.filter_readable(self.articles, AnonymousUser())),
+            ["public"],
+        )
+        self.assertEqual(
+            len(permissions.filter_readable(self.articles, self.superuser1)), 6
+        )
+
+    def test_matches_querysets(self):
+        user = self.normaluser1
+        active = [a for a in self.articles if not a.current_revision.deleted]
+        self.assertEqual(
+            permissions.filter_readable(active, user),
+            list(
+                Article.objects.filter(pk__in=[a.pk for a in active])
+                .can_read(user)
+                .order_by("urlpath__slug")
+            ),
+        )
+        self.assertEqual(
+            [a for a in self.articles if a.can_write(user)],
+            list(
+                Article.objects.exclude(urlpath__parent=None)
+                .can_write(user)
+                .order_by("urlpath__slug")
+            ),
+        )
+
+    def test_request_scoped(self):
+        context = permissions.get_permission_context(self.normaluser1)
+        self.assertIs(permissions.get_permission_context(self.normaluser1), context)
+        with self.assertNumQueries(3):
+            for article in self.articles:
+                article.can_read(self.normaluser1)
+                article.can_write(self.normaluser1)
+                article.can_moderate(self.normaluser1)
+
+        self.normaluser1.user_permissions.add(
+            Permission.objects.get(codename="moderate")
+        )
+        self.assertFalse(self.articles[0].can_moderate(self.normaluser1))
+        permissions.clear_permission_context(self.normaluser1)
+        del self.normaluser1._perm_cache
+        del self.normaluser1._user_perm_cache
+        self.assertTrue(self.articles[0].can_moderate(self.normaluser1))
@@ -0,0 +1,161 @@
+import gzip
+import json
+import os
+import tempfile
+from datetime import datetime
+from datetime import timedelta
+from datetime import timezone as dt_timezone
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import F
+from wiki.core.pruning import RetentionPolicy
+from wiki.core.pruning import RevisionPruner
+from wiki.models import Article
+from wiki.models import ArticleRevision
+from wiki.models import SimplePlugin
+
+from ..base import RequireRootArticleMixin
+from ..base import TestBase
+
+NOW = datetime(2024, 6, 15, 12, tzinfo=dt_timezone.utc)
+
+
+class RetentionPolicyTests(TestBase):
+    def test_get_kept(self):
+        policy = RetentionPolicy(
+            keep_all=timedelta(days=2), keep_daily=timedelta(days=30)
+        )
+        revisions = [
+            # Kept, all of them
+            (1, NOW - timedelta(hours=1)),
+            (2, NOW - timedelta(days=1)),
+            # Only the latest of the day
+            (3, NOW - timedelta(days=5, hours=3)),
+            (4, NOW - timedelta(days=5, hours=1)),
+            (5, NOW - timedelta(days=6)),
+            # Only the latest of the month
+            (6, datetime(2024, 1, 3, tzinfo=dt_timezone.utc)),
+            (7, datetime(2024, 1, 20, tzinfo=dt_timezone.utc)),
+            (8, datetime(2023, 12, 31, tzinfo=dt_timezone.utc)),
+        ]
+        self.assertEqual(policy.get_kept(revisions, NOW), {1, 2, 4, 5, 7, 8})
+
+
+class RevisionPrunerTests(RequireRootArticleMixin, TestBase):
+    def setUp(self):
+        super().setUp()
+        self.article = Article.objects.create()
+        self.revisions = []
+        for day in (40, 40, 40, 3, 3, 1):
+            self.add_revision("Revision %d" % (len(self.revisions) + 1), day)
+        self.policy = RetentionPolicy(
+            keep_all=timedelta(days=2), keep_daily=timedelta(days=30)
+        )
+
+    def add_revision(self, content, days_ago):
+        self.article.add_revision(ArticleRevision(title="Title", content=content))
+        revision = self.article.current_revision
+        created = (
+            NOW - timedelta(days=days_ago) + timedelta(minutes=len(self.revisions))
+        )
+        ArticleRevision.objects.filter(pk=revision.pk).update(created=created)
+        self.revisions.append(revision)
+        return revision
+
+    def remaining(self):
+        return list(
+            self.article.articlerevision_set.order_by("revision_number").values_list(
+                "revision_number", "previous_revision__revision_number"
+            )
+        )
+
+    def test_prune(self):
+        pruner = RevisionPruner(self.policy, now=NOW)
+        self.assertEqual(pruner.prune_article(self.article.pk, dry_run=True), 3)
+        self.assertEqual(len(self.remaining()), 6)
+
+        self.assertEqual(pruner.prune(), 3)
+        # The history skips the pruned revisions
+        self.assertEqual(self.remaining(), [(3, None), (5, 3), (6, 5)])
+        self.assertEqual(
+            Article.objects.get(pk=self.article.pk).current_revision.content,
+            "Revision 6",
+        )
+        self.assertEqual(pruner.prune(), 0)
+
+    def test_current_revision_kept(self):
+        # Reverting to the first revision, which would be pruned otherwise
+        self.article.current_revision = self.revisions[0]
+        self.article.save()
+        RevisionPruner(self.policy, now=NOW).prune_article(self.article.pk)
+        self.assertEqual(self.remaining(), [(1, None), (3, 1), (5, 3), (6, 5)])
+        self.assertEqual(
+            Article.objects.get(pk=self.article.pk).current_revision,
+            self.revisions[0],
+        )
+
+    def test_pruned_keyframe(self):
+        for revision in self.revisions[1:5]:
+            revision.compact(self.revisions[0])
+        self.revisions[2].expand()
+        self.revisions[3].compact(self.revisions[2])
+        pruner = RevisionPruner(self.policy, now=NOW)
+        pruner.prune_article(self.article.pk)
+        self.assertEqual(pruner.expanded, 1)
+        revisions = self.article.articlerevision_set.order_by("revision_number")
+        self.assertEqual([r.delta_base_id for r in revisions], [None, None, None])
+        self.assertEqual(
+            [r.content for r in revisions], ["Revision 3", "Revision 5", "Revision 6"]
+        )
+
+    def test_simple_plugins(self):
+        plugin = SimplePlugin(article=self.article)
+        plugin.save()
+        # The plugin is moved along to the later revisions, unless it is
+        # deleted
+        plugin.deleted = True
+        plugin.save()
+        ArticleRevision.objects.filter(pk=plugin.article_revision_id).update(
+            created=NOW - timedelta(days=40)
+        )
+        pruned_revision_id = plugin.article_revision_id
+        self.add_revision("Revision 8", 1)
+        RevisionPruner(self.policy, now=NOW).prune_article(self.article.pk)
+        self.assertFalse(ArticleRevision.objects.filter(pk=pruned_revision_id))
+        plugin = SimplePlugin.objects.get(pk=plugin.pk)
+        self.assertEqual(plugin.article_revision.content, "Revision 8")
+
+    def test_archive(self):
+        self.revisions[0].compress()
+        archive = StringIO()
+        RevisionPruner(self.policy, archive=archive, now=NOW).prune_article(
+            self.article.pk
+        )
+        lines = [json.loads(line) for line in archive.getvalue().splitlines()]
+        self.assertEqual(
+            [(line["revision_number"], line["content"]) for line in lines],
+            [(1, "Revision 1"), (2, "Revision 2"), (4, "Revision 4")],
+        )
+        self.assertEqual(lines[1]["previous_revision_id"], self.revisions[0].pk)
+
+    def test_command(self):
+        path = os.path.join(tempfile.mkdtemp(), "archive.jsonl.gz")
+        # The command counts back from now
+        ArticleRevision.objects.update(
+            created=F("created") + (datetime.now(dt_timezone.utc) - NOW)
+        )
+        stdout = StringIO()
+        call_command(
+            "wiki_prune_revisions",
+            "--keep-all-days=2",
+            "--keep-daily-days=30",
+            "--archive=" + path,
+            stdout=stdout,
+        )
+        self.assertEqual(
+            stdout.getvalue(), "3 revisions pruned, 0 stored with full content again\n"
+        )
+        with gzip.open(path, "rt") as archive:
+            self.assertEqual(len(archive.readlines()), 3)
+        os.unlink(path)
@@ -1,10 +1,13 @@
 import pprint
+from unittest.mock import patch
 
 from django.contrib.messages import constants
 from django.contrib.messages import get_messages
+from django.db import connection
 from django.http import JsonResponse
 from django.shortcuts import resolve_url
 from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import translation
 from django.utils.html import escape
 from django_functest import FuncBaseMixin
@@ -15,6 +18,8 @@ from wiki.forms import validate_slug_numbers
 from wiki.models import ArticleRevision
 from wiki.models import reverse
 from wiki.models import URLPath
+from wiki.views.article import Dir
+from wiki.views.article import Tree
 
 from ..base import ArticleWebTestUtils
 from ..base import DjangoClientTestBase
@@ -24,6 +29,7 @@ from ..base import RequireRootArticleMixin
 from ..base import SeleniumBase
 from ..base import SUPERUSER1_USERNAME
 from ..base import WebTestBase
+from ..base import wiki_override_settings
 from tests.testdata.models import CustomGroup
 
 
@@ -293,25 +299,42 @@ class MoveViewTest(RequireRootArticleMixin, ArticleWebTestUtils, DjangoClientTes
         response = self.get_by_path("test1new/test020/")
         self.assertContains(response, "Content .020.")
 
+        # Check that the old paths redirect permanently to the new ones
         response = self.get_by_path("test0/test2/")
-        self.assertContains(response, "Moved: Test1")
-        self.assertRegex(response.rendered_content, r"moved to <a[^>]*>wiki:/test1new/")
-
+        self.assertRedirects(
+            response, resolve_url("wiki:get", path="test1new/"), status_code=301
+        )
         response = self.get_by_path("test0/test2/test020/")
-        self.assertContains(response, "Moved: Test020")
-        self.assertRegex(
-            response.rendered_content, r"moved to <a[^>]*>wiki:/test1new/test020"
+        self.assertRedirects(
+            response,
+            resolve_url("wiki:get", path="test1new/test020/"),
+            status_code=301,
         )
 
-        # Check that moved_to was correctly set
-        urlsrc = URLPath.get_by_path("/test0/test2/")
+        # No articles were created to hold the redirects
+        self.assertFalse(URLPath.objects.filter(slug="test2").exists())
         urldst = URLPath.get_by_path("/test1new/")
-        self.assertEqual(urlsrc.moved_to, urldst)
+        self.assertEqual(
+            models.URLPathRedirect.get_target("test0/test2/"),
+            urldst,
+        )
 
-        # Check that moved_to was correctly set on the child's previous path
-        urlsrc = URLPath.get_by_path("/test0/test2/test020/")
-        urldst = URLPath.get_by_path("/test1new/test020/")
-        self.assertEqual(urlsrc.moved_to, urldst)
+        # Redirects keep pointing at the right place when moving again
+        response = self.client.post(
+            resolve_url("wiki:move", path="test1new/"),
+            {
+                "destination": str(URLPath.objects.get(slug="test0").pk),
+                "slug": "test3",
+                "redirect": "",
+            },
+        )
+        self.assertRedirects(response, resolve_url("wiki:get", path="test0/test3/"))
+        response = self.get_by_path("test0/test2/test020/")
+        self.assertRedirects(
+            response,
+            resolve_url("wiki:get", path="test0/test3/test020/"),
+            status_code=301,
+        )
 
     def test_translation(self):
         # Test that translation of "Be careful, links to this article" exists.
@@ -331,6 +354,53 @@ class MoveViewTest(RequireRootArticleMixin, ArticleWebTestUtils, DjangoClientTes
             self.assertNotIn("Be careful", response_da.rendered_content)
 
 
+class TreeViewTest(RequireRootArticleMixin, ArticleWebTestUtils, DjangoClientTestBase):
+    def setUp(self):
+        super().setUp()
+        for slug in ("b", "a", "c"):
+            URLPath.create_urlpath(self.root, slug, title=slug.upper())
+        URLPath.create_urlpath(URLPath.get_by_path("a/"), "child", title="Child")
+        deleted = URLPath.create_urlpath(self.root, "deleted", title="Deleted")
+        deleted.article.add_revision(ArticleRevision(title="Deleted", deleted=True))
+
+    def test_tree(self):
+        response = self.client.get(resolve_url("wiki:tree", path=""))
+        self.assertIsInstance(response, JsonResponse)
+        data = response.json()
+        self.assertEqual(data["path"], "")
+        self.assertIsNone(data["next"])
+        self.assertEqual(
+            [(node["path"], node["has_children"]) for node in data["children"]],
+            [("a/", True), ("b/", False), ("c/", False)],
+        )
+        self.assertEqual(data["children"][0]["title"], "A")
+
+        response = self.client.get(data["children"][0]["tree_url"])
+        self.assertEqual(
+            [node["path"] for node in response.json()["children"]], ["a/child/"]
+        )
+
+    def test_tree_queries(self):
+        # The number of queries does not grow with the number of children
+        url = resolve_url("wiki:tree", path="")
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(url)
+        for slug in ("d", "e", "f"):
+            URLPath.create_urlpath(self.root, slug, title=slug.upper())
+        with CaptureQueriesContext(connection) as after:
+            self.client.get(url)
+        self.assertEqual(len(before), len(after))
+
+    def test_tree_pagination(self):
+        with patch.object(Tree, "per_page", 2):
+            data = self.client.get(resolve_url("wiki:tree", path="")).json()
+            self.assertEqual([node["slug"] for node in data["children"]], ["a", "b"])
+            data = self.client.get(data["next"]).json()
+            self.assertEqual([node["slug"] for node in data["children"]], ["c"])
+            self.assertIsNone(data["next"])
+
+
 class DeleteViewTest(
     RequireRootArticleMixin, ArticleWebTestUtils, DjangoClientTestBase
 ):
@@ -496,6 +566,10 @@ class EditViewTest(RequireRootArticleMixin, ArticleWebTestUtils, DjangoClientTes
         self.assertContains(
             response, "While you were editing, someone else changed the revision."
         )
+        # The edit is merged with the revision saved in the meantime
+        self.assertEqual(
+            response.context["form"]["content"].value(), "More modifications"
+        )
 
 
 class DiffViewTests(RequireRootArticleMixin, DjangoClientTestBase):
@@ -516,6 +590,52 @@ class DiffViewTests(RequireRootArticleMixin, DjangoClientTestBase):
         self.assertIsInstance(response, JsonResponse)
         self.assertEqual(response.status_code, 200)
 
+    def test_diff_cached(self):
+        url = reverse("wiki:diff", kwargs={"revision_id": self.new_revision.pk})
+        response = self.client.get(url)
+        with patch("wiki.views.article.diff_lines") as diff_lines:
+            self.assertEqual(self.client.get(url).content, response.content)
+        diff_lines.assert_not_called()
+
+    def test_diff_cached_by_content(self):
+        self.client.get(
+            reverse("wiki:diff", kwargs={"revision_id": self.new_revision.pk})
+        )
+        # Reverting and repeating the change gives the same diff
+        for content in ("root article content", ""):
+            self.root_article.add_revision(
+                ArticleRevision(title="New Revision", content=content)
+            )
+        url = reverse(
+            "wiki:diff", kwargs={"revision_id": self.root_article.current_revision.pk}
+        )
+        with patch("wiki.views.article.diff_lines") as diff_lines:
+            response = self.client.get(url)
+        diff_lines.assert_not_called()
+        self.assertEqual(response.json()["diff"], ["- root article content"])
+
+    def test_diff_cached_without_hash(self):
+        other_article = URLPath.create_urlpath(
+            URLPath.root(), "other", title="Other", content="Other content"
+        ).article
+        other_article.add_revision(ArticleRevision(title="Other"))
+        ArticleRevision.objects.update(content_hash="")
+        self.client.get(
+            reverse("wiki:diff", kwargs={"revision_id": self.new_revision.pk})
+        )
+        response = self.client.get(
+            reverse(
+                "wiki:diff", kwargs={"revision_id": other_article.current_revision.pk}
+            )
+        )
+        self.assertEqual(response.json()["diff"], ["- Other content"])
+
+    def test_diff_compressed(self):
+        self.assertTrue(
+            ArticleRevision.objects.exclude(pk=self.new_revision.pk).get().compress()
+        )
+        self.test_diff()
+
 
 class EditViewTestsBase(RequireRootArticleMixin, FuncBaseMixin):
     def test_edit_save(self):
@@ -528,9 +648,12 @@ class EditViewTestsBase(RequireRootArticleMixin, FuncBaseMixin):
                 "#id_title": "wiki test",
             }
         )
-        self.submit("#id_save")
+        with self.committed():
+            self.submit("#id_save")
+            self.assertTextPresent("successfully added")
+        # The cache of the article is cleared once the edit is committed
+        self.get_url("wiki:get", path="")
         self.assertTextPresent("Something 2")
-        self.assertTextPresent("successfully added")
         new_revision = URLPath.root().article.current_revision
         self.assertIn("Something 2", new_revision.content)
         self.assertEqual(new_revision.revision_number, old_revision.revision_number + 1)
@@ -637,6 +760,90 @@ class DeletedListViewTest(
         response = self.client.get(resolve_url("wiki:deleted_list"))
         self.assertContains(response, "Delete Me")
 
+    def create_deleted(self, parent, slug):
+        urlpath = URLPath.create_urlpath(parent, slug, title=slug.title())
+        revision = ArticleRevision(title=slug.title(), deleted=True)
+        urlpath.article.add_revision(revision)
+        return urlpath
+
+    def test_deleted_articles_queries(self):
+        for i in range(3):
+            self.create_deleted(self.root, "deleted%d" % i)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(resolve_url("wiki:deleted_list"))
+        num_queries = len(queries)
+        self.assertContains(response, "Deleted2")
+        self.assertEqual(len(response.context["deleted_articles"]), 3)
+
+        for i in range(3, 10):
+            self.create_deleted(self.root, "deleted%d" % i)
+        with self.assertNumQueries(num_queries):
+            response = self.client.get(resolve_url("wiki:deleted_list"))
+        self.assertEqual(len(response.context["deleted_articles"]), 10)
+        # The listed revisions are loaded without their content
+        article = response.context["deleted_articles"][0]
+        self.assertNotIn("content", article.current_revision.__dict__)
+
+    def test_bulk_restore(self):
+        first = self.create_deleted(self.root, "first")
+        second = self.create_deleted(self.root, "second")
+        third = self.create_deleted(self.root, "third")
+        response = self.client.post(
+            resolve_url("wiki:deleted_list"),
+            {"action": "restore", "articles": [first.article.id, second.article.id]},
+        )
+        self.assertRedirects(response, resolve_url("wiki:deleted_list"))
+        self.assertEqual(
+            list(models.Article.objects.deleted()),
+            [third.article],
+        )
+        revision = models.Article.objects.get(id=first.article.id).current_revision
+        self.assertEqual(revision.automatic_log, "Restoring article")
+        self.assertEqual(revision.title, "First")
+
+    def test_bulk_purge(self):
+        parent = self.create_deleted(self.root, "parent")
+        child = self.create_deleted(parent, "child")
+        other = self.create_deleted(self.root, "other")
+        kept = self.create_deleted(self.root, "kept")
+        data = {
+            "action": "purge",
+            "articles": [parent.article.id, child.article.id, other.article.id],
+        }
+        # Nothing happens without confirming
+        response = self.client.post(resolve_url("wiki:deleted_list"), data)
+        self.assertRedirects(response, resolve_url("wiki:deleted_list"))
+        self.assertEqual(models.Article.objects.deleted().count(), 4)
+
+        data["confirm"] = "on"
+        response = self.client.post(resolve_url("wiki:deleted_list"), data)
+        self.assertRedirects(response, resolve_url("wiki:deleted_list"))
+        self.assertEqual(list(models.Article.objects.deleted()), [kept.article])
+        self.assertFalse(URLPath.objects.filter(slug__in=["parent", "child", "other"]))
+        self.assertIn(
+            "3 articles and their contents are now completely gone.",
+            [str(m) for m in get_messages(response.wsgi_request)],
+        )
+        # The tree was rebuilt around the gaps
+        kept = URLPath.objects.get(slug="kept")
+        self.assertEqual(kept.get_ancestors().get(), URLPath.root())
+
+    def test_bulk_purge_keeps_root(self):
+        self.root_article.add_revision(ArticleRevision(title="Root", deleted=True))
+        self.client.post(
+            resolve_url("wiki:deleted_list"),
+            {"action": "purge", "articles": [self.root_article.id], "confirm": "on"},
+        )
+        self.assertTrue(URLPath.objects.filter(parent=None).exists())
+
+    def test_bulk_action_only_deleted(self):
+        active = URLPath.create_urlpath(self.root, "active", title="Active")
+        self.client.post(
+            resolve_url("wiki:deleted_list"),
+            {"action": "purge", "articles": [active.article.id], "confirm": "on"},
+        )
+        self.assertTrue(URLPath.objects.filter(slug="active").exists())
+
 
 class MergeViewTest(RequireRootArticleMixin, ArticleWebTestUtils, DjangoClientTestBase):
     def test_merge_preview(self):
@@ -675,6 +882,110 @@ class MergeViewTest(RequireRootArticleMixin, ArticleWebTestUtils, DjangoClientTe
             response, "#{rev_number}".format(rev_number=new_revision.revision_number)
         )
 
+    def test_merge_branch(self):
+        first_revision = self.root_article.current_revision
+        for content in (
+            "Line 1\nLine 2\nLine 3\n",
+            "Line 1 changed\nLine 2\nLine 3\n",
+        ):
+            self.root_article.add_revision(
+                models.ArticleRevision(title="Root Article", content=content)
+            )
+        branched_revision = self.root_article.current_revision
+        # Edit the second revision again after going back to it
+        self.root_article.current_revision = branched_revision.previous_revision
+        self.root_article.save()
+        self.root_article.add_revision(
+            models.ArticleRevision(
+                title="Root Article", content="Line 1\nLine 2\nLine 3 too\n"
+            )
+        )
+
+        response = self.client.get(
+            resolve_url(
+                "wiki:merge_revision",
+                article_id=self.root_article.id,
+                revision_id=branched_revision.id,
+            ),
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            models.Article.objects.get(
+                id=self.root_article.id
+            ).current_revision.content,
+            "Line 1 changed\r\nLine 2\r\nLine 3 too\r\n",
+        )
+
+        # Merging the first revision undoes none of the changes made since
+        response = self.client.get(
+            resolve_url(
+                "wiki:merge_revision_preview",
+                article_id=self.root_article.id,
+                revision_id=first_revision.id,
+            ),
+        )
+        self.assertEqual(
+            response.context["content"], "Line 1 changed\r\nLine 2\r\nLine 3 too\r\n"
+        )
+        self.assertEqual(response.context["merge_conflicts"], 0)
+
+    def test_merge_conflict(self):
+        first_revision = self.root_article.current_revision
+        self.root_article.add_revision(
+            models.ArticleRevision(title="Root Article", content="Replaced")
+        )
+        self.root_article.current_revision = first_revision
+        self.root_article.save()
+        self.root_article.add_revision(
+            models.ArticleRevision(title="Root Article", content="Conflicting")
+        )
+        other_revision = models.ArticleRevision.objects.get(
+            article=self.root_article, content="Replaced"
+        )
+
+        response = self.client.get(
+            resolve_url(
+                "wiki:merge_revision_preview",
+                article_id=self.root_article.id,
+                revision_id=other_revision.id,
+            ),
+        )
+        self.assertEqual(
+            response.context["content"],
+            "<<<<<<< current revision\nConflicting\n=======\nReplaced\n"
+            ">>>>>>> revision #2",
+        )
+        self.assertContains(response, "conflict markers")
+
+    def test_merge_compressed(self):
+        first_revision = self.root_article.current_revision
+        self.root_article.add_revision(
+            models.ArticleRevision(
+                title="Root Article", content="Intro\nroot article content"
+            )
+        )
+        other_revision = self.root_article.current_revision
+        self.root_article.current_revision = first_revision
+        self.root_article.save()
+        self.root_article.add_revision(
+            models.ArticleRevision(
+                title="Root Article", content="root article content\nOutro"
+            )
+        )
+        # The common ancestor is read decompressed
+        self.assertTrue(first_revision.compress())
+
+        response = self.client.get(
+            resolve_url(
+                "wiki:merge_revision_preview",
+                article_id=self.root_article.id,
+                revision_id=other_revision.id,
+            ),
+        )
+        self.assertEqual(
+            response.context["content"], "Intro\r\nroot article content\r\nOutro"
+        )
+
 
 class SourceViewTests(
     RequireRootArticleMixin, ArticleWebTestUtils, DjangoClientTestBase
@@ -718,6 +1029,89 @@ class HistoryViewTests(
         self.assertContains(response, "History:")
         self.assertEqual(response.context["selected_tab"], "history")
 
+    def test_revisions_without_content(self):
+        url = reverse("wiki:history", kwargs={"article_id": self.root_article.pk})
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+
+        num_queries = len(queries)
+        content = "A large page\n" * 100000
+        for n in range(30):
+            self.root_article.add_revision(
+                ArticleRevision(
+                    title="Revision {}".format(n), content=content, user=self.superuser1
+                )
+            )
+        self.client.get(url)
+        # Listing ten revisions takes no more queries than listing one: their
+        # users and previous revisions are selected with them
+        with self.assertNumQueries(num_queries):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context["revisions"]), 10)
+
+        # The list of revisions is loaded without their content
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        listing = [q["sql"] for q in queries if '."created" DESC' in q["sql"]]
+        self.assertEqual(len(listing), 1)
+        self.assertNotIn('"content"', listing[0])
+
+    @wiki_override_settings(WIKI_KEYSET_PAGINATION=True)
+    def test_keyset_pagination(self):
+        for n in range(12):
+            self.root_article.add_revision(
+                ArticleRevision(title="Revision {}".format(n)), save=True
+            )
+        url = reverse("wiki:history", kwargs={"article_id": self.root_article.pk})
+        response = self.client.get(url)
+        revisions = list(response.context["revisions"])
+        self.assertEqual(len(revisions), 10)
+        self.assertEqual(revisions[0], self.root_article.current_revision)
+        self.assertEqual(response.context["paginator"].count, 13)
+        page = response.context["page_obj"]
+        self.assertContains(response, "cursor=" + page.next_cursor)
+
+        response = self.client.get(url, {"cursor": page.next_cursor})
+        revisions += response.context["revisions"]
+        self.assertEqual(
+            revisions,
+            list(self.root_article.articlerevision_set.order_by("-created", "-id")),
+        )
+        self.assertFalse(response.context["page_obj"].has_next())
+
+        response = self.client.get(url, {"cursor": "garbage"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_change_revision_shared(self):
+        first_revision = self.root_article.current_revision
+        self.root_article.add_revision(
+            ArticleRevision(title="Second", content="Other content")
+        )
+        self.assertTrue(first_revision.share_content())
+        response = self.client.get(
+            reverse(
+                "wiki:change_revision",
+                kwargs={
+                    "article_id": self.root_article.pk,
+                    "revision_id": first_revision.pk,
+                },
+            )
+        )
+        self.assertRedirects(
+            response,
+            reverse("wiki:history", kwargs={"article_id": self.root_article.pk}),
+        )
+        revision = ArticleRevision.objects.get(pk=first_revision.pk)
+        self.assertTrue(revision.has_inline_content())
+        # Found by the queries on the content column, like the search
+        self.assertTrue(
+            models.Article.objects.filter(
+                pk=self.root_article.pk,
+                current_revision__content__icontains="root article content",
+            ).exists()
+        )
+
 
 class DirViewTests(RequireRootArticleMixin, ArticleWebTestUtils, DjangoClientTestBase):
     def test_browse_root(self):
@@ -748,6 +1142,26 @@ class DirViewTests(RequireRootArticleMixin, ArticleWebTestUtils, DjangoClientTes
         )
         self.assertRegex(response.rendered_content, r"1 article")
 
+    @wiki_override_settings(
+        WIKI_KEYSET_PAGINATION=True, WIKI_KEYSET_PAGINATION_COUNT_LIMIT=2
+    )
+    def test_browse_keyset_pagination(self):
+        for slug in ("c", "a", "b"):
+            URLPath.create_urlpath(self.root, slug, title=slug.upper())
+        with patch.object(Dir, "paginate_by", 2):
+            response = self.client.get(reverse("wiki:dir", kwargs={"path": ""}))
+            self.assertRegex(
+                response.rendered_content,
+                r"2 articles</strong>\s+in this level.\s+\(or more\)",
+            )
+            children = list(response.context["directory"])
+            response = self.client.get(
+                reverse("wiki:dir", kwargs={"path": ""}),
+                {"cursor": response.context["page_obj"].next_cursor},
+            )
+            children += response.context["directory"]
+        self.assertEqual([child.slug for child in children], ["a", "b", "c"])
+
 
 class SettingsViewTests(
     RequireRootArticleMixin, ArticleWebTestUtils, DjangoClientTestBase
@@ -40,3 +40,21 @@ class AttachmentRevisionTests(RequireRootArticleMixin, TestBase):
                 1,
             ),
         )
+
+    def test_revision_numbers(self):
+        attachment = Attachment.objects.create(
+            article=self.root_article, original_filename="other.txt"
+        )
+        stale = Attachment.objects.get(pk=attachment.pk)
+        for i in range(2):
+            AttachmentRevision.objects.create(attachment=attachment, file=None)
+        stale.save()
+        AttachmentRevision.objects.create(attachment=stale, file=None)
+        self.assertEqual(
+            sorted(
+                attachment.attachmentrevision_set.values_list(
+                    "revision_number", flat=True
+                )
+            ),
+            [1, 2, 3],
+        )
@@ -1,8 +1,18 @@
+import os
+import zipfile
 from io import BytesIO
+from unittest import mock
 
 from django.core.files.uploadedfile import InMemoryUploadedFile
 from django.urls import reverse
+from django_nyt.models import Notification
+from django_nyt.models import Settings
+from django_nyt.utils import subscribe
 from wiki.models import URLPath
+from wiki.plugins.attachments import settings
+from wiki.plugins.attachments.models import Attachment
+from wiki.plugins.attachments.models import AttachmentRevision
+from wiki.plugins.notifications.settings import ARTICLE_EDIT
 
 from ...base import ArticleWebTestUtils
 from ...base import DjangoClientTestBase
@@ -123,6 +133,184 @@ class AttachmentTests(
         # The first replacement should no longer be in the filehistory
         self.assertNotIn(first_replacement, attachment.attachmentrevision_set.all())
 
+    def _create_zip_filestream(self, files):
+        data = BytesIO()
+        with zipfile.ZipFile(data, "w") as archive:
+            for filename, content in files:
+                archive.writestr(filename, content)
+        size = data.tell()
+        data.seek(0)
+        return InMemoryUploadedFile(
+            data, None, "archive.zip", "application/zip", size, None
+        )
+
+    def _upload_archive(self, files):
+        url = reverse("wiki:attachments_index", kwargs={"path": ""})
+        return self.client.post(
+            url,
+            {
+                "description": self.test_description,
+                "file": self._create_zip_filestream(files),
+                "unzip_archive": "1",
+                "save": "1",
+            },
+        )
+
+    def test_upload_archive(self):
+        response = self._upload_archive([("a.txt", "First"), ("b.txt", "Second")])
+        self.assertRedirects(
+            response, reverse("wiki:attachments_index", kwargs={"path": ""})
+        )
+        attachments = Attachment.objects.filter(articles=self.article).order_by(
+            "original_filename"
+        )
+        self.assertEqual(
+            [
+                (
+                    attachment.original_filename,
+                    attachment.current_revision.revision_number,
+                    attachment.current_revision.description,
+                    attachment.current_revision.file.read(),
+                )
+                for attachment in attachments
+            ],
+            [
+                ("a.txt", 1, self.test_description, b"First"),
+                ("b.txt", 1, self.test_description, b"Second"),
+            ],
+        )
+        self.assertEqual(attachments[0].article, self.article)
+
+        # Revisions added later are numbered on
+        url = reverse(
+            "wiki:attachments_replace",
+            kwargs={"attachment_id": attachments[0].id, "article_id": self.article.id},
+        )
+        self.client.post(
+            url, {"description": "Edit", "file": self._createTxtFilestream("Edit")}
+        )
+        revision = Attachment.objects.get(pk=attachments[0].pk).current_revision
+        self.assertEqual(revision.revision_number, 2)
+        self.assertEqual(revision.previous_revision, attachments[0].current_revision)
+
+    def test_upload_archive_notifications(self):
+        user_settings, __ = Settings.objects.get_or_create(
+            user=self.superuser1, is_default=True
+        )
+        subscribe(user_settings, ARTICLE_EDIT, object_id=self.article.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self._upload_archive([("a.txt", "First"), ("b.txt", "Second")])
+        self.assertEqual(
+            sorted(Notification.objects.values_list("message", flat=True)),
+            ["A file was changed: a.txt", "A file was changed: b.txt"],
+        )
+
+    def test_upload_archive_invalid(self):
+        for files, error in (
+            ([("a.txt", "First"), ("b.exe", "Second")], "b.exe"),
+            ([("a.txt", "x" * 11)], "a.txt is larger than 10"),
+            ([("a.txt", "x" * 8), ("b.txt", "x" * 8)], "larger than 15"),
+        ):
+            with self.subTest(error=error):
+                with mock.patch.object(settings, "ARCHIVE_MAX_FILE_SIZE", 10):
+                    with mock.patch.object(settings, "ARCHIVE_MAX_SIZE", 15):
+                        response = self._upload_archive(files)
+                self.assertContains(response, error)
+                self.assertFalse(Attachment.objects.exists())
+
+    def test_upload_archive_rollback(self):
+        storage = AttachmentRevision._meta.get_field("file").storage
+        saved = []
+        original_save = storage.save
+
+        def save(name, content, **kwargs):
+            saved.append(original_save(name, content, **kwargs))
+            return saved[-1]
+
+        with mock.patch.object(storage, "save", save):
+            with mock.patch.object(
+                Attachment.objects, "bulk_update", side_effect=ValueError
+            ):
+                with self.assertRaises(ValueError):
+                    self._upload_archive([("a.txt", "First"), ("b.txt", "Second")])
+        self.assertEqual(len(saved), 2)
+        # The extracted files don't outlive the transaction
+        self.assertFalse(any(storage.exists(name) for name in saved))
+        self.assertFalse(Attachment.objects.exists())
+
+    def test_download(self):
+        self._create_test_attachment("")
+        attachment = self.article.shared_plugins_set.all()[0].attachment
+        url = reverse(
+            "wiki:attachments_download",
+            kwargs={"path": "", "attachment_id": attachment.id},
+        )
+        response = self.client.get(url)
+        self.assertEqual(
+            b"".join(response.streaming_content), self.test_data.encode("utf-8")
+        )
+        self.assertEqual(
+            response["Content-Disposition"], "attachment; filename=test.txt"
+        )
+        response = self.client.get(url, HTTP_RANGE="bytes=0-3")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), b"This")
+
+        # The file is gone from the storage
+        attachment.current_revision.file.delete(save=False)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+
+    def test_download_missing_from_storage(self):
+        self._create_test_attachment("")
+        attachment = self.article.shared_plugins_set.all()[0].attachment
+        url = reverse(
+            "wiki:attachments_download",
+            kwargs={"path": "", "attachment_id": attachment.id},
+        )
+        with mock.patch(
+            "wiki.plugins.attachments.views.send_stored_file",
+            side_effect=RuntimeError,
+        ):
+            # Not a missing file
+            with self.assertRaises(RuntimeError):
+                self.client.get(url)
+            # A remote storage that doesn't raise OSError for missing files
+            attachment.current_revision.file.delete(save=False)
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 404)
+
+    @mock.patch.object(settings, "UPLOAD_PATH_OBSCURIFY", False)
+    def test_download_reused_file_name(self):
+        self._create_test_attachment("")
+        attachment = self.article.shared_plugins_set.get().attachment
+        url = reverse(
+            "wiki:attachments_download",
+            kwargs={"path": "", "attachment_id": attachment.id},
+        )
+        response = self.client.get(url)
+        etag = response["ETag"]
+        response.close()
+        name = attachment.current_revision.file.name
+        attachment.current_revision.delete()
+
+        self.test_data = "Another file"
+        self._create_test_attachment("")
+        attachment = self.article.shared_plugins_set.get().attachment
+        # Without an obscured path, a file left over would rename the next
+        # upload of this test
+        self.addCleanup(attachment.current_revision.file.delete, save=False)
+        # The new file is stored under the name of the deleted one
+        self.assertEqual(attachment.current_revision.file.name, name)
+        url = reverse(
+            "wiki:attachments_download",
+            kwargs={"path": "", "attachment_id": attachment.id},
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Length"], str(len(self.test_data)))
+        self.assertEqual(b"".join(response.streaming_content), b"Another file")
+
     def test_search(self):
         """
         Call the search view
@@ -132,6 +320,17 @@ class AttachmentTests(
         response = self.client.get(url, {"query": self.test_description})
         self.assertContains(response, self.test_description)
 
+    def test_delete_subtree_removes_files(self):
+        urlpath = URLPath.create_urlpath(URLPath.root(), "section", title="Section")
+        child = URLPath.create_urlpath(urlpath, "child", title="Child")
+        self._create_test_attachment(child.path)
+        path = (
+            child.article.shared_plugins_set.get().attachment.current_revision.file.path
+        )
+        self.assertTrue(os.path.exists(path))
+        urlpath.delete_subtree()
+        self.assertFalse(os.path.exists(path))
+
     def get_article(self, cont):
         urlpath = URLPath.create_urlpath(
             URLPath.root(), "html_attach", title="TestAttach", content=cont
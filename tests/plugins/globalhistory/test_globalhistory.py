@@ -1,3 +1,6 @@
+from django.conf import settings as django_settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import translation
 from wiki.models import URLPath
@@ -83,6 +86,30 @@ class GlobalhistoryTests(
         response = self.client.get(url1)
         self.assertRegexpMatches(response.rendered_content, expected)
 
+    def test_revisions_without_content(self):
+        url = reverse("wiki:globalhistory")
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        num_queries = len(queries)
+
+        for n in range(10):
+            URLPath.create_urlpath(
+                URLPath.root(),
+                "page{}".format(n),
+                title="Page {}".format(n),
+                content="A large page\n" * 10000,
+                user=self.superuser1,
+            )
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(len(response.context["activities"]), 11)
+        self.assertEqual(len(queries), num_queries)
+        listing = [q["sql"] for q in queries if '."modified" DESC' in q["sql"]]
+        self.assertEqual(len(listing), 1)
+        self.assertNotIn('"content"', listing[0])
+
     def test_translation(self):
         # Test that translation of "List of %s changes in the wiki." exists.
         url = reverse("wiki:globalhistory")
@@ -95,3 +122,31 @@ class GlobalhistoryTests(
 
             self.assertNotIn("Global history", response_da.rendered_content)
             self.assertNotIn("in the wiki", response_da.rendered_content)
+
+    def test_feed(self):
+        URLPath.create_urlpath(
+            URLPath.root(),
+            "public",
+            title="Public page",
+            user_message="Public comment",
+        )
+        URLPath.create_urlpath(
+            URLPath.root(),
+            "private",
+            title="Private page",
+            article_kwargs={"other_read": False},
+        )
+        url = reverse("wiki:globalhistory_feed")
+        response = self.client.get(url)
+        self.assertContains(response, "Public page (#1)")
+        self.assertContains(response, "Public comment")
+        self.assertContains(response, "Private page (#1)")
+
+        # Only for logged in users, like the global history
+        self.client.logout()
+        response = self.client.get(url)
+        self.assertRedirects(
+            response,
+            "{}?next={}".format(django_settings.LOGIN_URL, url),
+            fetch_redirect_response=False,
+        )
@@ -0,0 +1,125 @@
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from wiki.models import Article
+from wiki.models import ArticleRevision
+from wiki.models import URLPath
+from wiki.plugins.globalhistory.models import Activity
+from wiki.plugins.globalhistory.views import recent_activity
+
+from tests.base import RequireRootArticleMixin
+from tests.base import TestBase
+from tests.testdata.models import CustomGroup
+
+
+class ActivityTests(RequireRootArticleMixin, TestBase):
+    def setUp(self):
+        super().setUp()
+        self.article = URLPath.create_urlpath(
+            self.root, "page", title="Page", content="content"
+        ).article
+
+    def activity(self):
+        return list(
+            Activity.objects.filter(article=self.article)
+            .order_by("revision__revision_number")
+            .values_list("revision__revision_number", "current")
+        )
+
+    def test_add_revision(self):
+        first_revision = self.article.current_revision
+        self.article.add_revision(ArticleRevision(title="Page"))
+        self.assertEqual(self.activity(), [(1, False), (2, True)])
+        revision = self.article.current_revision
+        self.assertEqual(
+            Activity.objects.get(revision=revision).modified, revision.modified
+        )
+
+        self.article.current_revision = first_revision
+        self.article.save()
+        self.assertEqual(self.activity(), [(1, True), (2, False)])
+
+        # Saved without add_revision(), as in the admin
+        ArticleRevision.objects.create(article=self.article, title="Page")
+        self.assertEqual(self.activity(), [(1, True), (2, False), (3, False)])
+
+    def test_permissions(self):
+        group = CustomGroup.objects.create()
+        self.article.add_revision(ArticleRevision(title="Page"))
+        self.article.owner = self.superuser1
+        self.article.group = group
+        self.article.other_read = False
+        self.article.save()
+        self.assertEqual(
+            list(
+                Activity.objects.filter(article=self.article).values_list(
+                    "owner", "group", "group_read", "other_read"
+                )
+            ),
+            [(self.superuser1.pk, group.pk, True, False)] * 2,
+        )
+
+        self.assertFalse(
+            Activity.objects.can_read(self.normaluser1)
+            .filter(article=self.article)
+            .exists()
+        )
+        group.user_set.add(self.normaluser1)
+        self.assertEqual(
+            Activity.objects.can_read(self.normaluser1)
+            .filter(article=self.article)
+            .count(),
+            2,
+        )
+
+    def test_save_deferred(self):
+        for article in (
+            Article.objects.only("id").get(pk=self.article.pk),
+            Article.objects.defer("owner", "current_revision").get(pk=self.article.pk),
+        ):
+            with self.subTest(deferred=article.get_deferred_fields()):
+                with CaptureQueriesContext(connection) as queries:
+                    article.save()
+                # Nothing changed, so the activity is left alone
+                self.assertFalse(
+                    [
+                        query
+                        for query in queries
+                        if Activity._meta.db_table in query["sql"]
+                    ]
+                )
+
+        article = Article.objects.only("id").get(pk=self.article.pk)
+        article.other_read = False
+        article.save()
+        self.assertFalse(
+            Activity.objects.filter(article=self.article, other_read=True).exists()
+        )
+
+    def test_delete(self):
+        self.article.delete()
+        self.assertFalse(Activity.objects.filter(article_id=self.article.pk).exists())
+
+    def test_permissions_recursive(self):
+        section = URLPath.create_urlpath(self.root, "section", title="Section")
+        URLPath.create_urlpath(section, "child", title="Secret child")
+        article = section.article
+        article.other_read = False
+        article.owner = self.superuser1
+        article.save()
+        article.set_permissions_recursive()
+        article.set_owner_recursive()
+        titles = [
+            activity.revision.title for activity in recent_activity(AnonymousUser())
+        ]
+        self.assertIn("Page", titles)
+        self.assertNotIn("Section", titles)
+        self.assertNotIn("Secret child", titles)
+        self.assertEqual(
+            set(
+                Activity.objects.filter(article__urlpath__slug="child").values_list(
+                    "owner", "other_read"
+                )
+            ),
+            {(self.superuser1.pk, False)},
+        )
@@ -0,0 +1,16 @@
+from unittest.mock import patch
+
+from wiki.models import ArticleRevision
+
+from tests.base import RequireRootArticleMixin
+from tests.base import TestBase
+
+
+class ArticleRevisionNotificationTests(RequireRootArticleMixin, TestBase):
+    def test_notify_on_commit(self):
+        with patch("wiki.plugins.notifications.models.notify") as notify:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.root_article.add_revision(ArticleRevision(title="Modified"))
+                notify.assert_not_called()
+        notify.assert_called_once()
+        self.assertEqual(notify.call_args[0][0], "Article modified: Modified")